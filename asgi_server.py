@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Borderline GUI Server (asyncio)
+ASGI app with an async Socket.IO server, for many games per process
+
+Serves the same page and event protocol as gui_server.py by running its
+event handlers unchanged on a thread pool, so the event loop never waits on
+the engine. AI turns stay on gui_server's AI worker pools, as before.
+
+    uvicorn asgi_server:app --port 5000
+    python asgi_server.py --port 5000        (needs uvicorn)
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import socketio
+from flask import render_template
+
+import gui_server
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class AsyncTransport:
+    """
+    gui_server transport for an asyncio Socket.IO server (see gui_server.FlaskTransport)
+
+    Handlers run on executor threads with the sender's sid and query
+    arguments in a thread-local. Emits and room changes, from any thread, are
+    queued to the event loop and sent in order by a single task.
+    """
+
+    def __init__(self, sio):
+        self.sio = sio
+        self.local = threading.local()
+        self.loop = None
+        self.outbox = None
+        self.sender = None
+
+    def start(self):
+        """Bind to the running event loop and take over gui_server's emits"""
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.outbox = asyncio.Queue()
+            self.sender = self.loop.create_task(self._send_loop())
+            gui_server.transport = self
+
+    async def _send_loop(self):
+        while True:
+            action, args = await self.outbox.get()
+            try:
+                if action == 'emit':
+                    event, data, to = args
+                    await self.sio.emit(event, data, to=to)
+                else:
+                    await getattr(self.sio, action)(*args)  # enter_room / leave_room
+            except Exception as e:
+                print(f"Error sending {action} {args[0]!r}: {e}")
+
+    def _queue(self, action, args):
+        self.loop.call_soon_threadsafe(self.outbox.put_nowait, (action, args))
+
+    def sid(self):
+        return self.local.sid
+
+    def arg(self, name):
+        values = self.local.args.get(name)
+        return values[0] if values else None
+
+    def reply(self, event, data):
+        self._queue('emit', (event, data, self.local.sid))
+
+    def send(self, event, data, to):
+        self._queue('emit', (event, data, to))
+
+    def join(self, sid, room):
+        self._queue('enter_room', (sid, room))
+
+    def leave(self, sid, room):
+        self._queue('leave_room', (sid, room))
+
+
+class AsyncGUIServer:
+    """
+    The GUI server on an asyncio Socket.IO server
+
+    Every handler in gui_server.EVENT_HANDLERS is registered here too and
+    runs on `executor`. A client's events are handled one at a time, in
+    the order they arrived; different clients run concurrently.
+    """
+
+    def __init__(self, max_workers=64):
+        self.sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+        self.transport = AsyncTransport(self.sio)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gui-handler')
+        self.client_args = {}  # sid -> parsed query string of the connection
+        self.client_locks = {}  # sid -> asyncio.Lock serializing that client's events
+
+        for event, handler in gui_server.EVENT_HANDLERS.items():
+            self.sio.on(event, self._make_handler(event, handler))
+
+        with gui_server.app.test_request_context('/'):
+            self.index_html = render_template('index.html').encode()
+
+        self.app = socketio.ASGIApp(self.sio, other_asgi_app=self.http_app,
+                                    static_files={'/static': os.path.join(BASE_DIR, 'static')})
+
+    def _make_handler(self, event, handler):
+        async def on_event(sid, *args):
+            if event == 'connect':
+                self.client_args[sid] = parse_qs(args[0].get('QUERY_STRING', ''))
+            if event in ('connect', 'disconnect'):
+                args = ()  # gui_server's handlers take no environ, auth or reason
+
+            self.transport.start()
+            lock = self.client_locks.setdefault(sid, asyncio.Lock())
+            async with lock:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._call, sid, event, handler, args)
+
+            if event == 'disconnect':
+                self.client_args.pop(sid, None)
+                self.client_locks.pop(sid, None)
+            return result
+        return on_event
+
+    def _call(self, sid, event, handler, args):
+        """Run a gui_server handler on an executor thread as client sid"""
+        local = self.transport.local
+        local.sid, local.args = sid, self.client_args.get(sid, {})
+        try:
+            return handler(*args)
+        except Exception as e:
+            print(f"Error handling {event} from {sid}: {e!r}")
+        finally:
+            local.sid = local.args = None
+
+    async def http_app(self, scope, receive, send):
+        """Serve the game page and /metrics; Socket.IO and /static are handled by ASGIApp"""
+        if scope['type'] != 'http':
+            return
+        if scope['path'] in ('/', '/index.html'):
+            status, content_type, body = 200, b'text/html; charset=utf-8', self.index_html
+        elif scope['path'] == '/metrics':
+            status, content_type = 200, gui_server.MetricsRegistry.CONTENT_TYPE.encode()
+            body = gui_server.metrics.render().encode()
+        else:
+            status, content_type, body = 404, b'text/plain', b'Not Found'
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', content_type),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+server = AsyncGUIServer()
+app = server.app
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from endgame_solver import add_endgame_arguments, solver_from_args
+
+    parser = argparse.ArgumentParser(description='Borderline GUI server on asyncio (ASGI)')
+    parser.add_argument('--host', default='0.0.0.0', help='Host to bind')
+    parser.add_argument('--port', type=int, default=5000, help='Port to bind')
+    add_endgame_arguments(parser)
+    args = parser.parse_args()
+    gui_server.endgame_solver = solver_from_args(args)
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("Running asgi_server.py directly needs uvicorn: pip install uvicorn")
+        print("(or serve asgi_server:app with any other ASGI server)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("BORDERLINE - GUI Server (asyncio)")
+    print("=" * 60)
+    print(f"Starting server on http://localhost:{args.port}")
+    print("Press Ctrl+C to stop")
+    print("=" * 60)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        gui_server.save_endgame_table()
@@ -1,8 +1,224 @@
 import random
 import copy
+import functools
+import glob
+import hashlib
+import hmac
 import json
+import os
+import threading
 from datetime import datetime
 
+
+# ==================== COMBAT ODDS ====================
+# Combat: attacker wins when d6 + attacker power >= d6 + total defender power.
+# Pieces hold 0-9 pips (power 0-4) and a placed piece can touch at most 8
+# neighbours, so every reachable matchup fits in a small precomputed table.
+
+MAX_PIECE_POWER = 4
+MAX_DEFENDER_POWER = 8 * MAX_PIECE_POWER
+
+
+def _build_combat_odds_table():
+    """COMBAT_ODDS[attacker_power][defender_power] = exact attacker win probability"""
+    table = []
+    for attacker_power in range(MAX_PIECE_POWER + 1):
+        row = []
+        for defender_power in range(MAX_DEFENDER_POWER + 1):
+            wins = sum(1 for a in range(1, 7) for d in range(1, 7)
+                       if a + attacker_power >= d + defender_power)
+            row.append(wins / 36)
+        table.append(row)
+    return table
+
+
+COMBAT_ODDS = _build_combat_odds_table()
+
+
+def attacker_win_probability(attacker_power, defender_power):
+    """Exact probability that the attacker wins combat, given power levels"""
+    if 0 <= attacker_power <= MAX_PIECE_POWER and 0 <= defender_power <= MAX_DEFENDER_POWER:
+        return COMBAT_ODDS[attacker_power][defender_power]
+    # Outside the table (custom pieces): only the power difference matters
+    difference = attacker_power - defender_power
+    if difference >= 5:
+        return 1.0
+    if difference <= -6:
+        return 0.0
+    return COMBAT_ODDS[MAX_PIECE_POWER][MAX_PIECE_POWER - difference]
+
+
+def combat_win_probability(attacker_piece, defenders):
+    """
+    Exact probability that attacker_piece wins combat against defenders
+
+    Args:
+        attacker_piece: GamePiece being placed
+        defenders: list of defending GamePiece objects (combined power is used)
+    """
+    defender_power = sum(piece.get_power_level() for piece in defenders)
+    return attacker_win_probability(attacker_piece.get_power_level(), defender_power)
+
+
+def find_game_files(sources):
+    """
+    Expand exported-game sources into a list of JSON file paths
+
+    Args:
+        sources: a directory of exported games, a single file, or a list of either
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    filenames = []
+    for source in sources:
+        if os.path.isdir(source):
+            filenames.extend(sorted(glob.glob(os.path.join(source, '*.json'))))
+        else:
+            filenames.append(source)
+    return filenames
+
+
+# ==================== PIECE SERIALIZATION ====================
+# There are only a few distinct (colour, pip pattern) combinations, so every
+# piece with the same shape shares one pre-built JSON fragment.
+
+_PIECE_JSON_CACHE = {}
+
+
+def serialize_piece(piece):
+    """
+    Shared JSON fragment for a GamePiece: {'player_color', 'pips', 'power'}
+
+    Fragments are cached by (colour, pip mask) and shared between callers, so
+    they must not be modified; 'pips' is a tuple of tuples (serialized as
+    nested arrays) with '_' for empty positions.
+    """
+    return serialize_pattern(piece.player_color, piece.get_pip_mask())
+
+
+def serialize_pattern(player_color, mask):
+    """Shared JSON fragment for a (colour, pip mask) pair (see serialize_piece)"""
+    key = (player_color, mask)
+    fragment = _PIECE_JSON_CACHE.get(key)
+    if fragment is None:
+        pips = tuple(
+            tuple(player_color if mask & (1 << (i * 3 + j)) else '_' for j in range(3))
+            for i in range(3)
+        )
+        fragment = {'player_color': player_color, 'pips': pips, 'power': bin(mask).count('1') // 2}
+        _PIECE_JSON_CACHE[key] = fragment
+    return fragment
+
+
+_ROTATED_MASKS = {}
+_SHAPE_PIECES = {}
+
+
+def rotated_pip_masks(piece):
+    """Pip masks of a piece at rotations 0, 90, 180 and 270 degrees (cached per pattern)"""
+    key = (piece.player_color, tuple(tuple(row) for row in piece.pips))
+    masks = _ROTATED_MASKS.get(key)
+    if masks is None:
+        masks = tuple(piece.rotate(rotation * 90).get_pip_mask() for rotation in range(4))
+        _ROTATED_MASKS[key] = masks
+    return masks
+
+
+def shape_piece(player_color, mask):
+    """Shared GamePiece with the given pip mask, for legality checks only"""
+    key = (player_color, mask)
+    piece = _SHAPE_PIECES.get(key)
+    if piece is None:
+        piece = GamePiece(player_color, [list(row) for row in serialize_pattern(player_color, mask)['pips']])
+        _SHAPE_PIECES[key] = piece
+    return piece
+
+
+def encode_move(piece_index, rotation, row, col):
+    """Pack a move into one integer: piece_index << 8 | rotation << 6 | row << 3 | col"""
+    return (piece_index << 8) | (rotation << 6) | (row << 3) | col
+
+
+def decode_move(code, player_color):
+    """Inverse of encode_move: returns a move JSON object for execute_move"""
+    return {
+        'player': player_color,
+        'piece_index': code >> 8,
+        'position': [(code >> 3) & 7, code & 7],
+        'rotation': (code >> 6) & 3
+    }
+
+
+def apply_state_delta(state, delta):
+    """
+    Apply a get_state_delta() result to a get_game_state() dict
+
+    Returns the updated state (a new dict for full snapshots, otherwise the
+    same dict updated in place).
+    """
+    if delta['full']:
+        return delta['state']
+
+    for cell in delta['cells']:
+        state['board'][cell['row']][cell['col']] = cell['piece']
+
+    for op in delta['hands']:
+        hand = state['players'][op['player']]['pieces_remaining']
+        if op['op'] == 'remove':
+            hand.pop(op['index'])
+        else:
+            hand.insert(op['index'], op['piece'])
+
+    on_board = {'R': 0, 'B': 0}
+    for row in state['board']:
+        for piece in row:
+            if piece is not None:
+                on_board[piece['player_color']] += 1
+    for color in ('R', 'B'):
+        state['players'][color]['pieces_on_board'] = on_board[color]
+
+    for key in ('turn', 'current_player', 'game_over', 'winner'):
+        state[key] = delta[key]
+    state['version'] = delta['version']
+    return state
+
+
+# ==================== SEARCH CANCELLATION ====================
+
+class SearchCancelled(Exception):
+    """Raised inside an AI search whose CancellationToken was cancelled"""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for AI searches
+
+    Pass one to choose_move / choose_current_move and call cancel() from any
+    thread; the search checks it inside its move loops and raises
+    SearchCancelled instead of returning a move.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise SearchCancelled if cancel() has been called"""
+        if self._event.is_set():
+            raise SearchCancelled()
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds, waking early on cancel(); returns cancelled"""
+        return self._event.wait(timeout)
+
+
 class GamePiece:
     def __init__(self, player_color, pip_pattern=None):
         self.player_color = player_color  # 'R' or 'B'
@@ -160,6 +376,18 @@ class GamePiece:
         pip_count = len(self.get_filled_positions())
         return pip_count // 2
 
+    def get_pip_mask(self):
+        """
+        Encode the pip pattern as a 9-bit integer (bit i*3+j set for pip [i][j]).
+        Colour-independent, so identical shapes of either colour share a mask.
+        """
+        mask = 0
+        for i in range(3):
+            for j in range(3):
+                if self.pips[i][j] == self.player_color:
+                    mask |= 1 << (i * 3 + j)
+        return mask
+
     def convert_to_color(self, new_color):
         """Convert all pips on this piece to a new color"""
         old_color = self.player_color
@@ -171,6 +399,15 @@ class GamePiece:
                 if self.pips[i][j] == old_color:
                     self.pips[i][j] = new_color
 
+    def converted_copy(self, new_color):
+        """
+        Return a copy of this piece converted to new_color. Pieces may be
+        shared between forked games, so captures convert a copy.
+        """
+        converted = GamePiece(self.player_color, [row[:] for row in self.pips])
+        converted.convert_to_color(new_color)
+        return converted
+
     def rotate(self, degrees):
         """
         Rotate the piece around its center PIP.
@@ -607,9 +844,13 @@ class GameBoard:
 
         return removed_pieces
 
-    def resolve_combat(self, new_piece, new_row, new_col, adjacent_pips):
+    def resolve_combat(self, new_piece, new_row, new_col, adjacent_pips, rolls=None):
         """Handle combat when different colored PIPs are adjacent
 
+        Args:
+            rolls: Optional (attacker_roll, defender_roll) to use instead of
+                   rolling dice (used when replaying recorded games)
+
         Returns None if no combat, or a dict with combat results including:
         - All defending pieces and their combined power
         - Die rolls with power bonuses
@@ -646,10 +887,14 @@ class GameBoard:
 
         # Calculate attacker power
         attacker_power = new_piece.get_power_level()
+        win_probability = attacker_win_probability(attacker_power, total_defender_power)
 
-        # Roll dice
-        attacker_roll = random.randint(1, 6)
-        defender_roll = random.randint(1, 6)
+        # Roll dice (or reuse recorded rolls)
+        if rolls is not None:
+            attacker_roll, defender_roll = rolls
+        else:
+            attacker_roll = random.randint(1, 6)
+            defender_roll = random.randint(1, 6)
 
         # Add power levels
         attacker_total = attacker_roll + attacker_power
@@ -671,6 +916,7 @@ class GameBoard:
             'defender_roll': defender_roll,
             'defender_total': defender_total,
             'defender_color': defender_color,
+            'attacker_win_probability': win_probability,
             'winner': winner
         }
 
@@ -729,7 +975,7 @@ class GUIHumanPlayer(Player):
         super().__init__(color, name)
         self.pending_move = None  # Will be set by GUI server
 
-    def choose_move(self, board):
+    def choose_move(self, board, cancel_token=None):
         """Return the move set by the GUI server"""
         if self.pending_move is None:
             return None, None, None, None, None
@@ -740,14 +986,30 @@ class GUIHumanPlayer(Player):
         return move
 
 class AIPlayer(Player):
+    # Optional OpeningBook (see opening_book.py) probed before searching.
+    # Set on the class to share one book between all AI players.
+    opening_book = None
+
     def __init__(self, color, name):
         super().__init__(color, name)
     
-    def choose_move(self, board):
-        """AI decision making for piece placement"""
+    def choose_move(self, board, cancel_token=None):
+        """
+        AI decision making for piece placement
+
+        cancel_token: optional CancellationToken; the search raises
+        SearchCancelled soon after it is cancelled
+        """
         if not self.has_pieces():
             return None, None, None, None, None
 
+        # Opening book: answer known early positions without searching
+        if self.opening_book is not None:
+            book_move = self.opening_book.probe(board, self.color, self.pieces)
+            if book_move is not None:
+                piece_idx, rotation, row, col = book_move
+                return self.pieces[piece_idx].rotate(rotation), row, col, rotation, piece_idx
+
         current_pieces = board.get_player_pieces(self.color)
         valid_moves = []
 
@@ -756,6 +1018,8 @@ class AIPlayer(Player):
             for rotation in [0, 90, 180, 270]:
                 rotated_piece = piece.rotate(rotation)
                 for row in range(board.height):
+                    if cancel_token is not None:
+                        cancel_token.check()
                     for col in range(board.width):
                         if board.can_place_piece(rotated_piece, row, col, current_pieces):
                             score = self.evaluate_move(board, rotated_piece, row, col, current_pieces)
@@ -924,6 +1188,13 @@ class AggressiveConnectorAI(AIPlayer):
         if not enemy_contacts:
             return 0  # No combat, no opportunity
 
+        # Price the battle by the exact chance of winning it
+        defender_positions = set(contact['exist_pos'][:2] for contact in enemy_contacts)
+        defenders = [board.grid[r][c] for r, c in defender_positions]
+        win_probability = combat_win_probability(piece, defenders)
+        if win_probability == 0:
+            return 0
+
         # Get enemy color
         enemy_color = 'B' if self.color == 'R' else 'R'
 
@@ -949,7 +1220,7 @@ class AggressiveConnectorAI(AIPlayer):
         # Check if removing those pieces gives us victory
         if victory_test_board.check_victory(self.color):
             # This battle could win the game!
-            return 50000  # Very high but less than immediate win
+            return 50000 * win_probability  # Very high but less than immediate win
 
         # Even if it doesn't win immediately, check if it improves our connection significantly
         old_connection = self.evaluate_vertical_connection(temp_board)
@@ -957,7 +1228,7 @@ class AggressiveConnectorAI(AIPlayer):
         connection_improvement = new_connection - old_connection
 
         if connection_improvement > 5:  # Significant improvement
-            return connection_improvement * 500  # Reward proportional to improvement
+            return connection_improvement * 500 * win_probability  # Reward proportional to improvement
 
         return 0
 
@@ -1321,7 +1592,7 @@ class HumanPlayer(Player):
         for row in range(board.height):
             print(f"{row} " + " ".join(grid[row]))
 
-    def choose_move(self, board):
+    def choose_move(self, board, cancel_token=None):
         """Interactive move selection for human player"""
         if not self.has_pieces():
             return None, None, None, None, None
@@ -1417,7 +1688,7 @@ class RandomPlayer(Player):
     def __init__(self, color, name):
         super().__init__(color, name)
 
-    def choose_move(self, board):
+    def choose_move(self, board, cancel_token=None):
         """Randomly select a legal move"""
         if not self.has_pieces():
             return None, None, None, None, None
@@ -1434,6 +1705,8 @@ class RandomPlayer(Player):
             random.shuffle(rotations)
 
             for rotation in rotations:
+                if cancel_token is not None:
+                    cancel_token.check()
                 rotated_piece = piece.rotate(rotation)
                 current_pieces = board.get_player_pieces(self.color)
 
@@ -1454,10 +1727,59 @@ class RandomPlayer(Player):
         return None, None, None, None, None
 
 
+def undoable(method):
+    """Record the changes made by a BorderlineGPT method as one undo step"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._action_ops is not None:
+            return method(self, *args, **kwargs)  # Part of an enclosing step
+
+        before = self._turn_state()
+        history_length = len(self.move_history)
+        self._action_ops = []
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            ops, self._action_ops = self._action_ops, None
+
+        after = self._turn_state()
+        if ops or after != before or len(self.move_history) != history_length:
+            self._undo_stack.append({
+                'name': method.__name__.lstrip('_'),
+                'ops': ops,
+                'before': before,
+                'after': after,
+                'history_length': history_length,
+                'history': self.move_history[history_length:],
+                'events': result.get('events', []) if isinstance(result, dict) else []
+            })
+            self._redo_stack = []
+        return result
+    return wrapper
+
+
 class BorderlineGPT:
+    # Number of change-log entries kept for get_state_delta(); clients that
+    # fall further behind get a full snapshot instead
+    CHANGE_LOG_LIMIT = 512
+
     def __init__(self, red_strategy='default', blue_strategy='default', blue_human=False, blue_random=False):
         self.board = GameBoard()
 
+        # State versioning: every board/hand mutation bumps state_version and is
+        # logged so clients can fetch deltas; snapshots are cached per version
+        self.state_version = 0
+        self._change_log = []  # (version, kind, data) tuples, oldest first
+        self._state_cache = None
+        self._legal_cells = {}  # color -> legal cells per shape (see get_valid_moves)
+        self._valid_moves_cache = None
+        self._token_salt = os.urandom(16)  # HMAC key binding move tokens to this game
+
+        # Undo/redo steps (see undoable); _action_ops collects the step in progress
+        self._undo_stack = []
+        self._redo_stack = []
+        self._action_ops = None
+
         # Select strategy for Red
         if red_strategy == 'aggressive':
             self.red_player = AggressiveConnectorAI('R', 'Red AI (Aggressive)')
@@ -1480,13 +1802,83 @@ class BorderlineGPT:
         self.winner = None
         self.last_placed_pos = None  # Track last placed piece for highlighting
 
+        # Optional EndgameSolver (see endgame_solver.py) for AI turns with few pieces left
+        self.endgame_solver = None
+
         # Initialize API
         self.move_history = []
         self.game_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.instance_id = os.urandom(8).hex()  # Unique per object, unlike game_id (see instrumentation.py)
     
+    def fork(self):
+        """
+        Return an independent copy of this game for what-if analysis
+
+        Pieces are never modified in place once created, so the fork shares
+        them; only the grid, hands, history and counters are copied. Moves
+        executed on the fork do not affect this game, and vice versa.
+        """
+        game = copy.copy(self)
+
+        game.board = copy.copy(self.board)
+        game.board.grid = [row[:] for row in self.board.grid]
+
+        game.red_player = copy.copy(self.red_player)
+        game.blue_player = copy.copy(self.blue_player)
+        players = {id(self.red_player): game.red_player, id(self.blue_player): game.blue_player}
+        for player in (game.red_player, game.blue_player):
+            player.pieces = player.pieces[:]
+            player.pieces_on_board = player.pieces_on_board[:]
+        game.current_player = players[id(self.current_player)]
+        if self.winner is not None:
+            game.winner = players[id(self.winner)]
+
+        game.move_history = self.move_history[:]
+        game._change_log = self._change_log[:]
+        game._token_salt = os.urandom(16)  # Tokens are not shared with the fork
+        game.instance_id = os.urandom(8).hex()
+        game._undo_stack = self._undo_stack[:]
+        game._redo_stack = self._redo_stack[:]
+
+        # Carry over caches that are still valid for the copied state
+        game._state_cache = None
+        game._legal_cells = {
+            color: {'board': game.board, 'version': cache['version'], 'shapes': dict(cache['shapes'])}
+            for color, cache in self._legal_cells.items()
+        }
+        if self._valid_moves_cache is not None:
+            color, version, player, moves = self._valid_moves_cache
+            game._valid_moves_cache = (color, version, players.get(id(player)), moves)
+        return game
+
     def switch_player(self):
         self.current_player = self.blue_player if self.current_player == self.red_player else self.red_player
+        self._record_change('turn')
+
+    def choose_current_move(self, cancel_token=None):
+        """
+        Ask the current player for a move. AI turns are answered by the
+        endgame solver (if set) once the combined hand size is small enough.
+        For games played through execute_move; play_turn does not use it.
+
+        cancel_token: optional CancellationToken that aborts the search with
+        SearchCancelled (e.g. when the game is stopped)
+
+        Returns the same (piece, row, col, rotation, piece_idx) tuple as choose_move
+        """
+        if (self.endgame_solver is not None and isinstance(self.current_player, AIPlayer)
+                and self.endgame_solver.applies(self)):
+            move = self.endgame_solver.choose_move(self, cancel_token)
+            if move is not None:
+                piece_idx = move['piece_index']
+                rotation = move['rotation'] * 90
+                row, col = move['position']
+                piece = self.current_player.pieces[piece_idx].rotate(rotation)
+                return piece, row, col, rotation, piece_idx
+
+        return self.current_player.choose_move(self.board, cancel_token=cancel_token)
     
+    @undoable
     def play_turn(self):
         """Execute one turn of the game"""
         if self.game_over:
@@ -1505,7 +1897,9 @@ class BorderlineGPT:
             self.turn_count += 1
             return
         
-        # AI chooses move
+        # AI chooses move. Not through choose_current_move: the endgame solver
+        # models the execute_move rules, but here captured and disconnected
+        # pieces go back into hands, so its results would not hold
         result = self.current_player.choose_move(self.board)
 
         if result[0] is None:
@@ -1526,7 +1920,7 @@ class BorderlineGPT:
         piece, row, col, rotation, piece_idx = result
 
         # Remove the original piece from player's hand using the index
-        original_piece = self.current_player.pieces.pop(piece_idx)
+        original_piece = self._take_from_hand(self.current_player, piece_idx)
 
         # Display rotation info if piece was rotated
         if rotation != 0:
@@ -1538,7 +1932,7 @@ class BorderlineGPT:
         adjacent_pips = self.board.check_pip_adjacency(piece, row, col, all_pieces)
         
         # Place piece
-        self.board.place_piece(piece, row, col)
+        self._place_on_board(piece, row, col)
         print(f"{self.current_player.name} places piece at ({row}, {col})")
 
         # Track this position for highlighting
@@ -1562,22 +1956,22 @@ class BorderlineGPT:
 
             if combat['winner'] != self.current_player.color:
                 # Attacker loses - remove piece from board, convert it, and give to defender
-                attacking_piece = self.board.remove_piece(row, col)
+                attacking_piece = self._remove_from_board(row, col)
                 if attacking_piece:
-                    attacking_piece.convert_to_color(combat['defender_color'])
+                    attacking_piece = attacking_piece.converted_copy(combat['defender_color'])
                     # Give the converted piece to the winning player
                     winner_player = self.red_player if combat['defender_color'] == 'R' else self.blue_player
-                    winner_player.add_piece_back(attacking_piece)
+                    self._add_to_hand(winner_player, attacking_piece)
                     print(f"{self.current_player.name} loses combat! Piece is captured and converted to {combat['defender_color']}!")
                     # Clear highlight since piece was removed
                     self.last_placed_pos = None
             else:
                 # Defender(s) lose - remove all defending pieces, convert them, and give to attacker
                 for defender in combat['defenders']:
-                    defending_piece = self.board.remove_piece(defender['row'], defender['col'])
+                    defending_piece = self._remove_from_board(defender['row'], defender['col'])
                     if defending_piece:
-                        defending_piece.convert_to_color(combat['attacker_color'])
-                        self.current_player.add_piece_back(defending_piece)
+                        defending_piece = defending_piece.converted_copy(combat['attacker_color'])
+                        self._add_to_hand(self.current_player, defending_piece)
 
                 if len(combat['defenders']) > 1:
                     print(f"All {len(combat['defenders'])} defending pieces are captured and converted to {combat['attacker_color']}!")
@@ -1587,7 +1981,7 @@ class BorderlineGPT:
                 # POST-COMBAT: Check if any remaining defending pieces became disconnected
                 # (only when defender loses)
                 defender_color = combat['defender_color']
-                disconnected = self.board.remove_disconnected_pieces(defender_color)
+                disconnected = self._remove_disconnected(defender_color)
                 if disconnected:
                     print(f"\nPOST-COMBAT CONNECTIVITY CHECK:")
                     print(f"  {len(disconnected)} {defender_color} piece(s) disconnected from home row - returned to hand")
@@ -1595,7 +1989,7 @@ class BorderlineGPT:
                         print(f"    Disconnected piece at ({piece_info['row']}, {piece_info['col']})")
                     defender_player = self.red_player if defender_color == 'R' else self.blue_player
                     for piece_info in disconnected:
-                        defender_player.add_piece_back(piece_info['piece'])
+                        self._add_to_hand(defender_player, piece_info['piece'])
                 else:
                     print(f"\nPOST-COMBAT CONNECTIVITY CHECK:")
                     print(f"  No defending pieces are disconnected from the home row")
@@ -1611,12 +2005,14 @@ class BorderlineGPT:
         self.switch_player()
         self.turn_count += 1
 
-    def _execute_move_internal(self, piece, row, col, piece_idx):
+    def _execute_move_internal(self, piece, row, col, piece_idx, combat_rolls=None, validated=False):
         """
         Internal method: Execute a move with an already-rotated piece
         Returns a complete result dict with validation, events, and new state
 
         Note: piece should already be rotated before calling this method
+        combat_rolls: optional recorded (attacker_roll, defender_roll) for replays
+        validated: the caller already checked the placement with can_place_piece
         """
         result = {
             'valid': False,
@@ -1632,23 +2028,24 @@ class BorderlineGPT:
             return result
 
         # Validate placement using existing game logic
-        player_pieces = self.board.get_player_pieces(self.current_player.color)
-        if not self.board.can_place_piece(piece, row, col, player_pieces):
-            result['reason'] = 'Invalid placement - must connect to existing pieces or home row'
-            return result
+        if not validated:
+            player_pieces = self.board.get_player_pieces(self.current_player.color)
+            if not self.board.can_place_piece(piece, row, col, player_pieces):
+                result['reason'] = 'Invalid placement - must connect to existing pieces or home row'
+                return result
 
         # VALID MOVE - now execute using existing game engine logic
         result['valid'] = True
 
         # Remove piece from hand
-        self.current_player.pieces.pop(piece_idx)
+        self._take_from_hand(self.current_player, piece_idx)
 
         # Check for combat BEFORE placing
         all_pieces = self.board.get_player_pieces('R') + self.board.get_player_pieces('B')
         adjacent_pips = self.board.check_pip_adjacency(piece, row, col, all_pieces)
 
         # Place piece
-        self.board.place_piece(piece, row, col)
+        self._place_on_board(piece, row, col)
         result['events'].append({
             'type': 'piece_placed',
             'player': self.current_player.color,
@@ -1658,7 +2055,7 @@ class BorderlineGPT:
         })
 
         # Handle combat
-        combat = self.board.resolve_combat(piece, row, col, adjacent_pips)
+        combat = self.board.resolve_combat(piece, row, col, adjacent_pips, rolls=combat_rolls)
         if combat:
             result['events'].append({
                 'type': 'combat',
@@ -1670,7 +2067,7 @@ class BorderlineGPT:
 
             if loser_color == combat['defender_color']:
                 for defender in combat['defenders']:
-                    removed = self.board.remove_piece(defender['row'], defender['col'])
+                    removed = self._remove_from_board(defender['row'], defender['col'])
                     if removed:
                         result['events'].append({
                             'type': 'piece_removed',
@@ -1680,7 +2077,7 @@ class BorderlineGPT:
                             'piece': self.piece_to_json(removed)
                         })
             else:
-                removed = self.board.remove_piece(row, col)
+                removed = self._remove_from_board(row, col)
                 if removed:
                     result['events'].append({
                         'type': 'piece_removed',
@@ -1691,7 +2088,7 @@ class BorderlineGPT:
                     })
 
             # Remove disconnected pieces
-            disconnected = self.board.remove_disconnected_pieces(loser_color)
+            disconnected = self._remove_disconnected(loser_color)
             for disc in disconnected:
                 result['events'].append({
                     'type': 'piece_removed',
@@ -1725,16 +2122,12 @@ class BorderlineGPT:
         self.game_id = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     def piece_to_json(self, piece):
-        """Convert a GamePiece to JSON-serializable dict"""
-        return {
-            'player_color': piece.player_color,
-            'pips': piece.pips,
-            'power': piece.get_power_level()
-        }
+        """Convert a GamePiece to JSON-serializable dict (shared, read-only; see serialize_piece)"""
+        return serialize_piece(piece)
 
     def json_to_piece(self, piece_json):
         """Convert JSON dict to GamePiece"""
-        return GamePiece(piece_json['player_color'], piece_json['pips'])
+        return GamePiece(piece_json['player_color'], [list(row) for row in piece_json['pips']])
 
     def get_piece_type_identifier(self, piece):
         """
@@ -1798,9 +2191,13 @@ class BorderlineGPT:
             "player": "R" or "B",
             "piece_index": 0-15,  # Index in player's hand
             "position": [row, col],
-            "rotation": 0-3  # Number of 90-degree clockwise rotations
+            "rotation": 0-3,  # Number of 90-degree clockwise rotations
+            "token": "..."  # Optional: from get_valid_moves, skips revalidation
         }
 
+        Combat dice are always rolled; a "combat_rolls" field is ignored here
+        (recorded dice are only used by replay_move).
+
         Returns:
         {
             "valid": true/false,
@@ -1811,6 +2208,98 @@ class BorderlineGPT:
             "winner": "R"/"B"/null
         }
         """
+        result = self._apply_move(move_json)
+
+        # Add game state to result
+        result['game_state'] = self.get_game_state()
+
+        return result
+
+    def replay_move(self, move_json):
+        """
+        Execute a recorded move (from move_history or an exported game)
+
+        Same as execute_move, except that combat is resolved with the move's
+        recorded "combat_rolls" (two dice, each an int 1-6) when it has them.
+        Older records without dice roll new ones.
+        """
+        result = self._apply_move(move_json, replay=True)
+        result['game_state'] = self.get_game_state()
+        return result
+
+    def execute_moves(self, moves, return_state='final', replay=False):
+        """
+        Validate and apply a sequence of moves, stopping at the first invalid one
+
+        Each move is validated once and becomes its own undo step. The game
+        state is only serialized where requested.
+
+        Args:
+            moves: list of move JSON objects (same format as execute_move)
+            return_state: 'final' - one game_state after the last move
+                          'each'  - a game_state in every per-move result
+                          'none'  - no game_state at all
+            replay: apply recorded moves with their dice, as replay_move does
+
+        Returns:
+        {
+            "valid": true/false,        # false if a move was rejected
+            "reason": "...",            # why the rejected move was invalid
+            "applied": 12,              # number of moves applied
+            "results": [...],           # execute_move results, without game_state unless 'each'
+            "game_state": {...},        # only with return_state='final'
+            "game_over": true/false,
+            "winner": "R"/"B"/null
+        }
+        """
+        if return_state not in ('final', 'each', 'none'):
+            raise ValueError(f"return_state must be 'final', 'each' or 'none', not {return_state!r}")
+
+        results = []
+        reason = None
+        for move_json in moves:
+            result = self._apply_move(move_json, replay=replay)
+            if return_state == 'each':
+                result['game_state'] = self.get_game_state()
+            results.append(result)
+            if not result['valid']:
+                reason = result['reason']
+                break
+
+        batch = {
+            'valid': reason is None,
+            'reason': reason,
+            'applied': len(results) - (reason is not None),
+            'results': results,
+            'game_over': self.game_over,
+            'winner': self.winner.color if self.winner else None
+        }
+        if return_state == 'final':
+            batch['game_state'] = self.get_game_state()
+        return batch
+
+    @staticmethod
+    def _recorded_rolls(move_json):
+        """
+        The (attacker_roll, defender_roll) recorded on a move, or None if it has none
+
+        Raises ValueError unless they are two ints from 1 to 6.
+        """
+        rolls = move_json.get('combat_rolls')
+        if rolls is None:
+            return None
+        if (not isinstance(rolls, (list, tuple)) or len(rolls) != 2
+                or not all(type(roll) is int and 1 <= roll <= 6 for roll in rolls)):
+            raise ValueError(f'Invalid combat_rolls: {rolls!r}')
+        return tuple(rolls)
+
+    @undoable
+    def _apply_move(self, move_json, replay=False):
+        """
+        Validate and apply one move; execute_move without the game state
+
+        replay: resolve combat with the move's recorded dice (see replay_move)
+        """
         # Validate move structure
         required_fields = ['player', 'piece_index', 'position', 'rotation']
         for field in required_fields:
@@ -1819,7 +2308,6 @@ class BorderlineGPT:
                     'valid': False,
                     'reason': f'Missing required field: {field}',
                     'events': [],
-                    'game_state': self.get_game_state(),
                     'game_over': False,
                     'winner': None
                 }
@@ -1830,7 +2318,6 @@ class BorderlineGPT:
                 'valid': False,
                 'reason': f'Not {move_json["player"]} player\'s turn',
                 'events': [],
-                'game_state': self.get_game_state(),
                 'game_over': False,
                 'winner': None
             }
@@ -1842,7 +2329,6 @@ class BorderlineGPT:
                 'valid': False,
                 'reason': f'Invalid piece_index: {piece_idx}',
                 'events': [],
-                'game_state': self.get_game_state(),
                 'game_over': False,
                 'winner': None
             }
@@ -1857,31 +2343,51 @@ class BorderlineGPT:
         # Extract position
         row, col = move_json['position']
 
-        # Validate placement using existing game logic
-        player_pieces = self.board.get_player_pieces(self.current_player.color)
-        if not self.board.can_place_piece(rotated_piece, row, col, player_pieces):
-            return {
-                'valid': False,
-                'reason': 'Invalid placement - must connect to existing pieces or home row',
-                'events': [],
-                'game_state': self.get_game_state(),
-                'game_over': False,
-                'winner': None
-            }
+        combat_rolls = None
+        if replay:
+            try:
+                combat_rolls = self._recorded_rolls(move_json)
+            except ValueError as e:
+                return {
+                    'valid': False,
+                    'reason': str(e),
+                    'events': [],
+                    'game_over': False,
+                    'winner': None
+                }
+
+        # Validate placement using existing game logic, unless the move carries
+        # a token from get_valid_moves for the current state
+        if not self._has_current_token(move_json):
+            player_pieces = self.board.get_player_pieces(self.current_player.color)
+            if not self.board.can_place_piece(rotated_piece, row, col, player_pieces):
+                return {
+                    'valid': False,
+                    'reason': 'Invalid placement - must connect to existing pieces or home row',
+                    'events': [],
+                    'game_over': False,
+                    'winner': None
+                }
 
         # Use the internal _execute_move_internal method with the rotated piece
-        result = self._execute_move_internal(rotated_piece, row, col, piece_idx)
+        result = self._execute_move_internal(rotated_piece, row, col, piece_idx,
+                                             combat_rolls=combat_rolls,
+                                             validated=True)
 
         # If valid, record the move
         if result['valid']:
             move_record = move_json.copy()
             move_record['timestamp'] = datetime.now().isoformat()
             move_record['turn'] = self.turn_count - 1  # Already incremented
+            # Record the dice so replays resolve combat identically
+            move_record.pop('combat_rolls', None)
+            move_record.pop('token', None)
+            for event in result['events']:
+                if event['type'] == 'combat':
+                    combat = event['combat_data']
+                    move_record['combat_rolls'] = [combat['attacker_roll'], combat['defender_roll']]
             self.move_history.append(move_record)
 
-        # Add game state to result
-        result['game_state'] = self.get_game_state()
-
         return result
 
     def get_game_state(self):
@@ -1891,6 +2397,7 @@ class BorderlineGPT:
         Returns:
         {
             "game_id": "...",
+            "version": 42,  # Bumped on every board/hand change (see get_state_delta)
             "turn": 5,
             "current_player": "R",
             "game_over": false,
@@ -1907,44 +2414,288 @@ class BorderlineGPT:
             }
         }
         """
-        # Build board representation
-        board_state = []
-        for row in range(self.board.height):
-            board_row = []
-            for col in range(self.board.width):
-                cell = self.board.grid[row][col]
-                if cell is None:
-                    board_row.append(None)
-                else:
-                    board_row.append(self.piece_to_json(cell))
-            board_state.append(board_row)
+        snapshot = self._snapshot()
 
         return {
             'game_id': getattr(self, 'game_id', 'unknown'),
+            'version': self.state_version,
             'turn': self.turn_count,
             'current_player': self.current_player.color,
             'game_over': self.game_over,
             'winner': self.winner.color if self.winner else None,
-            'board': board_state,
+            'board': [row[:] for row in snapshot['board']],
             'board_dimensions': {'height': self.board.height, 'width': self.board.width},
             'players': {
                 'R': {
                     'name': self.red_player.name,
-                    'pieces_remaining': [self.piece_to_json(p) for p in self.red_player.pieces],
-                    'pieces_on_board': len(self.board.get_player_pieces('R'))
+                    'pieces_remaining': snapshot['R'][:],
+                    'pieces_on_board': snapshot['R_on_board']
                 },
                 'B': {
                     'name': self.blue_player.name,
-                    'pieces_remaining': [self.piece_to_json(p) for p in self.blue_player.pieces],
-                    'pieces_on_board': len(self.board.get_player_pieces('B'))
+                    'pieces_remaining': snapshot['B'][:],
+                    'pieces_on_board': snapshot['B_on_board']
                 }
             }
         }
 
-    def get_valid_moves(self, player_color=None):
+    def _snapshot(self):
+        """
+        Serialized board and hands, rebuilt only after a mutation
+        (cached per state_version and per player objects; callers get
+        copies of the lists so the cache cannot be modified through them)
+        """
+        cache = self._state_cache
+        if (cache is not None and cache['version'] == self.state_version
+                and cache['red_player'] is self.red_player
+                and cache['blue_player'] is self.blue_player):
+            return cache
+
+        board_state = []
+        on_board = {'R': 0, 'B': 0}
+        for row in range(self.board.height):
+            board_row = []
+            for col in range(self.board.width):
+                cell = self.board.grid[row][col]
+                if cell is None:
+                    board_row.append(None)
+                else:
+                    board_row.append(self.piece_to_json(cell))
+                    on_board[cell.player_color] = on_board.get(cell.player_color, 0) + 1
+            board_state.append(board_row)
+
+        cache = {
+            'version': self.state_version,
+            'red_player': self.red_player,
+            'blue_player': self.blue_player,
+            'board': board_state,
+            'R': [self.piece_to_json(p) for p in self.red_player.pieces],
+            'B': [self.piece_to_json(p) for p in self.blue_player.pieces],
+            'R_on_board': on_board['R'],
+            'B_on_board': on_board['B']
+        }
+        self._state_cache = cache
+        return cache
+
+    def get_state_delta(self, since_version=None):
+        """
+        Get the changes since a previously seen state version
+
+        Returns a full snapshot when since_version is None, newer than the
+        current version, or older than the retained change log:
+        {"full": true, "version": 42, "since_version": ..., "state": {...}}
+
+        Otherwise only what changed:
+        {
+            "full": false,
+            "version": 42,
+            "since_version": 40,
+            "cells": [{"row": 1, "col": 3, "piece": {piece} or null}, ...],
+            "hands": [{"player": "R", "op": "remove", "index": 4},
+                      {"player": "B", "op": "insert", "index": 12, "piece": {piece}}, ...],
+            "turn": 7, "current_player": "B", "game_over": false, "winner": null
+        }
+
+        Cells carry their current contents; hand operations must be applied
+        in order (see apply_state_delta).
+        """
+        changes = self._changes_since(since_version)
+        if changes is None:
+            return {
+                'full': True,
+                'version': self.state_version,
+                'since_version': since_version,
+                'state': self.get_game_state()
+            }
+
+        changed_cells = {}
+        hand_ops = []
+        for version, kind, data in changes:
+            if kind == 'cell':
+                changed_cells[data] = True
+            elif kind == 'hand_remove':
+                hand_ops.append({'player': data[0], 'op': 'remove', 'index': data[1]})
+            elif kind == 'hand_insert':
+                hand_ops.append({'player': data[0], 'op': 'insert', 'index': data[1],
+                                 'piece': self.piece_to_json(data[2])})
+
+        cells = []
+        for row, col in changed_cells:
+            piece = self.board.grid[row][col]
+            cells.append({
+                'row': row,
+                'col': col,
+                'piece': self.piece_to_json(piece) if piece is not None else None
+            })
+
+        return {
+            'full': False,
+            'version': self.state_version,
+            'since_version': since_version,
+            'cells': cells,
+            'hands': hand_ops,
+            'turn': self.turn_count,
+            'current_player': self.current_player.color,
+            'game_over': self.game_over,
+            'winner': self.winner.color if self.winner else None
+        }
+
+    # ==================== STATE MUTATION ====================
+    # All board and hand changes go through these helpers so that state
+    # versions, the change log and cached snapshots stay consistent
+    # ========================================================
+
+    def _changes_since(self, since_version):
+        """Change-log entries newer than since_version, or None if not retained"""
+        oldest = self._change_log[0][0] - 1 if self._change_log else self.state_version
+        if since_version is None or since_version < oldest or since_version > self.state_version:
+            return None
+        # Versions are consecutive, so the first newer entry is at a fixed offset
+        return self._change_log[since_version - oldest:]
+
+    def _record_change(self, kind, *data):
+        """Bump the state version and log what changed"""
+        self.state_version += 1
+        log = self._change_log
+        log.append((self.state_version, kind, data))
+        if len(log) > 2 * self.CHANGE_LOG_LIMIT:
+            del log[:len(log) - self.CHANGE_LOG_LIMIT]
+
+    def _record_op(self, *op):
+        """Remember a reversible operation for the undo step in progress"""
+        if self._action_ops is not None:
+            self._action_ops.append(op)
+
+    def _place_on_board(self, piece, row, col):
+        self.board.place_piece(piece, row, col)
+        self._record_change('cell', row, col)
+        self._record_op('place', row, col, piece)
+
+    def _remove_from_board(self, row, col):
+        piece = self.board.remove_piece(row, col)
+        if piece is not None:
+            self._record_change('cell', row, col)
+            self._record_op('remove', row, col, piece)
+        return piece
+
+    def _remove_disconnected(self, color):
+        removed = self.board.remove_disconnected_pieces(color)
+        for info in removed:
+            self._record_change('cell', info['row'], info['col'])
+            self._record_op('remove', info['row'], info['col'], info['piece'])
+        return removed
+
+    def _take_from_hand(self, player, index):
+        piece = player.pieces.pop(index)
+        self._record_change('hand_remove', player.color, index)
+        self._record_op('hand_remove', player.color, index, piece)
+        return piece
+
+    def _add_to_hand(self, player, piece):
+        self._insert_into_hand(player, len(player.pieces), piece)
+
+    def _insert_into_hand(self, player, index, piece):
+        player.pieces.insert(index, piece)
+        self._record_change('hand_insert', player.color, index, piece)
+        self._record_op('hand_insert', player.color, index, piece)
+
+    # ==================== UNDO / REDO ====================
+    # Methods decorated with @undoable record the operations above as one
+    # undo step, together with the turn state before and after. Undo reverts
+    # the operations in reverse order and redo re-applies them, so both cost
+    # only as much as the move's own effect (and never re-roll combat).
+    # ======================================================
+
+    def _turn_state(self):
+        return (self.turn_count, self.current_player.color, self.game_over,
+                self.winner.color if self.winner else None, self.last_placed_pos)
+
+    def _restore_turn_state(self, turn_state):
+        turn_count, current_color, game_over, winner_color, last_placed_pos = turn_state
+        self.turn_count = turn_count
+        if current_color != self.current_player.color:
+            self.current_player = self.red_player if current_color == 'R' else self.blue_player
+            self._record_change('turn')
+        self.game_over = game_over
+        self.winner = {'R': self.red_player, 'B': self.blue_player}.get(winner_color)
+        self.last_placed_pos = last_placed_pos
+
+    def _apply_op(self, op, reverse=False):
+        kind, first, second, piece = op
+        if reverse:
+            kind = {'place': 'remove', 'remove': 'place',
+                    'hand_remove': 'hand_insert', 'hand_insert': 'hand_remove'}[kind]
+        if kind == 'place':
+            self._place_on_board(piece, first, second)
+        elif kind == 'remove':
+            self._remove_from_board(first, second)
+        else:
+            player = self.red_player if first == 'R' else self.blue_player
+            if kind == 'hand_insert':
+                self._insert_into_hand(player, second, piece)
+            else:
+                self._take_from_hand(player, second)
+
+    def can_undo(self):
+        return bool(self._undo_stack)
+
+    def can_redo(self):
+        return bool(self._redo_stack)
+
+    def undo(self):
+        """
+        Take back the last move (or piece management action)
+
+        Returns:
+            dict with:
+                - success: bool
+                - message: str
+        """
+        if not self._undo_stack:
+            return {'success': False, 'message': 'Nothing to undo'}
+
+        action = self._undo_stack.pop()
+        for op in reversed(action['ops']):
+            self._apply_op(op, reverse=True)
+        del self.move_history[action['history_length']:]
+        self._restore_turn_state(action['before'])
+        self._redo_stack.append(action)
+        return {'success': True, 'message': f'Undid {action["name"]}'}
+
+    def redo(self):
+        """
+        Re-apply the last undone action exactly as it happened
+
+        Returns:
+            dict with:
+                - success: bool
+                - message: str
+                - events: events of the original move (empty for non-moves)
+        """
+        if not self._redo_stack:
+            return {'success': False, 'message': 'Nothing to redo', 'events': []}
+
+        action = self._redo_stack.pop()
+        for op in action['ops']:
+            self._apply_op(op)
+        self.move_history.extend(action['history'])
+        self._restore_turn_state(action['after'])
+        self._undo_stack.append(action)
+        return {'success': True, 'message': f'Redid {action["name"]}', 'events': action['events']}
+
+    def get_valid_moves(self, player_color=None, tokens=False):
         """
         Get all valid moves for a player
 
+        Legal cells are cached per pip shape and kept up to date from the
+        state change log: after a move only cells next to a changed cell are
+        re-checked (placement legality depends only on a cell and its eight
+        neighbours), and only shapes new to the hand are scanned in full.
+
+        With tokens=True every move also carries an opaque 'token', an HMAC
+        of the move and the current state version; execute_move skips
+        re-validating a move whose token is still current.
+
         Returns: list of valid move JSON objects
         """
         if player_color is None:
@@ -1954,27 +2705,182 @@ class BorderlineGPT:
             return []  # Can only get moves for current player
 
         valid_moves = []
-        player_pieces = self.board.get_player_pieces(player_color)
+        for piece_idx, rotation, row, col in self._valid_move_tuples():
+            move = {
+                'player': player_color,
+                'piece_index': piece_idx,
+                'position': [row, col],
+                'rotation': rotation
+            }
+            if tokens:
+                move['token'] = self._move_token(piece_idx, rotation, row, col)
+            valid_moves.append(move)
+        return valid_moves
 
-        for piece_idx, piece in enumerate(self.current_player.pieces):
-            # Try all rotations
-            for rotation in range(4):
-                # Convert rotation count to degrees
-                degrees = rotation * 90
-                rotated_piece = piece.rotate(degrees)
-
-                # Try all board positions
-                for row in range(self.board.height):
-                    for col in range(self.board.width):
-                        if self.board.can_place_piece(rotated_piece, row, col, player_pieces):
-                            valid_moves.append({
-                                'player': player_color,
-                                'piece_index': piece_idx,
-                                'position': [row, col],
-                                'rotation': rotation
-                            })
+    def iter_valid_moves(self, player_color=None, encoding='dict', tokens=False):
+        """
+        Yield valid moves lazily, in the same order as get_valid_moves
 
-        return valid_moves
+        Stops scanning as soon as the caller stops iterating. The game must not
+        be modified while the generator is in use.
+
+        Args:
+            player_color: Optional, defaults to current player
+            encoding: 'dict' for move JSON objects, 'tuple' for
+                      (piece_index, rotation, row, col), or 'packed' for
+                      integers from encode_move()
+            tokens: add move tokens to dicts (see get_valid_moves)
+        """
+        if encoding not in ('dict', 'tuple', 'packed'):
+            raise ValueError(f"Unknown move encoding: {encoding}")
+        if player_color is None:
+            player_color = self.current_player.color
+        if player_color != self.current_player.color:
+            return  # Can only get moves for current player
+
+        for move in self._iter_move_tuples():
+            if encoding == 'tuple':
+                yield move
+            elif encoding == 'packed':
+                yield encode_move(*move)
+            else:
+                piece_idx, rotation, row, col = move
+                move_json = {
+                    'player': player_color,
+                    'piece_index': piece_idx,
+                    'position': [row, col],
+                    'rotation': rotation
+                }
+                if tokens:
+                    move_json['token'] = self._move_token(*move)
+                yield move_json
+
+    def get_valid_moves_array(self, player_color=None):
+        """
+        Get all valid moves as a NumPy int16 array of shape (n, 4)
+
+        Columns are piece_index, rotation, row, col. Requires NumPy.
+        """
+        import numpy as np
+
+        if player_color is None:
+            player_color = self.current_player.color
+        if player_color != self.current_player.color:
+            return np.empty((0, 4), dtype=np.int16)
+        return np.array(self._valid_move_tuples(), dtype=np.int16).reshape(-1, 4)
+
+    def _move_token(self, piece_idx, rotation, row, col):
+        """Move tokens are '<state version>:<HMAC of the version and move>'"""
+        message = f"{self.state_version}:{piece_idx}:{rotation}:{row}:{col}".encode()
+        mac = hmac.new(self._token_salt, message, hashlib.sha256).hexdigest()[:32]
+        return f"{self.state_version}:{mac}"
+
+    def _has_current_token(self, move_json):
+        """
+        True if the move carries a token issued for exactly this move in the
+        current state, so it is known to be legal without re-checking it.
+        Any malformed field or mismatch means the move is validated in full.
+        """
+        token = move_json.get('token')
+        if not isinstance(token, str):
+            return False
+        position = move_json['position']
+        if not isinstance(position, (list, tuple)) or len(position) != 2:
+            return False
+        fields = (move_json['piece_index'], move_json['rotation'], position[0], position[1])
+        if not all(type(field) is int for field in fields):
+            return False
+        return hmac.compare_digest(token.encode(), self._move_token(*fields).encode())
+
+    def _valid_move_tuples(self):
+        """(piece_index, rotation, row, col) for the current player, cached per state version"""
+        cached = self._valid_moves_cache
+        if (cached is not None and cached[0] == self.current_player.color
+                and cached[1] == self.state_version and cached[2] is self.current_player):
+            return cached[3]
+
+        moves = list(self._scan_move_tuples())
+        self._valid_moves_cache = (self.current_player.color, self.state_version, self.current_player, moves)
+        return moves
+
+    def _iter_move_tuples(self):
+        """Cached move tuples if available, otherwise a lazy scan"""
+        cached = self._valid_moves_cache
+        if (cached is not None and cached[0] == self.current_player.color
+                and cached[1] == self.state_version and cached[2] is self.current_player):
+            return iter(cached[3])
+        return self._scan_move_tuples()
+
+    def _scan_move_tuples(self):
+        """Generate (piece_index, rotation, row, col) from the per-shape legal cells"""
+        color = self.current_player.color
+        shapes = self._legal_cells_by_shape(color)
+        width = self.board.width
+        for piece_idx, piece in enumerate(self.current_player.pieces):
+            for rotation, mask in enumerate(rotated_pip_masks(piece)):
+                cells = shapes.get(mask)
+                if cells is None:
+                    cells = shapes[mask] = self._scan_shape(color, mask)
+                # Lowest bit first gives the usual row-major order
+                while cells:
+                    low_bit = cells & -cells
+                    index = low_bit.bit_length() - 1
+                    yield piece_idx, rotation, index // width, index % width
+                    cells ^= low_bit
+
+    def _legal_cells_by_shape(self, color):
+        """
+        Map of rotated pip mask -> bitmask of cells where `color` may place it
+        (bit row * width + col), brought up to date with the change log
+        """
+        cache = self._legal_cells.get(color)
+        if cache is None or cache['board'] is not self.board:
+            cache = {'board': self.board, 'version': self.state_version, 'shapes': {}}
+            self._legal_cells[color] = cache
+        elif cache['version'] != self.state_version:
+            changes = self._changes_since(cache['version'])
+            if changes is None:
+                cache['shapes'] = {}  # Too far behind: rescan shapes lazily
+            else:
+                dirty = set()
+                for version, kind, data in changes:
+                    if kind == 'cell':
+                        row, col = data
+                        for r in range(max(row - 1, 0), min(row + 2, self.board.height)):
+                            for c in range(max(col - 1, 0), min(col + 2, self.board.width)):
+                                dirty.add((r, c))
+                for mask, cells in cache['shapes'].items():
+                    for row, col in dirty:
+                        bit = 1 << (row * self.board.width + col)
+                        if self._can_place_shape(color, mask, row, col):
+                            cells |= bit
+                        else:
+                            cells &= ~bit
+                    cache['shapes'][mask] = cells
+            cache['version'] = self.state_version
+        return cache['shapes']
+
+    def _scan_shape(self, color, mask):
+        """Bitmask of every cell where `color` may place the shape `mask`"""
+        cells = 0
+        for row in range(self.board.height):
+            for col in range(self.board.width):
+                if self._can_place_shape(color, mask, row, col):
+                    cells |= 1 << (row * self.board.width + col)
+        return cells
+
+    def _can_place_shape(self, color, mask, row, col):
+        """can_place_piece for a shape, checked against neighbouring pieces only"""
+        grid = self.board.grid
+        if grid[row][col] is not None:
+            return False
+        neighbours = []
+        for r in range(max(row - 1, 0), min(row + 2, self.board.height)):
+            for c in range(max(col - 1, 0), min(col + 2, self.board.width)):
+                piece = grid[r][c]
+                if piece is not None and piece.player_color == color:
+                    neighbours.append((r, c, piece))
+        return self.board.can_place_piece(shape_piece(color, mask), row, col, neighbours)
 
     def export_game(self, filename=None, auto_directory='previous_games'):
         """
@@ -1992,12 +2898,18 @@ class BorderlineGPT:
 
         # If auto_directory specified, ensure it exists and use it
         if auto_directory:
-            import os
             if not os.path.exists(auto_directory):
                 os.makedirs(auto_directory)
             filename = os.path.join(auto_directory, os.path.basename(filename))
 
-        game_export = {
+        with open(filename, 'w') as f:
+            json.dump(self.get_export_data(), f, indent=2)
+
+        return filename
+
+    def get_export_data(self):
+        """The dict export_game() writes: game id, players, move history and final state"""
+        return {
             'game_id': getattr(self, 'game_id', 'unknown'),
             'timestamp': datetime.now().isoformat(),
             'players': {
@@ -2010,11 +2922,6 @@ class BorderlineGPT:
             'winner': self.winner.color if self.winner else None
         }
 
-        with open(filename, 'w') as f:
-            json.dump(game_export, f, indent=2)
-
-        return filename
-
     @staticmethod
     def replay_game(filename):
         """
@@ -2031,7 +2938,7 @@ class BorderlineGPT:
 
         # Replay all moves
         for move in game_data['move_history']:
-            result = game.execute_move(move)
+            result = game.replay_move(move)
             if not result['valid']:
                 print(f"Warning: Move {move} failed during replay: {result['reason']}")
 
@@ -2082,6 +2989,7 @@ class BorderlineGPT:
         """
         return self.json_to_piece(piece_json)
 
+    @undoable
     def add_piece_to_hand(self, player_color, piece_or_json):
         """
         Add a piece to a player's hand
@@ -2110,7 +3018,7 @@ class BorderlineGPT:
             piece = piece_or_json
 
         # Add to player's hand
-        player.pieces.append(piece)
+        self._add_to_hand(player, piece)
         piece_index = len(player.pieces) - 1
 
         return {
@@ -2120,6 +3028,7 @@ class BorderlineGPT:
             'message': f'Piece added to {player_color} player hand at index {piece_index}'
         }
 
+    @undoable
     def remove_piece_from_hand(self, player_color, piece_index):
         """
         Remove a piece from a player's hand (without placing it)
@@ -2148,7 +3057,7 @@ class BorderlineGPT:
                 'message': f'Invalid piece_index: {piece_index}'
             }
 
-        removed_piece = player.pieces.pop(piece_index)
+        removed_piece = self._take_from_hand(player, piece_index)
 
         return {
             'success': True,
@@ -2262,6 +3171,7 @@ class BorderlineGPT:
 
         return add_result
 
+    @undoable
     def swap_pieces_between_players(self, red_piece_index, blue_piece_index):
         """
         Swap pieces between red and blue players
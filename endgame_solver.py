@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Borderline Endgame Solver
+Exact expectimax search once few pieces remain in the players' hands
+
+Under the execute_move rules every placement removes a piece from a hand and
+nothing returns to it, so the game tree below a small combined hand size is
+finite and can be searched to the end. Combat is a chance node weighted by
+the exact probability of the attacker winning the dice roll.
+
+The classic play_turn / play_game rules give captured and disconnected pieces
+back to a hand, so there the tree is not finite and play_turn does not
+consult the solver; it serves games played through execute_move (the GUI
+server, the engine server, choose_current_move).
+
+Solved positions are cached by position key in a table that can be saved to
+and loaded from a JSON file, so repeated endgames are answered instantly.
+With a table_file and save_every, the table is saved after every that many
+newly solved positions; servers also save it when they shut down.
+
+    from endgame_solver import EndgameSolver
+
+    game.endgame_solver = EndgameSolver(max_hand_size=3, table_file='endgame_table.json')
+
+One solver can be shared by many games (and threads): gui_server.py and
+engine_server.py attach theirs with --endgame_hand_size / --endgame_table.
+"""
+
+import copy
+import json
+import os
+import threading
+
+from borderline_gpt import combat_win_probability
+from position_index import encode_board, hash_position
+
+
+class EndgameSolver:
+    """Solve small endgames exactly and cache the results"""
+
+    def __init__(self, max_hand_size=3, table_file=None, save_every=None):
+        self.max_hand_size = max_hand_size  # Combined pieces in both hands
+        self.table_file = table_file
+        self.save_every = save_every  # Save table_file after this many new positions
+        self.table = {}  # key -> [red win prob, blue win prob, [pattern, rotation, row, col] or None]
+        self.nodes_searched = 0
+        self.unsaved = 0  # Positions solved since the last save
+        self.save_lock = threading.Lock()
+
+        if table_file and os.path.exists(table_file):
+            self.load(table_file)
+
+    def applies(self, game):
+        """True when the position is small enough to solve"""
+        hand_size = len(game.red_player.pieces) + len(game.blue_player.pieces)
+        return not game.game_over and hand_size <= self.max_hand_size
+
+    def solve(self, game, cancel_token=None):
+        """
+        Solve the current position of a BorderlineGPT game
+
+        cancel_token: optional CancellationToken checked at every search node
+
+        Returns:
+        {
+            "win_probability": {"R": 0.75, "B": 0.25},  # Draws make up the rest
+            "move": {...} or None  # Best move in execute_move format
+        }
+        """
+        board = copy.deepcopy(game.board)
+        hands = {'R': list(game.red_player.pieces), 'B': list(game.blue_player.pieces)}
+        to_move = game.current_player.color
+
+        p_red, p_blue, best = self._solve(board, hands, to_move, cancel_token)
+        if self.table_file and self.save_every and self.unsaved >= self.save_every:
+            self.save()
+
+        move = None
+        if best is not None:
+            pattern, rotation, row, col = best
+            for piece_idx, piece in enumerate(game.current_player.pieces):
+                if piece.get_pip_mask() == pattern:
+                    move = {
+                        'player': to_move,
+                        'piece_index': piece_idx,
+                        'position': [row, col],
+                        'rotation': rotation
+                    }
+                    break
+
+        return {'win_probability': {'R': p_red, 'B': p_blue}, 'move': move}
+
+    def choose_move(self, game, cancel_token=None):
+        """Return the move with maximal exact win probability, or None"""
+        return self.solve(game, cancel_token)['move']
+
+    def _legal_moves(self, board, hand, color):
+        """Distinct (piece_idx, pattern, rotation, rotated piece, row, col) moves"""
+        moves = []
+        current_pieces = board.get_player_pieces(color)
+        seen_patterns = set()
+
+        for piece_idx, piece in enumerate(hand):
+            pattern = piece.get_pip_mask()
+            if pattern in seen_patterns:
+                continue  # Identical pieces give identical moves
+            seen_patterns.add(pattern)
+
+            seen_rotations = set()
+            for rotation in range(4):
+                rotated = piece.rotate(rotation * 90)
+                rotated_mask = rotated.get_pip_mask()
+                if rotated_mask in seen_rotations:
+                    continue  # Symmetric pieces: rotation gives the same shape
+                seen_rotations.add(rotated_mask)
+
+                for row in range(board.height):
+                    for col in range(board.width):
+                        if board.can_place_piece(rotated, row, col, current_pieces):
+                            moves.append((piece_idx, pattern, rotation, rotated, row, col))
+        return moves
+
+    def _solve(self, board, hands, to_move, cancel_token=None):
+        """Return [red win prob, blue win prob, best move] for the player to move"""
+        if cancel_token is not None:
+            cancel_token.check()
+        key = hash_position(encode_board(board), to_move,
+                            [p.get_pip_mask() for p in hands['R']],
+                            [p.get_pip_mask() for p in hands['B']])
+        if key in self.table:
+            return self.table[key]
+
+        self.nodes_searched += 1
+        other = 'B' if to_move == 'R' else 'R'
+        moves = self._legal_moves(board, hands[to_move], to_move)
+
+        if not moves:
+            if not self._legal_moves(board, hands[other], other):
+                entry = [0.0, 0.0, None]  # Nobody can move: draw
+            else:
+                p_red, p_blue, _ = self._solve(board, hands, other, cancel_token)
+                entry = [p_red, p_blue, None]  # Pass
+        else:
+            entry = None
+            for piece_idx, pattern, rotation, rotated, row, col in moves:
+                p_red, p_blue = self._play(board, hands, to_move, piece_idx, rotated, row, col, cancel_token)
+                mine, theirs = (p_red, p_blue) if to_move == 'R' else (p_blue, p_red)
+                if entry is None or (mine, -theirs) > entry[3]:
+                    entry = [p_red, p_blue, [pattern, rotation, row, col], (mine, -theirs)]
+                if mine >= 1.0:
+                    break  # Cannot do better than a certain win
+            entry = entry[:3]
+
+        self.table[key] = entry
+        self.unsaved += 1
+        return entry
+
+    def _play(self, board, hands, color, piece_idx, rotated, row, col, cancel_token=None):
+        """Apply a move (mirroring execute_move), score it, and undo it"""
+        other = 'B' if color == 'R' else 'R'
+        piece = hands[color].pop(piece_idx)
+
+        all_pieces = board.get_player_pieces('R') + board.get_player_pieces('B')
+        adjacent_pips = board.check_pip_adjacency(rotated, row, col, all_pieces)
+        board.place_piece(rotated, row, col)
+
+        defending_positions = set()
+        for contact in adjacent_pips:
+            if not contact['same_color']:
+                defending_positions.add(contact['exist_pos'][:2])
+
+        if not defending_positions:
+            value = self._after_move(board, hands, color, cancel_token)
+        else:
+            defenders = [(r, c, board.grid[r][c]) for r, c in defending_positions]
+            p_win = combat_win_probability(rotated, [p for _, _, p in defenders])
+
+            win_value = lose_value = (0.0, 0.0)
+            if p_win > 0:
+                for r, c, _ in defenders:
+                    board.remove_piece(r, c)
+                disconnected = board.remove_disconnected_pieces(other)
+                win_value = self._after_move(board, hands, color, cancel_token)
+                for removed in disconnected:
+                    board.place_piece(removed['piece'], removed['row'], removed['col'])
+                for r, c, p in defenders:
+                    board.place_piece(p, r, c)
+
+            if p_win < 1:
+                board.remove_piece(row, col)
+                disconnected = board.remove_disconnected_pieces(color)
+                lose_value = self._after_move(board, hands, color, cancel_token)
+                for removed in disconnected:
+                    board.place_piece(removed['piece'], removed['row'], removed['col'])
+                board.place_piece(rotated, row, col)
+
+            value = (p_win * win_value[0] + (1 - p_win) * lose_value[0],
+                     p_win * win_value[1] + (1 - p_win) * lose_value[1])
+
+        board.remove_piece(row, col)
+        hands[color].insert(piece_idx, piece)
+        return value
+
+    def _after_move(self, board, hands, color, cancel_token=None):
+        """Value of the position after `color` moved: check victory, then recurse"""
+        if board.check_victory(color):
+            return (1.0, 0.0) if color == 'R' else (0.0, 1.0)
+        other = 'B' if color == 'R' else 'R'
+        p_red, p_blue, _ = self._solve(board, hands, other, cancel_token)
+        return p_red, p_blue
+
+    def save(self, filename=None):
+        """Save the solved-position table as JSON"""
+        with self.save_lock:
+            self.unsaved = 0
+            table = dict(self.table)  # Other threads may keep solving meanwhile
+            with open(filename or self.table_file, 'w') as f:
+                json.dump(table, f, separators=(',', ':'))
+
+    def save_if_changed(self):
+        """Save to table_file if positions were solved since the last save (e.g. on shutdown)"""
+        if self.table_file and self.unsaved:
+            self.save()
+
+    def load(self, filename=None):
+        """Merge a table saved with save() into the cache"""
+        with open(filename or self.table_file, 'r') as f:
+            self.table.update(json.load(f))
+
+
+def add_endgame_arguments(parser):
+    """Add the --endgame_* options used by the servers to an argparse parser"""
+    parser.add_argument('--endgame_hand_size', type=int, default=0,
+                        help='Solve AI moves exactly at or below this combined hand size (0 = off)')
+    parser.add_argument('--endgame_table', help='Endgame table file to load and keep saved')
+    parser.add_argument('--endgame_save_every', type=int, default=1000,
+                        help='Save the endgame table after this many newly solved positions')
+
+
+def solver_from_args(args):
+    """Create an EndgameSolver from parsed --endgame_* options, or None when off"""
+    if not args.endgame_hand_size:
+        return None
+    return EndgameSolver(args.endgame_hand_size, args.endgame_table, args.endgame_save_every)
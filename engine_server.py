@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Borderline Engine Server
+Headless, line-delimited JSON-RPC 2.0 access to the BorderlineGPT API
+
+Each request and each response is one JSON object on its own line:
+
+    --> {"jsonrpc": "2.0", "id": 1, "method": "new_game", "params": {"red_strategy": "aggressive"}}
+    <-- {"jsonrpc": "2.0", "id": 1, "result": {"game_id": "3f9c0a1b2d4e", "game_state": {...}}}
+    --> {"jsonrpc": "2.0", "id": 2, "method": "get_valid_moves", "params": {"game_id": "3f9c0a1b2d4e"}}
+
+Many games are hosted at once, keyed by game_id, and any connection may use
+any game. Requests on one game are serialized; different games run
+concurrently (one thread per connection).
+
+    python engine_server.py --port 8765
+    python engine_server.py --unix /tmp/borderline.sock
+"""
+
+import json
+import os
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from borderline_gpt import BorderlineGPT, GamePiece, serialize_piece
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+GAME_NOT_FOUND = -32001
+TOO_MANY_GAMES = -32002
+
+# Longest request line accepted (bytes, including the newline); longer lines
+# get an error and the connection is closed
+MAX_LINE = 1 << 20
+
+
+def _json_default(obj):
+    """Encode GamePiece objects (e.g. in combat events) like the state does"""
+    if isinstance(obj, GamePiece):
+        return serialize_piece(obj)
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+def client_move(move):
+    """A move from a client, without the recorded dice only replays may use"""
+    if isinstance(move, dict) and 'combat_rolls' in move:
+        move = {key: value for key, value in move.items() if key != 'combat_rolls'}
+    return move
+
+
+class RPCError(Exception):
+    """Error returned to the client as a JSON-RPC error object"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class GameRegistry:
+    """
+    Thread-safe map of game_id -> (BorderlineGPT, lock)
+
+    Games are kept in least-recently-used order. Games unused for
+    idle_timeout seconds are evicted when a new game is added, so clients
+    that never call close_game cannot fill the registry for good.
+    """
+
+    def __init__(self, max_games=10000, idle_timeout=3600):
+        self.max_games = max_games
+        self.idle_timeout = idle_timeout  # Seconds, or None to keep games until closed
+        self.games = OrderedDict()  # game_id -> (game, lock), least recently used first
+        self.last_used = {}  # game_id -> time.monotonic() of the last request
+        self.lock = threading.Lock()
+
+    def add(self, game):
+        with self.lock:
+            self._evict_idle()
+            if len(self.games) >= self.max_games:
+                raise RPCError(TOO_MANY_GAMES, f'Game limit reached ({self.max_games}); close some games first')
+            game_id = uuid.uuid4().hex[:12]
+            game.game_id = game_id
+            self.games[game_id] = (game, threading.Lock())
+            self.last_used[game_id] = time.monotonic()
+        return game_id
+
+    def get(self, game_id):
+        with self.lock:
+            entry = self.games.get(game_id)
+            if entry is not None:
+                self.games.move_to_end(game_id)
+                self.last_used[game_id] = time.monotonic()
+        if entry is None:
+            raise RPCError(GAME_NOT_FOUND, f'No game with id {game_id}')
+        return entry
+
+    def _evict_idle(self):
+        """Drop games idle for longer than idle_timeout (call with self.lock held)"""
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        while self.games:
+            game_id = next(iter(self.games))
+            if self.last_used[game_id] > cutoff:
+                break
+            del self.games[game_id]
+            del self.last_used[game_id]
+
+    def remove(self, game_id):
+        with self.lock:
+            self.last_used.pop(game_id, None)
+            return self.games.pop(game_id, None) is not None
+
+    def ids(self):
+        with self.lock:
+            return list(self.games)
+
+
+class EngineRPC:
+    """Dispatch JSON-RPC requests to BorderlineGPT games"""
+
+    # Methods that take a game_id and run with that game's lock held
+    GAME_METHODS = ('execute_move', 'execute_moves', 'get_valid_moves', 'get_game_state',
+                    'get_state_delta', 'get_move_history', 'fork', 'export', 'undo', 'redo',
+                    'ai_move', 'close_game')
+
+    def __init__(self, registry=None, endgame_solver=None):
+        self.registry = registry or GameRegistry()
+        self.endgame_solver = endgame_solver  # Shared by every game (see endgame_solver.py)
+
+    def handle_line(self, line):
+        """Handle one request line and return the response line (or None for notifications)"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self._encode(None, error=RPCError(PARSE_ERROR, f'Parse error: {e}'))
+
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return self._encode(None, error=RPCError(INVALID_REQUEST, 'Invalid request'))
+
+        request_id = request.get('id')
+        try:
+            result = self.dispatch(request['method'], request.get('params') or {})
+        except RPCError as e:
+            error = e
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            error = RPCError(INVALID_PARAMS, f'Invalid params: {e!r}')
+        except Exception as e:
+            error = RPCError(INTERNAL_ERROR, f'Internal error: {e!r}')
+        else:
+            error = None
+
+        if 'id' not in request:
+            return None  # Notification: no response, not even for errors
+        if error is not None:
+            return self._encode(request_id, error=error)
+        try:
+            return self._encode(request_id, result=result)
+        except (TypeError, ValueError) as e:
+            return self._encode(request_id, error=RPCError(INTERNAL_ERROR, f'Unencodable result: {e}'))
+
+    def dispatch(self, method, params):
+        """Call an RPC method with a params dict and return its result"""
+        if not isinstance(params, dict):
+            raise RPCError(INVALID_PARAMS, 'params must be an object')
+
+        if method == 'new_game':
+            return self.new_game(**params)
+        if method == 'list_games':
+            return {'game_ids': self.registry.ids()}
+        if method not in self.GAME_METHODS:
+            raise RPCError(METHOD_NOT_FOUND, f'Method not found: {method}')
+
+        params = dict(params)
+        game_id = params.pop('game_id')
+        game, lock = self.registry.get(game_id)
+        with lock:
+            return getattr(self, 'rpc_' + method)(game_id, game, **params)
+
+    def _encode(self, request_id, result=None, error=None):
+        response = {'jsonrpc': '2.0', 'id': request_id}
+        if error is not None:
+            response['error'] = {'code': error.code, 'message': error.message}
+        else:
+            response['result'] = result
+        return json.dumps(response, separators=(',', ':'), default=_json_default)
+
+    # ==================== METHODS ====================
+
+    def new_game(self, red_strategy='default', blue_strategy='default', blue_random=False,
+                 include_state=True):
+        game = BorderlineGPT(red_strategy=red_strategy, blue_strategy=blue_strategy,
+                             blue_random=blue_random)
+        game.endgame_solver = self.endgame_solver
+        game_id = self.registry.add(game)
+        result = {'game_id': game_id}
+        if include_state:
+            result['game_state'] = game.get_game_state()
+        return result
+
+    def rpc_execute_move(self, game_id, game, move, include_state=True):
+        """Execute a client's move; combat dice are always rolled by the engine"""
+        move = client_move(move)
+        if include_state:
+            return game.execute_move(move)
+        return game.execute_moves([move], return_state='none')['results'][0]
+
+    def rpc_execute_moves(self, game_id, game, moves, return_state='final'):
+        return game.execute_moves([client_move(move) for move in moves], return_state=return_state)
+
+    def rpc_get_valid_moves(self, game_id, game, player_color=None, tokens=False, encoding='dict'):
+        if encoding == 'dict':
+            return game.get_valid_moves(player_color, tokens=tokens)
+        return list(game.iter_valid_moves(player_color, encoding=encoding))
+
+    def rpc_get_game_state(self, game_id, game):
+        return game.get_game_state()
+
+    def rpc_get_state_delta(self, game_id, game, since_version=None):
+        return game.get_state_delta(since_version)
+
+    def rpc_get_move_history(self, game_id, game):
+        return game.get_move_history()
+
+    def rpc_fork(self, game_id, game, include_state=False):
+        fork = game.fork()
+        fork_id = self.registry.add(fork)
+        result = {'game_id': fork_id}
+        if include_state:
+            result['game_state'] = fork.get_game_state()
+        return result
+
+    def rpc_export(self, game_id, game):
+        return game.get_export_data()
+
+    def rpc_undo(self, game_id, game):
+        return game.undo()
+
+    def rpc_redo(self, game_id, game):
+        return game.redo()
+
+    def rpc_ai_move(self, game_id, game, include_state=True):
+        """Let the engine's own player move for the current side"""
+        if game.game_over:
+            return {'valid': False, 'reason': 'Game is over', 'passed': False}
+
+        piece, row, col, rotation, piece_idx = game.choose_current_move()
+        if piece is None:
+            # No legal move: pass the turn (game.switch_player records the change)
+            game.switch_player()
+            game.turn_count += 1
+            result = {'valid': True, 'passed': True, 'move': None}
+            if include_state:
+                result['game_state'] = game.get_game_state()
+            return result
+
+        move = {
+            'player': game.current_player.color,
+            'piece_index': piece_idx,
+            'position': [row, col],
+            'rotation': rotation // 90
+        }
+        result = self.rpc_execute_move(game_id, game, move, include_state)
+        result['passed'] = False
+        result['move'] = move
+        return result
+
+    def rpc_close_game(self, game_id, game):
+        return {'closed': self.registry.remove(game_id)}
+
+
+class EngineRequestHandler(socketserver.StreamRequestHandler):
+    """One connection: read request lines, write response lines"""
+
+    def handle(self):
+        rpc = self.server.rpc
+        while True:
+            line = self.rfile.readline(MAX_LINE + 1)
+            if not line:
+                break
+            if len(line) > MAX_LINE:
+                error = RPCError(INVALID_REQUEST, f'Request line longer than {MAX_LINE} bytes')
+                self.wfile.write(rpc._encode(None, error=error).encode() + b'\n')
+                break  # The rest of the line cannot be skipped cheaply: close
+            if not line.strip():
+                continue
+            response = rpc.handle_line(line)
+            if response is not None:
+                self.wfile.write(response.encode() + b'\n')
+
+
+class EngineTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, rpc=None):
+        self.rpc = rpc or EngineRPC()
+        super().__init__(address, EngineRequestHandler)
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class EngineUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path, rpc=None):
+            self.rpc = rpc or EngineRPC()
+            if os.path.exists(path):
+                os.unlink(path)
+            super().__init__(path, EngineRequestHandler)
+
+
+def create_server(host='127.0.0.1', port=8765, unix_socket=None, max_games=10000, endgame_solver=None,
+                  idle_timeout=3600):
+    """Create a TCP (or Unix socket) engine server; call serve_forever() on it"""
+    rpc = EngineRPC(GameRegistry(max_games=max_games, idle_timeout=idle_timeout), endgame_solver)
+    if unix_socket:
+        return EngineUnixServer(unix_socket, rpc)
+    return EngineTCPServer((host, port), rpc)
+
+
+if __name__ == '__main__':
+    import argparse
+    from endgame_solver import add_endgame_arguments, solver_from_args
+
+    parser = argparse.ArgumentParser(description='Headless Borderline engine server (line-delimited JSON-RPC)')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host to bind')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to bind')
+    parser.add_argument('--unix', help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--max_games', type=int, default=10000, help='Maximum concurrent games')
+    parser.add_argument('--idle_timeout', type=float, default=3600,
+                        help='Evict games unused for this many seconds (0 = never)')
+    add_endgame_arguments(parser)
+    args = parser.parse_args()
+
+    endgame_solver = solver_from_args(args)
+
+    server = create_server(args.host, args.port, args.unix, args.max_games, endgame_solver,
+                           args.idle_timeout or None)
+    print("=" * 60)
+    print("BORDERLINE - Engine Server")
+    print("=" * 60)
+    print(f"Listening on {args.unix or f'{args.host}:{args.port}'}")
+    print("Press Ctrl+C to stop")
+    print("=" * 60)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if endgame_solver is not None:
+            endgame_solver.save_if_changed()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Borderline Game Archive
+Bulk, memory-mapped storage of archived games for offline analysis
+
+An archive is built once from exported game JSON files (see
+BorderlineGPT.export_game) and stored as two NumPy .npy files:
+
+    <name>.npy        - one MOVE_DTYPE record per move of every game
+    <name>.games.npy  - one GAME_DTYPE record per game (id, winner, move slice)
+
+Both files are opened with mmap_mode='r', so scanning millions of moves
+never creates per-move Python dicts.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from borderline_gpt import BorderlineGPT, find_game_files
+
+# Combat outcome codes stored in the 'combat' field
+COMBAT_NONE = 0
+COMBAT_ATTACKER_WON = 1
+COMBAT_DEFENDER_WON = 2
+COMBAT_UNKNOWN = -1  # Exported without its dice (see encode_game): outcome not known
+
+MOVE_DTYPE = np.dtype([
+    ('game_id', np.int32),    # Index into the games table
+    ('turn', np.int16),       # Turn number the move was played on
+    ('player', 'S1'),         # b'R' or b'B'
+    ('pattern', np.uint16),   # 9-bit pip mask of the piece as held in hand
+    ('rotation', np.uint8),   # Number of 90-degree clockwise rotations (0-3)
+    ('row', np.uint8),
+    ('col', np.uint8),
+    ('combat', np.int8),      # COMBAT_NONE / _ATTACKER_WON / _DEFENDER_WON / _UNKNOWN
+])
+
+GAME_DTYPE = np.dtype([
+    ('game_id', 'S32'),       # Original game_id string from the export
+    ('winner', 'S1'),         # b'R', b'B' or b'' for no winner
+    ('first_move', np.int64), # Offset of the game's first move in the moves array
+    ('move_count', np.int32),
+])
+
+
+def _npy_path(archive_path):
+    """np.save appends '.npy' to bare names; mirror that when reading"""
+    if archive_path.endswith('.npy'):
+        return archive_path
+    return archive_path + '.npy'
+
+
+def games_path(archive_path):
+    """Return the path of the games table that accompanies an archive"""
+    root, _ = os.path.splitext(_npy_path(archive_path))
+    return root + '.games.npy'
+
+
+def encode_game(game_data, game_index):
+    """
+    Replay one exported game and encode its moves as MOVE_DTYPE records
+
+    Combats are resolved with the recorded dice. Older exports have none:
+    from the first combat without dice on, the replayed board may differ
+    from the real game, so that move and every later one are stored with
+    COMBAT_UNKNOWN. Hands only ever lose the placed piece, so their pip
+    patterns are still exact.
+
+    Args:
+        game_data: dict loaded from an exported game JSON file
+        game_index: value stored in each record's game_id field
+
+    Returns: (moves array, winner color or None) - the winner as exported
+    """
+    game = BorderlineGPT()
+    hands = None  # Once the replay is unreliable: color -> remaining hand
+    records = []
+
+    for move in game_data.get('move_history', []):
+        player = move['player'] if hands is not None else game.current_player.color
+        hand = hands[player] if hands is not None else game.current_player.pieces
+        turn = move.get('turn', game.turn_count)
+        piece_idx = move.get('piece_index', -1)
+        if 0 <= piece_idx < len(hand):
+            pattern = hand[piece_idx].get_pip_mask()
+        else:
+            pattern = 0
+
+        if hands is not None:
+            combat_outcome = COMBAT_UNKNOWN
+            if 0 <= piece_idx < len(hand):
+                hand.pop(piece_idx)
+        else:
+            recorded = 'combat_rolls' in move
+            result = game.replay_move(move)
+            if not result['valid']:
+                print(f"Warning: Move {move} failed during archiving: {result['reason']}")
+                continue
+
+            combat_outcome = COMBAT_NONE
+            for event in result['events']:
+                if event['type'] == 'combat':
+                    combat = event['combat_data']
+                    if not recorded:
+                        # Rolled now, not recorded: do not invent an outcome
+                        combat_outcome = COMBAT_UNKNOWN
+                        hands = {'R': list(game.red_player.pieces), 'B': list(game.blue_player.pieces)}
+                    elif combat['winner'] == combat['attacker_color']:
+                        combat_outcome = COMBAT_ATTACKER_WON
+                    else:
+                        combat_outcome = COMBAT_DEFENDER_WON
+
+        row, col = move['position']
+        records.append((game_index, turn, move['player'],
+                        pattern, move['rotation'] % 4, row, col, combat_outcome))
+
+    if 'winner' in game_data:
+        winner = game_data['winner']
+    else:
+        winner = game.winner.color if game.winner and hands is None else None
+    return np.array(records, dtype=MOVE_DTYPE), winner
+
+
+def build_archive(sources, archive_path):
+    """
+    Build a memory-mappable archive from exported game files
+
+    Args:
+        sources: directory of exported games, a single file, or a list of files
+        archive_path: path of the moves file to write (e.g. 'games.npy')
+
+    Returns: number of games archived
+    """
+    move_chunks = []
+    games = []
+    offset = 0
+
+    for filename in find_game_files(sources):
+        with open(filename, 'r') as f:
+            game_data = json.load(f)
+
+        if not game_data.get('move_history'):
+            continue
+
+        moves, winner = encode_game(game_data, len(games))
+        move_chunks.append(moves)
+        games.append((str(game_data.get('game_id', 'unknown')).encode()[:32],
+                      (winner or '').encode(), offset, len(moves)))
+        offset += len(moves)
+
+    if move_chunks:
+        all_moves = np.concatenate(move_chunks)
+    else:
+        all_moves = np.zeros(0, dtype=MOVE_DTYPE)
+
+    np.save(_npy_path(archive_path), all_moves)
+    np.save(games_path(archive_path), np.array(games, dtype=GAME_DTYPE))
+
+    return len(games)
+
+
+class GameArchive:
+    """Read-only, memory-mapped view over an archive built by build_archive()"""
+
+    def __init__(self, archive_path):
+        self.path = _npy_path(archive_path)
+        self.moves = np.load(self.path, mmap_mode='r')
+        self.games = np.load(games_path(archive_path), mmap_mode='r')
+
+    def __len__(self):
+        """Number of games in the archive"""
+        return len(self.games)
+
+    @property
+    def move_count(self):
+        return len(self.moves)
+
+    def game_moves(self, game_index):
+        """Return the (zero-copy) slice of moves belonging to one game"""
+        game = self.games[game_index]
+        start = int(game['first_move'])
+        return self.moves[start:start + int(game['move_count'])]
+
+    def winners(self):
+        """Winner of each move's game, aligned with self.moves (b'' for no winner)"""
+        return self.games['winner'][self.moves['game_id']]
+
+    def placement_heatmap(self, player=None):
+        """
+        Count placements per board cell
+
+        Args:
+            player: Optional 'R' or 'B' to restrict to one player's moves
+
+        Returns: 8x6 array of placement counts
+        """
+        moves = self.moves
+        if player is not None:
+            moves = moves[moves['player'] == player.encode()]
+        cells = moves['row'].astype(np.intp) * 6 + moves['col']
+        return np.bincount(cells, minlength=48).reshape(8, 6)
+
+    def pattern_counts(self):
+        """Return {pip mask: number of times a piece with that pattern was played}"""
+        patterns, counts = np.unique(self.moves['pattern'], return_counts=True)
+        return dict(zip(patterns.tolist(), counts.tolist()))
+
+    def combat_summary(self):
+        """Return counts of moves with no combat, attacker wins, defender wins and unknown outcomes"""
+        combat = self.moves['combat']
+        counts = np.bincount(combat[combat >= 0].astype(np.intp), minlength=3)
+        return {
+            'no_combat': int(counts[COMBAT_NONE]),
+            'attacker_won': int(counts[COMBAT_ATTACKER_WON]),
+            'defender_won': int(counts[COMBAT_DEFENDER_WON]),
+            'unknown': int(np.count_nonzero(combat == COMBAT_UNKNOWN))
+        }
+
+    def opening_moves(self, ply):
+        """Return the moves played at a given ply (0 = first move) of every game"""
+        long_enough = self.games['move_count'] > ply
+        offsets = self.games['first_move'][long_enough] + ply
+        return self.moves[offsets]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or inspect a Borderline game archive')
+    parser.add_argument('archive', help='Archive file (.npy)')
+    parser.add_argument('--build', metavar='SOURCE', nargs='+',
+                        help='Exported game files or directories to archive')
+    args = parser.parse_args()
+
+    if args.build:
+        count = build_archive(args.build, args.archive)
+        print(f"Archived {count} games to {args.archive}")
+
+    archive = GameArchive(args.archive)
+    print(f"Games: {len(archive)}")
+    print(f"Moves: {archive.move_count}")
+    print(f"Combat: {archive.combat_summary()}")
+    print("Placement heatmap:")
+    print(archive.placement_heatmap())
@@ -4,41 +4,348 @@ Borderline GUI Server
 Flask + Socket.IO server for web-based GUI
 """
 
-from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import borderline_gpt
 from borderline_gpt import BorderlineGPT
+from position_index import position_key
+from instrumentation import instrumentation
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import base64
+import functools
+import gzip
+import hashlib
+import json
 import sys
 import os
+import threading
+import time
+import types
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'borderline_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Global game state
-current_game = None
-game_sessions = {}
-pending_placement = None  # Stores {piece, row, col, rotation, piece_index}
-replay_state = None  # Stores {game: BorderlineGPT, move_history: [], current_move: int, is_playing: bool}
+class FlaskTransport:
+    """
+    How the event handlers reach clients under Flask-SocketIO
+
+    Handlers never call Flask-SocketIO directly, so asgi_server.py can run
+    them unchanged behind an asyncio Socket.IO server by swapping in its own
+    transport with the same methods.
+    """
+
+    def sid(self):
+        """Socket.IO session id of the client that sent the current event"""
+        return request.sid
+
+    def arg(self, name):
+        """Query string argument the current client connected with"""
+        return request.args.get(name)
+
+    def reply(self, event, data):
+        """Emit to the client that sent the current event"""
+        emit(event, data)
+
+    def send(self, event, data, to):
+        """Emit to a room or a single client (safe from any thread)"""
+        socketio.emit(event, data, to=to)
+
+    def join(self, sid, room):
+        join_room(room, sid=sid)
+
+    def leave(self, sid, room):
+        leave_room(room, sid=sid)
+
+    def register(self, handlers):
+        """Register event -> handler functions with Flask-SocketIO"""
+        for event, handler in handlers.items():
+            socketio.on(event)(handler)
+
+transport = FlaskTransport()
+
+# Socket.IO event -> handler function. The handlers below add themselves with
+# @event_handler and are registered with Flask-SocketIO at the end of this
+# module; asgi_server.py registers the same table on its own server
+EVENT_HANDLERS = {}
+
+def event_handler(event):
+    """Decorator: make the function the handler of a Socket.IO event"""
+    def add(handler):
+        EVENT_HANDLERS[event] = handler
+        return handler
+    return add
+
+def current_sid():
+    return transport.sid()
+
+def reply(event, data=None):
+    if data is not None:
+        observe_emit(event, data)
+    transport.reply(event, data)
+
+# AI players answer early turns from the opening book when one has been built
+# (python3 opening_book.py previous_games/ --self_play 50)
+OPENING_BOOK_FILE = 'opening_book.json'
+if os.path.exists(OPENING_BOOK_FILE):
+    from opening_book import OpeningBook
+    borderline_gpt.AIPlayer.opening_book = OpeningBook.load(OPENING_BOOK_FILE)
+
+# Optional EndgameSolver attached to every new game; set from the command line
+# (python3 gui_server.py --endgame_hand_size 3 --endgame_table endgame_table.json)
+endgame_solver = None
+
+# Set BORDERLINE_INSTRUMENT=1 to time the engine's hot paths (instrumentation.py);
+# the histograms are then part of /metrics
+if os.environ.get('BORDERLINE_INSTRUMENT'):
+    instrumentation.enable()
+
+# Set BORDERLINE_EMIT_SIZES=1 to record emitted payload sizes in /metrics. Measuring
+# encodes every payload to JSON once more, so it is off by default
+measure_emit_sizes = bool(os.environ.get('BORDERLINE_EMIT_SIZES'))
+
+# Per-room game state. Every browser joins a Socket.IO room (its own sid, or
+# the ?room= it connected with) and all emits go to that room only, so one
+# server process hosts many independent games. Clients connecting with
+# ?role=spectator watch a room read-only (see publish_to_spectators).
+game_sessions = {}  # room -> {room, game, pending_placement, replay_state, members, spectators, ...}
+client_rooms = {}  # sid -> room
+
+# ==================== METRICS ====================
+# Served at /metrics in the Prometheus text format
+
+metrics = MetricsRegistry()
+
+def count_sessions(predicate):
+    return sum(1 for game_session in list(game_sessions.values()) if predicate(game_session))
+
+metrics.gauge('borderline_sessions', 'Rooms with state on this server', lambda: len(game_sessions))
+metrics.gauge('borderline_active_games', 'Rooms with a game in progress (not over, not a replay)',
+              lambda: count_sessions(lambda s: s['game'] is not None and not s['game'].game_over
+                                     and s['replay_state'] is None))
+metrics.gauge('borderline_replays', 'Rooms with a replay loaded',
+              lambda: count_sessions(lambda s: s['replay_state'] is not None))
+metrics.gauge('borderline_connected_clients', 'Connected Socket.IO clients by role',
+              lambda: [({'role': 'player'}, sum(len(s['members']) for s in list(game_sessions.values()))),
+                       ({'role': 'spectator'}, sum(len(s['spectators']) for s in list(game_sessions.values())))])
+AI_MOVE_SECONDS = metrics.histogram('borderline_ai_move_seconds',
+                                    'AI move search time per strategy class', ['strategy'])
+metrics.counter_callback('borderline_ai_ponder_hits', 'AI turns answered from pondered replies',
+                         lambda: ai_scheduler.ponder_hits)
+EXECUTE_MOVE_SECONDS = metrics.histogram('borderline_execute_move_seconds',
+                                         'Time to execute a move, by who made it', ['source'])
+EMIT_BYTES = metrics.histogram('borderline_emit_payload_bytes',
+                               'JSON size of emitted payloads per event (with BORDERLINE_EMIT_SIZES=1)',
+                               ['event'], buckets=SIZE_BUCKETS)
+REPLAY_LOADS = metrics.counter('borderline_replay_loads', 'Replays loaded, by source', ['source'])
+metrics.counter_callback('borderline_replay_cache_hits', 'Replay loads served from the replay cache',
+                         lambda: replay_cache.stats()['hits'])
+metrics.counter_callback('borderline_replay_cache_misses', 'Replay loads that had to prepare the replay',
+                         lambda: replay_cache.stats()['misses'])
+metrics.gauge('borderline_replay_cache_bytes', 'Memory held by the cached replays',
+              lambda: replay_cache.stats()['bytes'])
+metrics.gauge('borderline_replay_cache_entries', 'Replays in the replay cache',
+              lambda: replay_cache.stats()['entries'])
+
+def engine_call_metrics():
+    """Engine hook histograms from instrumentation.py, while it is enabled"""
+    if not instrumentation.enabled:
+        return []
+    name = 'borderline_engine_call_seconds'
+    lines = [f'# HELP {name} Engine hot path call time (instrumentation.py)', f'# TYPE {name} histogram']
+    for hook, stats in instrumentation.snapshot()['totals'].items():
+        cumulative = 0
+        for bound, n in stats['buckets'].items():
+            cumulative += n
+            lines.append(f'{name}_bucket{{hook="{hook}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{hook="{hook}"}} {stats["total_s"]!r}')
+        lines.append(f'{name}_count{{hook="{hook}"}} {stats["count"]}')
+    return lines
+
+metrics.collectors.append(engine_call_metrics)
+
+def payload_size(data):
+    """Bytes of a payload as JSON"""
+    return len(json.dumps(data, separators=(',', ':')))
+
+def observe_emit(event, data):
+    """Record an emitted payload's size, when enabled (see measure_emit_sizes)"""
+    if measure_emit_sizes:
+        EMIT_BYTES.observe(payload_size(data), event=event)
+
+def execute_one(game, move, source):
+    """Execute one move without building a state snapshot, timed for /metrics
+    (replayed moves, source 'replay', use their recorded combat dice)"""
+    start = time.perf_counter()
+    result = game.execute_moves([move], return_state='none', replay=source == 'replay')['results'][0]
+    EXECUTE_MOVE_SECONDS.observe(time.perf_counter() - start, source=source)
+    return result
+
+def new_session(room):
+    """Create empty game state for a room"""
+    return {
+        'room': room,
+        'game': None,
+        'pending_placement': None,  # Stores {piece, row, col, rotation, piece_index}
+        'replay_state': None,  # Stores {game: BorderlineGPT, move_history: [], current_move: int, is_playing: bool}
+        'members': set(),
+        'lock': threading.RLock(),  # Guards game mutations against AI workers
+        'ai_future': None,  # AI turn in flight (see AITurnScheduler)
+        'ai_cancel': None,  # CancellationToken of that turn
+        'ponder': None,  # Background search during the human's turn (see AITurnScheduler.ponder)
+        'sent_version': None,  # Game state version of the last update sent to the room (see room_delta)
+        'spectators': {},  # sid -> {'ready': bool, 'behind': bool}; ready ones are in spectator_room
+        'spectator_snapshot': None  # (version, message) of the last catch-up state sent
+    }
+
+def get_session():
+    """Game state for the room of the client that sent the current event"""
+    sid = current_sid()
+    room = client_rooms.get(sid, sid)
+    game_session = game_sessions.get(room)
+    if game_session is None:
+        game_session = game_sessions[room] = new_session(room)
+    return game_session
+
+def players_only(handler):
+    """Reject events that change the game when they come from a spectator"""
+    @functools.wraps(handler)
+    def wrapper(*args):
+        if current_sid() in get_session()['spectators']:
+            reply('error', {'message': 'Spectators cannot change the game'})
+            return None
+        return handler(*args)
+    return wrapper
+
+def room_emit(game_session, event, data):
+    """Emit an event to the room's players and its spectators"""
+    observe_emit(event, data)
+    transport.send(event, data, to=game_session['room'])
+    if game_session['spectators']:
+        publish_to_spectators(game_session, event, data)
+
+def spectator_message(event, data):
+    """A room event wrapped as a spectator update"""
+    return {'event': event, 'data': data}
+
+def spectator_room(game_session):
+    """Socket.IO room holding the room's spectators that are ready for an update"""
+    return f"{game_session['room']}:spectators"
+
+def publish_to_spectators(game_session, event, data):
+    """
+    Fan an update out to the room's spectators
+
+    Each spectator has at most one update in flight and acknowledges it with
+    spectator_ack. Ready spectators wait in spectator_room, so the update is
+    one emit to that room, which Socket.IO encodes once for all of them; they
+    then leave it until their ack. Spectators still busy with an earlier
+    update are marked as behind instead of queuing this one; they get the
+    latest full state on their next ack (see handle_spectator_ack).
+    """
+    with game_session['lock']:
+        ready = []
+        for sid, spectator in game_session['spectators'].items():
+            if spectator['ready']:
+                ready.append(sid)
+            else:
+                spectator['behind'] = True
+        if not ready:
+            return
+
+        message = spectator_message(event, data)
+        observe_emit('spectator_update', message)
+        transport.send('spectator_update', message, to=spectator_room(game_session))
+        for sid in ready:
+            game_session['spectators'][sid]['ready'] = False
+            transport.leave(sid, spectator_room(game_session))
+
+def spectator_snapshot(game_session):
+    """The room's current state as a spectator update, built once per version"""
+    game = game_session['game']
+    if game is None:
+        return spectator_message('game_stopped', {'status': 'stopped'})
+    cached = game_session['spectator_snapshot']
+    if cached is not None and cached[0] == (id(game), game.state_version):
+        return cached[1]
+    message = spectator_message('game_state', get_game_state(game))
+    game_session['spectator_snapshot'] = ((id(game), game.state_version), message)
+    return message
 
 @app.route('/')
 def index():
     """Serve the main game page"""
     return render_template('index.html')
 
-@socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
-    print(f"Client connected: {request.sid if 'request' in dir() else 'unknown'}")
-    emit('connection_established', {'status': 'connected'})
+@app.route('/metrics')
+def prometheus_metrics():
+    """Server metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
 
-@socketio.on('start_game')
+@event_handler('connect')
+def handle_connect():
+    """Handle client connection and join its game room"""
+    sid = current_sid()
+    room = transport.arg('room') or sid
+    role = 'spectator' if transport.arg('role') == 'spectator' else 'player'
+    client_rooms[sid] = room
+    game_session = get_session()
+    print(f"Client connected: {sid} (room {room}, {role})")
+    reply('connection_established', {'status': 'connected', 'room': room, 'role': role})
+
+    if role == 'player':
+        transport.join(sid, room)
+        game_session['members'].add(sid)
+    else:
+        # Spectators are fed by publish_to_spectators, not the players' room;
+        # start them off with the current state (they join spectator_room on ack)
+        with game_session['lock']:
+            game_session['spectators'][sid] = {'ready': False, 'behind': False}
+            reply('spectator_update', spectator_snapshot(game_session))
+
+@event_handler('spectator_ack')
+def handle_spectator_ack(data=None):
+    """A spectator has applied its last update: send the next one, if it fell behind"""
+    game_session = get_session()
+    with game_session['lock']:
+        spectator = game_session['spectators'].get(current_sid())
+        if spectator is None:
+            return
+        if spectator['behind']:
+            # Coalesce everything missed into the latest state
+            spectator['behind'] = False
+            reply('spectator_update', spectator_snapshot(game_session))
+        else:
+            spectator['ready'] = True
+            transport.join(current_sid(), spectator_room(game_session))
+
+@event_handler('disconnect')
+def handle_disconnect(*args):
+    """Drop the room's game state once its last client has left"""
+    sid = current_sid()
+    room = client_rooms.pop(sid, None)
+    game_session = game_sessions.get(room)
+    if game_session is not None:
+        game_session['members'].discard(sid)
+        game_session['spectators'].pop(sid, None)
+        if not game_session['members'] and not game_session['spectators']:
+            ai_scheduler.cancel(game_session)
+            game_session['game'] = None
+            del game_sessions[room]
+    print(f"Client disconnected: {sid} (room {room})")
+
+@event_handler('start_game')
+@players_only
 def handle_start_game(data):
     """Initialize a new game using proper BorderlineGPT constructor"""
-    global current_game, replay_state
+    game_session = get_session()
 
     # Clear replay state when starting a new game
-    replay_state = None
+    game_session['replay_state'] = None
+    game_session['pending_placement'] = None
+    ai_scheduler.cancel(game_session)  # Any AI turn in flight belongs to the old game
 
     mode = data.get('mode', 'human_vs_human')
     red_type = data.get('red_type', 'human')
@@ -50,6 +357,8 @@ def handle_start_game(data):
     # For GUI, we need to manually construct with GUI-specific players
     # Create game with default AI players first
     current_game = BorderlineGPT()
+    current_game.endgame_solver = endgame_solver
+    game_session['game'] = current_game
 
     # Replace players based on type
     if red_type == 'human':
@@ -85,48 +394,56 @@ def handle_start_game(data):
     print(f"   Turn: {current_game.turn_count}")
 
     # Get initial game state using API
-    state = get_game_state()
-    emit('game_started', state, broadcast=True)
+    state = get_game_state(current_game)
+    game_session['sent_version'] = state['version']
+    room_emit(game_session, 'game_started', state)
 
     # If Red is AI, make first move
     if red_type in ['ai', 'random']:
-        process_ai_turn()
+        ai_scheduler.schedule(game_session)
+    else:
+        ai_scheduler.ponder(game_session)
 
-@socketio.on('stop_game')
+@event_handler('stop_game')
+@players_only
 def handle_stop_game():
-    """Stop the current game and clear all server state"""
-    global current_game, pending_placement, replay_state
+    """Stop the room's game and clear its server state"""
+    game_session = get_session()
 
-    print("Stopping game and clearing all server state...")
+    print(f"Stopping game and clearing server state for room {game_session['room']}...")
 
-    # Clear all server state
-    current_game = None
-    pending_placement = None
-    replay_state = None
+    # Abort any AI search and clear this room's state
+    ai_scheduler.cancel(game_session)
+    game_session['game'] = None
+    game_session['pending_placement'] = None
+    game_session['replay_state'] = None
 
-    emit('game_stopped', {'status': 'stopped'})
-    print("Game stopped, all state cleared")
+    room_emit(game_session, 'game_stopped', {'status': 'stopped'})
+    print("Game stopped, room state cleared")
 
-@socketio.on('get_state')
+@event_handler('get_state')
 def handle_get_state():
     """Send current game state to client"""
+    current_game = get_session()['game']
     if current_game:
-        state = get_game_state()
-        emit('game_state', state)
+        state = get_game_state(current_game)
+        reply('game_state', state)
     else:
-        emit('error', {'message': 'No active game'})
+        reply('error', {'message': 'No active game'})
 
-@socketio.on('place_piece')
+@event_handler('place_piece')
+@players_only
 def handle_place_piece(data):
     """Handle initial piece placement from client (enters rotation mode) - NO VALIDATION YET"""
-    global current_game, pending_placement
+    game_session = get_session()
+    current_game = game_session['game']
 
     if not current_game:
-        emit('error', {'message': 'No active game'})
+        reply('error', {'message': 'No active game'})
         return
 
     if current_game.game_over:
-        emit('error', {'message': 'Game is over'})
+        reply('error', {'message': 'Game is over'})
         return
 
     row = data.get('row')
@@ -142,7 +459,7 @@ def handle_place_piece(data):
         print(f"   Blue player type: {type(current_game.blue_player).__name__}")
         print(f"   Turn count: {current_game.turn_count}")
         print(f"   Game over: {current_game.game_over}")
-        emit('placement_error', {
+        reply('placement_error', {
             'message': f'Not your turn - AI ({current_game.current_player.color}) is playing'
         })
         return
@@ -155,7 +472,7 @@ def handle_place_piece(data):
 
     # Check if player has pieces
     if not current_game.current_player.has_pieces():
-        emit('placement_error', {
+        reply('placement_error', {
             'message': 'No pieces remaining',
             'row': row,
             'col': col
@@ -164,7 +481,7 @@ def handle_place_piece(data):
 
     # Validate piece index
     if piece_index < 0 or piece_index >= len(current_game.current_player.pieces):
-        emit('placement_error', {
+        reply('placement_error', {
             'message': f'Invalid piece index: {piece_index}',
             'row': row,
             'col': col
@@ -175,7 +492,7 @@ def handle_place_piece(data):
     piece = current_game.current_player.pieces[piece_index]
 
     # Store pending placement (don't validate or place on board yet - allow experimentation!)
-    pending_placement = {
+    game_session['pending_placement'] = {
         'piece': piece,
         'row': row,
         'col': col,
@@ -191,24 +508,30 @@ def handle_place_piece(data):
         'rotation': 0
     }
 
-    emit('piece_pending_rotation', response, broadcast=True)
+    room_emit(game_session, 'piece_pending_rotation', response)
+
+    # Look at the AI's replies to this placement while the human rotates it
+    ai_scheduler.ponder(game_session, focus=(piece_index, row, col, 0))
 
-@socketio.on('rotate_piece')
+@event_handler('rotate_piece')
+@players_only
 def handle_rotate_piece(data):
     """Handle piece rotation during placement"""
-    global pending_placement, current_game
+    game_session = get_session()
+    current_game = game_session['game']
+    pending_placement = game_session['pending_placement']
 
-    if not pending_placement:
-        emit('error', {'message': 'No piece to rotate'})
+    if not pending_placement or not current_game:
+        reply('error', {'message': 'No piece to rotate'})
         return
 
     # CRITICAL: Only allow human players to rotate pieces
     if not isinstance(current_game.current_player, borderline_gpt.GUIHumanPlayer):
-        emit('placement_error', {
+        reply('placement_error', {
             'message': 'Not your turn - AI is playing'
         })
         print(f"Rejected rotation - current player is {type(current_game.current_player).__name__}, not GUIHumanPlayer")
-        pending_placement = None  # Clear the invalid pending placement
+        game_session['pending_placement'] = None  # Clear the invalid pending placement
         return
 
     # Rotate the piece by 90 degrees
@@ -222,24 +545,30 @@ def handle_rotate_piece(data):
         'rotation': pending_placement['rotation']
     }
 
-    emit('piece_rotated', response, broadcast=True)
+    room_emit(game_session, 'piece_rotated', response)
 
-@socketio.on('confirm_placement')
+    ai_scheduler.ponder(game_session, focus=(pending_placement['piece_index'], pending_placement['row'],
+                                             pending_placement['col'], pending_placement['rotation'] // 90))
+
+@event_handler('confirm_placement')
+@players_only
 def handle_confirm_placement(data):
     """Confirm and finalize piece placement - USE GAME ENGINE API"""
-    global current_game, pending_placement
+    game_session = get_session()
+    current_game = game_session['game']
+    pending_placement = game_session['pending_placement']
 
-    if not pending_placement:
-        emit('error', {'message': 'No pending placement'})
+    if not pending_placement or not current_game:
+        reply('error', {'message': 'No pending placement'})
         return
 
     # CRITICAL: Only allow human players to confirm placements
     if not isinstance(current_game.current_player, borderline_gpt.GUIHumanPlayer):
-        emit('placement_error', {
+        reply('placement_error', {
             'message': 'Not your turn - AI is playing'
         })
         print(f"Rejected confirm - current player is {type(current_game.current_player).__name__}, not GUIHumanPlayer")
-        pending_placement = None  # Clear the invalid pending placement
+        game_session['pending_placement'] = None  # Clear the invalid pending placement
         return
 
     # Get placement details
@@ -249,7 +578,7 @@ def handle_confirm_placement(data):
     piece_index = pending_placement['piece_index']
 
     # Clear pending placement
-    pending_placement = None
+    game_session['pending_placement'] = None
 
     # Convert rotation from degrees (0, 90, 180, 270) to count (0, 1, 2, 3)
     rotation_count = rotation // 90
@@ -269,7 +598,15 @@ def handle_confirm_placement(data):
     print(f"   Piece index: {move['piece_index']}")
     print(f"   Rotation: {move['rotation']} ({rotation_count * 90}°)")
 
-    result = current_game.execute_move(move)
+    # The human has moved: stop pondering (the replies found so far are kept)
+    ai_scheduler.stop_pondering(game_session)
+
+    # The room lock keeps this from interleaving with an AI move landing.
+    # No full state is built: the room gets a delta (see move_update)
+    with game_session['lock']:
+        result = execute_one(current_game, move, 'human')
+        if result['valid']:
+            response = move_update(game_session, row, col, result['events'])
 
     print(f"   Result: {'VALID' if result['valid'] else 'INVALID'}")
     if result['valid']:
@@ -278,155 +615,272 @@ def handle_confirm_placement(data):
 
     # Just broadcast the result - NO game logic here!
     if not result['valid']:
-        emit('placement_invalid', {
+        room_emit(game_session, 'placement_invalid', {
             'message': result['reason'],
             'row': row,
             'col': col
-        }, broadcast=True)
+        })
+        ai_scheduler.ponder(game_session)  # Still the human's turn
         return
 
-    # Valid move - build response from events
-    combat_result = None
-    removed_pieces = []
+    room_emit(game_session, 'piece_placed', response)
 
-    for event in result['events']:
-        if event['type'] == 'combat':
-            combat_result = event['combat_data']
-        elif event['type'] == 'piece_removed':
-            removed_pieces.append({
-                'row': event['row'],
-                'col': event['col'],
-                'piece': event['piece'],  # Already JSON from API
-                'reason': event['reason']
-            })
+    # Hand over to the AI if it is next (runs on the worker pool, not in this handler)
+    if not result['game_over']:
+        ai_scheduler.schedule(game_session, delay=ai_scheduler.move_delay)
 
-    # Get placed piece from events
-    placed_piece = None
-    for event in result['events']:
-        if event['type'] == 'piece_placed':
-            placed_piece = event['piece']
-            break
+# ==================== AI TURNS ====================
 
-    # Build response (game state already updated by engine)
-    response = {
-        'row': row,
-        'col': col,
-        'piece': placed_piece,
-        'combat': combat_to_dict(combat_result),
-        'removed_pieces': removed_pieces,
-        'game_state': api_state_to_gui_state(result['game_state'])
-    }
+def apply_ai_move(game_session, ai_result):
+    """
+    Execute an AI's chosen move through the API (call with the room lock held)
 
-    emit('piece_placed', response, broadcast=True)
+    Returns (event name, payload) to emit to the room
+    """
+    game = game_session['game']
+    player_color = game.current_player.color
 
-    # Check if current player is AI (not human)
-    # CRITICAL: Use isinstance check, not hasattr, because GUIHumanPlayer also has choose_move!
-    if not result['game_over'] and not isinstance(current_game.current_player, borderline_gpt.GUIHumanPlayer):
-        socketio.sleep(0.5)  # Brief pause for visualization
-        process_ai_turn()
+    if ai_result[0] is None:
+        # AI has no valid moves
+        game.switch_player()
+        game.turn_count += 1
+        return 'ai_no_moves', {'player': player_color, 'delta': room_delta(game_session)}
 
-def process_ai_turn():
-    """Process AI player's turn using API"""
-    global current_game
+    piece, row, col, rotation_degrees, piece_idx = ai_result
 
-    if not current_game or current_game.game_over:
-        return
+    # Convert rotation from degrees to count for API
+    rotation_count = rotation_degrees // 90
 
-    # Check if current player is AI (not human)
-    # CRITICAL: Use isinstance check, not hasattr, because GUIHumanPlayer also has choose_move!
-    if not isinstance(current_game.current_player, borderline_gpt.GUIHumanPlayer):
-        print(f"🤖 AI TURN STARTING")
-        print(f"   Player: {current_game.current_player.color} ({type(current_game.current_player).__name__})")
-        print(f"   Turn: {current_game.turn_count}")
-
-        # Notify that AI is thinking
-        emit('ai_thinking', {
-            'player': current_game.current_player.color
-        }, broadcast=True)
-
-        # Get AI move
-        ai_result = current_game.current_player.choose_move(current_game.board)
-
-        if ai_result[0] is None:
-            # AI has no valid moves
-            emit('ai_no_moves', {
-                'player': current_game.current_player.color
-            }, broadcast=True)
-            current_game.switch_player()
-            current_game.turn_count += 1
-            return
+    # Build move in API format
+    move = {
+        'player': player_color,
+        'piece_index': piece_idx,
+        'position': [row, col],
+        'rotation': rotation_count
+    }
 
-        piece, row, col, rotation_degrees, piece_idx = ai_result
+    print(f"🎯 AI EXECUTING MOVE")
+    print(f"   Player: {move['player']}")
+    print(f"   Position: {move['position']}")
+    print(f"   Piece index: {move['piece_index']}")
+    print(f"   Rotation: {move['rotation']} ({rotation_degrees}°)")
 
-        # Convert rotation from degrees to count for API
-        rotation_count = rotation_degrees // 90
+    # Execute move through API
+    result = execute_one(game, move, 'ai')
 
-        # Build move in API format
-        move = {
-            'player': current_game.current_player.color,
-            'piece_index': piece_idx,
-            'position': [row, col],
-            'rotation': rotation_count
-        }
+    print(f"   Result: {'VALID' if result['valid'] else 'INVALID'}")
+    if result['valid']:
+        print(f"   New current player: {game.current_player.color} ({type(game.current_player).__name__})")
+        print(f"   New turn: {game.turn_count}")
 
-        print(f"🎯 AI EXECUTING MOVE")
-        print(f"   Player: {move['player']}")
-        print(f"   Position: {move['position']}")
-        print(f"   Piece index: {move['piece_index']}")
-        print(f"   Rotation: {move['rotation']} ({rotation_degrees}°)")
+    if not result['valid']:
+        # This shouldn't happen with a properly functioning AI
+        print(f"ERROR: AI made invalid move: {result['reason']}")
+        return 'error', {'message': f"AI error: {result['reason']}"}
+
+    return 'ai_moved', move_update(game_session, row, col, result['events'])
+
+def ponder_candidates(game, focus=None, limit=4):
+    """
+    Up to `limit` of the current player's valid moves worth pondering
+
+    With focus (piece_index, row, col, rotation) only that placement's
+    rotations are returned, the focused one first. Otherwise moves are
+    ranked by a cheap static score: rows advanced toward the opponent's
+    home row, then the piece's pip count.
+    """
+    moves = game.get_valid_moves()
+    if focus is not None:
+        piece_index, row, col, rotation = focus
+        moves = [m for m in moves if m['piece_index'] == piece_index and m['position'] == [row, col]]
+        moves.sort(key=lambda m: m['rotation'] != rotation)
+        return moves[:limit]
+
+    player = game.current_player
+    last_row = game.board.height - 1
+    power = [bin(piece.get_pip_mask()).count('1') for piece in player.pieces]
+
+    def score(move):
+        row = move['position'][0]
+        return (row if player.color == 'R' else last_row - row), power[move['piece_index']]
+
+    moves.sort(key=score, reverse=True)
+    return moves[:limit]
+
+class AITurnScheduler:
+    """
+    Runs AI turns on a worker pool, at most one turn in flight per room.
+
+    The AI thinks on a fork of the game, so Socket.IO handlers never wait on
+    it. Its move is applied under the room lock, and only if the room still
+    holds the same game in the same state; a stopped, restarted or changed
+    game just drops the result. Each applied move schedules the next AI turn,
+    so AI-vs-AI games advance turn by turn without recursion.
+
+    cancel() aborts a turn in flight: the search checks its CancellationToken
+    inside its move loops, so the worker is free again within milliseconds.
+
+    While a human is to move against an AI, ponder() searches the AI's reply
+    to a few likely human moves on a separate pool, keyed by the resulting
+    position. If the human's move lands on a pondered position, the AI turn
+    uses that reply instead of searching.
+    """
+
+    def __init__(self, max_workers=4, ponder_workers=2, move_delay=0.5, ponder_moves=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='borderline-ai')
+        self.ponder_executor = ThreadPoolExecutor(max_workers=ponder_workers, thread_name_prefix='borderline-ponder')
+        self.move_delay = move_delay  # Pause before each AI move, for visualization
+        self.ponder_moves = ponder_moves  # Most ponder tasks queued per room
+        self.ponder_hits = 0
+
+    def schedule(self, game_session, delay=0):
+        """Start the room's next AI turn if an AI is to move; returns its future or None"""
+        with game_session['lock']:
+            game = game_session['game']
+            # CRITICAL: Use isinstance check, not hasattr, because GUIHumanPlayer also has choose_move!
+            if (game is None or game.game_over
+                    or isinstance(game.current_player, borderline_gpt.GUIHumanPlayer)):
+                return None
+            future = game_session['ai_future']
+            if future is not None and not future.done():
+                return future  # Already thinking about this turn
+
+            print(f"🤖 AI TURN STARTING")
+            print(f"   Player: {game.current_player.color} ({type(game.current_player).__name__})")
+            print(f"   Turn: {game.turn_count}")
+
+            # Notify that AI is thinking
+            room_emit(game_session, 'ai_thinking', {'player': game.current_player.color})
+
+            version = game.state_version
+            cancel_token = borderline_gpt.CancellationToken()
+            ponder = game_session['ponder']
+            pondered = ponder['results'].get(position_key(game)) if ponder else None
+            if pondered is not None:
+                self.ponder_hits += 1
+                future = self.executor.submit(self._think, None, delay, cancel_token, pondered)
+            else:
+                future = self.executor.submit(self._think, game.fork(), delay, cancel_token)
+            game_session['ai_future'] = future
+            game_session['ai_cancel'] = cancel_token
+
+        future.add_done_callback(lambda done: self._finish(game_session, game, version, done))
+        return future
+
+    def cancel(self, game_session):
+        """Abort the room's AI turn in flight and any pondering, if any"""
+        with game_session['lock']:
+            if game_session['ai_cancel'] is not None:
+                game_session['ai_cancel'].cancel()
+                game_session['ai_future'].cancel()  # Never starts if still queued
+            game_session['ai_future'] = None
+            game_session['ai_cancel'] = None
+            self.stop_pondering(game_session)
+            game_session['ponder'] = None
+
+    def ponder(self, game_session, focus=None):
+        """
+        Search AI replies to likely human moves while the human deliberates
+
+        focus: (piece_index, row, col, rotation) the human is placing (from
+               place_piece / rotate_piece); then only that placement is
+               pondered, the current rotation first. Otherwise the human's
+               moves ranked best by ponder_candidates are.
+
+        Each move is its own task on the shared ponder pool, and a room has
+        at most ponder_moves of them queued, so one deliberating human cannot
+        hold up pondering in other rooms. Replies found so far in this
+        position are kept.
+        """
+        with game_session['lock']:
+            game = game_session['game']
+            if (game is None or game.game_over
+                    or not isinstance(game.current_player, borderline_gpt.GUIHumanPlayer)):
+                return None
+            opponent = game.blue_player if game.current_player is game.red_player else game.red_player
+            if isinstance(opponent, borderline_gpt.GUIHumanPlayer):
+                return None  # Human vs human: no AI reply to ponder
+
+            self.stop_pondering(game_session)
+            ponder = game_session['ponder']
+            version = game.state_version
+            results = ponder['results'] if ponder and ponder['version'] == version else {}
+
+            cancel_token = borderline_gpt.CancellationToken()
+            futures = [self.ponder_executor.submit(self._ponder, game.fork(), move, results, cancel_token)
+                       for move in ponder_candidates(game, focus, self.ponder_moves)]
+            game_session['ponder'] = {
+                'version': version,
+                'results': results,  # position key -> AI reply (choose_move tuple)
+                'futures': futures,
+                'cancel': cancel_token
+            }
+            return futures
+
+    def stop_pondering(self, game_session):
+        """Stop the room's background search, keeping the replies found so far"""
+        ponder = game_session['ponder']
+        if ponder is not None:
+            ponder['cancel'].cancel()
+            for future in ponder['futures']:
+                future.cancel()  # Never starts if still queued
+
+    def _ponder(self, game, move, results, cancel_token):
+        """Worker: find the AI reply to one predicted human move"""
+        if cancel_token.cancelled:
+            return
+        if not game.execute_moves([move], return_state='none')['valid'] or game.game_over:
+            return
+        key = position_key(game)
+        if key in results:
+            return
+        try:
+            results[key] = game.choose_current_move(cancel_token)
+        except borderline_gpt.SearchCancelled:
+            return
 
-        # Execute move through API
-        result = current_game.execute_move(move)
+    def _think(self, game, delay, cancel_token, pondered=None):
+        """Worker: choose a move on a private fork of the game (or use a pondered one)"""
+        if delay and cancel_token.wait(delay):
+            raise borderline_gpt.SearchCancelled()
+        if pondered is not None:
+            return pondered
+        start = time.perf_counter()
+        result = game.choose_current_move(cancel_token)
+        AI_MOVE_SECONDS.observe(time.perf_counter() - start, strategy=type(game.current_player).__name__)
+        return result
+
+    def _finish(self, game_session, game, version, future):
+        """Apply a finished AI turn and start the next one"""
+        try:
+            ai_result = future.result()
+        except (borderline_gpt.SearchCancelled, CancelledError):
+            return  # Stopped or restarted: nothing to report
+        except Exception as e:
+            print(f"ERROR: AI turn failed: {e!r}")
+            room_emit(game_session, 'error', {'message': f'AI error: {e}'})
+            return
 
-        print(f"   Result: {'VALID' if result['valid'] else 'INVALID'}")
-        if result['valid']:
-            print(f"   New current player: {current_game.current_player.color} ({type(current_game.current_player).__name__})")
-            print(f"   New turn: {current_game.turn_count}")
+        with game_session['lock']:
+            if game_session['game'] is not game:
+                return  # Stopped or restarted while the AI was thinking
+            stale = game.state_version != version
+            if not stale:
+                event, response = apply_ai_move(game_session, ai_result)
 
-        if not result['valid']:
-            # This shouldn't happen with a properly functioning AI
-            print(f"ERROR: AI made invalid move: {result['reason']}")
-            emit('error', {'message': f"AI error: {result['reason']}"}, broadcast=True)
+        if stale:
+            # The position changed under the AI: think again
+            self.schedule(game_session)
             return
 
-        # Valid move - build response from events
-        combat_result = None
-        removed_pieces = []
-
-        for event in result['events']:
-            if event['type'] == 'combat':
-                combat_result = event['combat_data']
-            elif event['type'] == 'piece_removed':
-                removed_pieces.append({
-                    'row': event['row'],
-                    'col': event['col'],
-                    'piece': event['piece'],  # Already JSON from API
-                    'reason': event['reason']
-                })
-
-        # Get placed piece from events
-        placed_piece = None
-        for event in result['events']:
-            if event['type'] == 'piece_placed':
-                placed_piece = event['piece']
-                break
-
-        # Build response
-        response = {
-            'row': row,
-            'col': col,
-            'piece': placed_piece,
-            'combat': combat_to_dict(combat_result),
-            'removed_pieces': removed_pieces,
-            'game_state': api_state_to_gui_state(result['game_state'])
-        }
+        room_emit(game_session, event, response)
 
-        emit('ai_moved', response, broadcast=True)
+        # If next player is also AI, continue with their turn; otherwise ponder
+        if event == 'ai_moved' and not game.game_over:
+            self.schedule(game_session, delay=self.move_delay)
+        self.ponder(game_session)
 
-        # If next player is also AI, continue with their turn
-        if not result['game_over'] and hasattr(current_game.current_player, 'choose_move'):
-            socketio.sleep(0.5)
-            process_ai_turn()
+ai_scheduler = AITurnScheduler()
 
 def api_state_to_gui_state(api_state):
     """Convert API game state format to GUI format"""
@@ -443,35 +897,120 @@ def api_state_to_gui_state(api_state):
         'red_pieces_remaining': len(api_state['players']['R']['pieces_remaining']),
         'blue_pieces_remaining': len(api_state['players']['B']['pieces_remaining']),
         'red_pieces': [convert_api_piece(p) for p in api_state['players']['R']['pieces_remaining']],
-        'blue_pieces': [convert_api_piece(p) for p in api_state['players']['B']['pieces_remaining']]
+        'blue_pieces': [convert_api_piece(p) for p in api_state['players']['B']['pieces_remaining']],
+        'version': api_state['version']
+    }
+
+def gui_state_delta(game, since_version):
+    """
+    GUI form of game.get_state_delta(): what changed since since_version
+
+    Clients apply it to their local copy of the state (applyStateDelta in
+    static/js/game.js), or send get_state to resync when since_version is
+    not the version they hold. Falls back to {'full': True, 'game_state': ...}.
+    """
+    delta = game.get_state_delta(since_version)
+    if delta['full']:
+        return {
+            'full': True,
+            'version': delta['version'],
+            'game_state': api_state_to_gui_state(delta['state'])
+        }
+
+    hands = []
+    for op in delta['hands']:
+        gui_op = {'player': op['player'], 'op': op['op'], 'index': op['index']}
+        if op['op'] == 'insert':
+            gui_op['piece'] = convert_api_piece(op['piece'])
+        hands.append(gui_op)
+
+    return {
+        'full': False,
+        'version': delta['version'],
+        'since_version': delta['since_version'],
+        'cells': [{'row': cell['row'], 'col': cell['col'], 'piece': convert_api_piece(cell['piece'])}
+                  for cell in delta['cells']],
+        'hands': hands,
+        'current_player': delta['current_player'],
+        'turn_count': delta['turn'],
+        'game_over': delta['game_over'],
+        'winner': delta['winner']
+    }
+
+def room_delta(game_session):
+    """State delta of the room's game since the last update sent to the room"""
+    game = game_session['game']
+    delta = gui_state_delta(game, game_session['sent_version'])
+    game_session['sent_version'] = game.state_version
+    return delta
+
+def move_update(game_session, row, col, events):
+    """Build a piece_placed / ai_moved / replay_step payload from a move's API events"""
+    update = move_events(row, col, events)
+    update['delta'] = room_delta(game_session)
+    return update
+
+def move_events(row, col, events):
+    """Placed piece, combat and removed pieces of a move, from its API events"""
+    combat_result = None
+    removed_pieces = []
+    placed_piece = None
+
+    for event in events:
+        if event['type'] == 'combat':
+            combat_result = event['combat_data']
+        elif event['type'] == 'piece_removed':
+            removed_pieces.append({
+                'row': event['row'],
+                'col': event['col'],
+                'piece': event['piece'],  # Already JSON from API
+                'reason': event['reason']
+            })
+        elif event['type'] == 'piece_placed' and placed_piece is None:
+            placed_piece = event['piece']
+
+    return {
+        'row': row,
+        'col': col,
+        'piece': placed_piece,
+        'combat': combat_to_dict(combat_result),
+        'removed_pieces': removed_pieces
     }
 
+# GUI piece dicts are shared per (colour, pips), like the API fragments they
+# are built from (see borderline_gpt.serialize_piece) - do not modify them
+gui_piece_cache = {}
+
 def convert_api_piece(piece_json):
     """Convert API piece format to GUI format"""
     if piece_json is None:
         return None
-    return {
-        'color': piece_json['player_color'],
-        'pips': piece_json['pips'],
-        'power': piece_json['power']
-    }
+    pips = piece_json['pips']
+    if not isinstance(pips, tuple):
+        pips = tuple(tuple(row) for row in pips)
+    key = (piece_json['player_color'], pips)
+    gui_piece = gui_piece_cache.get(key)
+    if gui_piece is None:
+        gui_piece = {
+            'color': piece_json['player_color'],
+            'pips': pips,
+            'power': piece_json['power']
+        }
+        gui_piece_cache[key] = gui_piece
+    return gui_piece
 
-def get_game_state():
+def get_game_state(game):
     """Convert game state to dictionary for JSON"""
-    if not current_game:
+    if not game:
         return None
 
     # Use API to get state
-    api_state = current_game.get_game_state()
+    api_state = game.get_game_state()
     return api_state_to_gui_state(api_state)
 
 def piece_to_dict(piece):
     """Convert GamePiece object to dictionary (for rotation preview)"""
-    return {
-        'color': piece.player_color,
-        'pips': piece.pips,
-        'power': piece.get_power_level()
-    }
+    return convert_api_piece(borderline_gpt.serialize_piece(piece))
 
 def combat_to_dict(combat):
     """Convert combat result to JSON-serializable dictionary"""
@@ -499,273 +1038,476 @@ def combat_to_dict(combat):
         'defender_roll': combat['defender_roll'],
         'defender_total': combat['defender_total'],
         'defender_color': combat['defender_color'],
+        'attacker_win_probability': combat.get('attacker_win_probability'),
         'winner': combat['winner']
     }
 
 # ==================== REPLAY MODE ====================
 
-@socketio.on('load_replay')
+def build_replay_timeline(move_history, keyframes=None, keyframe_interval=10):
+    """
+    Play a replay through once and record everything needed to show it
+
+    Returns {'initial_state': GUI state, 'steps': [...], 'skipped': [...]}
+    where each step holds the move's events (as in replay_step) and the state
+    delta from the previous step, so the client can play, step and seek on
+    its own.
+
+    Each step's 'move' is a copy of the recorded move with the dice that
+    were actually rolled as its combat_rolls, so replaying the steps' moves
+    always gives this timeline (older exports have no recorded dice). Moves
+    that fail are skipped with a warning, as replay_game does, and listed in
+    'skipped' as {'index': position in move_history, 'reason': ...}.
+
+    If keyframes is a dict, forks of the game before the first move and
+    after every keyframe_interval-th step are stored in it by step number.
+    """
+    game = BorderlineGPT()
+    timeline = {'initial_state': get_game_state(game), 'steps': [], 'skipped': []}
+    version = game.state_version
+    if keyframes is not None:
+        keyframes[0] = game.fork()
+
+    for index, move in enumerate(move_history):
+        result = game.execute_moves([move], return_state='none', replay=True)['results'][0]
+        if not result['valid']:
+            print(f"Warning: Move {move} failed during replay: {result['reason']}")
+            timeline['skipped'].append({'index': index, 'reason': result['reason']})
+            continue
+
+        move = dict(move)
+        move.pop('combat_rolls', None)
+        if 'combat_rolls' in game.move_history[-1]:
+            move['combat_rolls'] = game.move_history[-1]['combat_rolls']
+
+        step = move_events(move['position'][0], move['position'][1], result['events'])
+        step.update({
+            'move_number': len(timeline['steps']) + 1,
+            'move': move,
+            'delta': gui_state_delta(game, version),
+            'game_over': result['game_over'],
+            'winner': result['winner']
+        })
+        timeline['steps'].append(step)
+        version = game.state_version
+        played = len(timeline['steps'])
+        if keyframes is not None and played % keyframe_interval == 0:
+            keyframes[played] = game.fork()
+
+    return timeline
+
+def deep_sizeof(*objects):
+    """
+    Bytes held by objects and everything they reference, counting shared
+    objects once (containers, instance __dict__s; classes, functions and
+    modules are not followed)
+    """
+    seen = set()
+    pending = list(objects)
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType,
+                                               types.MethodType, types.BuiltinFunctionType)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            pending.append(obj.__dict__)
+    return total
+
+class ReplayCache:
+    """
+    LRU cache of prepared replays, keyed by a hash of the replay's contents
+
+    An entry holds the moves as replayed (with the dice they rolled, and
+    without moves that failed), the timeline (per-move event lists and
+    deltas, see build_replay_timeline) with its compressed form, and
+    keyframes: untouched forks of the game every keyframe_interval moves,
+    which rooms fork to start a replay or to seek far into it. Entries are
+    evicted least recently used first once their total size (measured with
+    deep_sizeof) passes max_bytes.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, keyframe_interval=10):
+        self.max_bytes = max_bytes
+        self.keyframe_interval = keyframe_interval
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def file_key(filename):
+        """Cache key of a replay file: SHA-256 of its bytes"""
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    @staticmethod
+    def moves_key(move_history):
+        """Cache key of an uploaded move list: SHA-256 of its canonical JSON"""
+        raw = json.dumps(move_history, sort_keys=True, separators=(',', ':')).encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, key, load_moves):
+        """
+        Return the entry for key, preparing it from load_moves() on a miss
+
+        Preparing runs outside the lock, so two rooms missing on the same
+        replay at once may both build it; the second simply replaces the first.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = self.prepare(load_moves())
+        self.put(key, entry)
+        return entry
+
+    def prepare(self, move_history):
+        """Build a cache entry for a move list"""
+        keyframes = {}
+        timeline = build_replay_timeline(move_history, keyframes, self.keyframe_interval)
+        raw = json.dumps(timeline, separators=(',', ':')).encode()
+        compressed = base64.b64encode(gzip.compress(raw)).decode('ascii')
+
+        entry = {
+            'move_history': [step['move'] for step in timeline['steps']],
+            'skipped': len(timeline['skipped']),
+            'timeline': timeline,
+            'compressed_timeline': compressed,
+            'keyframes': keyframes
+        }
+        # Measured, not estimated: keyframes are whole games (undo log, change
+        # log, history), sharing their early undo steps with later keyframes
+        entry['size'] = deep_sizeof(entry)
+        return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old['size']
+            if entry['size'] > self.max_bytes:
+                return  # Too big to keep; still usable by the caller
+
+            self.entries[key] = entry
+            self.total_bytes += entry['size']
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted['size']
+
+    @staticmethod
+    def nearest_keyframe(entry, move_number):
+        """(moves played, keyframe game) of the last keyframe at or before move_number"""
+        best = max(n for n in entry['keyframes'] if n <= move_number)
+        return best, entry['keyframes'][best]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes,
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+replay_cache = ReplayCache()
+
+def start_replay(game_session, entry, message, timeline=False):
+    """
+    Set up a room for replaying a cached replay and send it the initial state
+
+    With timeline=True the pre-rendered timeline is sent along compressed,
+    so the client needs no further replay events.
+    """
+    move_history = entry['move_history']
+    if entry['skipped']:
+        message += f" ({entry['skipped']} moves could not be replayed and were skipped)"
+
+    # Fresh game for step-by-step replay, forked from the cached start position
+    fresh_game = entry['keyframes'][0].fork()
+
+    game_session['replay_state'] = {
+        'game': fresh_game,
+        'entry': entry,
+        'move_history': move_history,
+        'current_move': -1,  # Start before first move
+        'is_playing': False,
+        'total_moves': len(move_history)
+    }
+
+    # Set as current game for rendering
+    ai_scheduler.cancel(game_session)
+    game_session['game'] = fresh_game
+    game_session['sent_version'] = fresh_game.state_version
+
+    # Send initial state
+    response = {
+        'success': True,
+        'total_moves': len(move_history),
+        'game_state': api_state_to_gui_state(fresh_game.get_game_state()),
+        'message': message
+    }
+    if timeline:
+        response['timeline'] = entry['compressed_timeline']
+    room_emit(game_session, 'replay_loaded', response)
+
+@event_handler('load_replay')
+@players_only
 def handle_load_replay(data):
-    """Load a game from JSON file for replay"""
-    global replay_state, current_game
+    """Load a game from JSON file for replay (timeline=True to pre-render it for the client)"""
+    game_session = get_session()
 
     filename = data.get('filename', 'replay_demo.json')
 
     try:
-        # Load the game
-        replayed_game = BorderlineGPT.replay_game(filename)
-        move_history = replayed_game.get_move_history()
-
-        # Create fresh game for step-by-step replay
-        fresh_game = BorderlineGPT()
-
-        replay_state = {
-            'game': fresh_game,
-            'move_history': move_history,
-            'current_move': -1,  # Start before first move
-            'is_playing': False,
-            'total_moves': len(move_history)
-        }
-
-        # Set as current game for rendering
-        current_game = fresh_game
+        # Prepared once per file contents, then shared by every room loading it
+        def load_moves():
+            with open(filename, 'r') as f:
+                return json.load(f)['move_history']
 
-        # Send initial state
-        emit('replay_loaded', {
-            'success': True,
-            'total_moves': len(move_history),
-            'game_state': api_state_to_gui_state(fresh_game.get_game_state()),
-            'message': f'Loaded replay with {len(move_history)} moves'
-        }, broadcast=True)
+        entry = replay_cache.get(ReplayCache.file_key(filename), load_moves)
+        total = len(entry['move_history'])
+        start_replay(game_session, entry, f'Loaded replay with {total} moves',
+                     timeline=data.get('timeline', False))
+        REPLAY_LOADS.inc(source='file')
 
     except Exception as e:
-        emit('replay_error', {
+        reply('replay_error', {
             'success': False,
             'message': f'Failed to load replay: {str(e)}'
         })
 
-@socketio.on('replay_step_forward')
+@event_handler('replay_step_forward')
+@players_only
 def handle_replay_step_forward():
     """Execute next move in replay"""
-    global replay_state, current_game
+    game_session = get_session()
+    replay_state = game_session['replay_state']
 
     if not replay_state:
-        emit('replay_error', {'message': 'No replay loaded'})
+        reply('replay_error', {'message': 'No replay loaded'})
         return
 
     if replay_state['current_move'] >= replay_state['total_moves'] - 1:
-        emit('replay_error', {'message': 'Already at end of replay'})
+        reply('replay_error', {'message': 'Already at end of replay'})
         return
 
-    # Execute next move
+    # Execute next move (redo it if we stepped back over it)
     replay_state['current_move'] += 1
     move = replay_state['move_history'][replay_state['current_move']]
 
-    result = replay_state['game'].execute_move(move)
+    game = replay_state['game']
+    if game.can_redo():
+        redo_result = game.redo()
+        result = {
+            'valid': True,
+            'events': redo_result['events'],
+            'game_over': game.game_over,
+            'winner': game.winner.color if game.winner else None
+        }
+    else:
+        result = execute_one(game, move, 'replay')
 
     if result['valid']:
-        # Extract events for animation
-        combat_result = None
-        removed_pieces = []
-
-        for event in result['events']:
-            if event['type'] == 'combat':
-                combat_result = event['combat_data']
-            elif event['type'] == 'piece_removed':
-                removed_pieces.append({
-                    'row': event['row'],
-                    'col': event['col'],
-                    'piece': event['piece'],
-                    'reason': event['reason']
-                })
-
-        # Get placed piece
-        placed_piece = None
-        for event in result['events']:
-            if event['type'] == 'piece_placed':
-                placed_piece = event['piece']
-                break
-
-        emit('replay_step', {
+        response = move_update(game_session, move['position'][0], move['position'][1], result['events'])
+        response.update({
             'move_number': replay_state['current_move'] + 1,
             'total_moves': replay_state['total_moves'],
             'move': move,
-            'row': move['position'][0],
-            'col': move['position'][1],
-            'piece': placed_piece,
-            'combat': combat_to_dict(combat_result),
-            'removed_pieces': removed_pieces,
-            'game_state': api_state_to_gui_state(result['game_state']),
             'game_over': result['game_over'],
             'winner': result['winner']
-        }, broadcast=True)
+        })
+        room_emit(game_session, 'replay_step', response)
     else:
-        emit('replay_error', {'message': f'Move failed: {result["reason"]}'})
+        reply('replay_error', {'message': f'Move failed: {result["reason"]}'})
 
-@socketio.on('replay_step_back')
+@event_handler('replay_step_back')
+@players_only
 def handle_replay_step_back():
     """Go back one move in replay"""
-    global replay_state, current_game
+    game_session = get_session()
+    replay_state = game_session['replay_state']
 
     if not replay_state:
-        emit('replay_error', {'message': 'No replay loaded'})
+        reply('replay_error', {'message': 'No replay loaded'})
         return
 
     if replay_state['current_move'] < 0:
-        emit('replay_error', {'message': 'Already at start of replay'})
+        reply('replay_error', {'message': 'Already at start of replay'})
         return
 
-    # Reset to start and replay up to current_move - 1
+    # Take back the last move
     replay_state['current_move'] -= 1
-    target_move = replay_state['current_move']
-
-    # Create fresh game
-    fresh_game = BorderlineGPT()
+    game = replay_state['game']
+    game.undo()
+    game_session['game'] = game
 
-    # Replay moves up to target
-    for i in range(target_move + 1):
-        move = replay_state['move_history'][i]
-        fresh_game.execute_move(move)
-
-    replay_state['game'] = fresh_game
-    current_game = fresh_game
-
-    emit('replay_step_back', {
+    room_emit(game_session, 'replay_step_back', {
         'move_number': replay_state['current_move'] + 1,
         'total_moves': replay_state['total_moves'],
-        'game_state': api_state_to_gui_state(fresh_game.get_game_state())
-    }, broadcast=True)
+        'delta': room_delta(game_session)
+    })
 
-@socketio.on('replay_goto')
+@event_handler('replay_goto')
+@players_only
 def handle_replay_goto(data):
     """Jump to specific move in replay"""
-    global replay_state, current_game
+    game_session = get_session()
+    replay_state = game_session['replay_state']
 
     if not replay_state:
-        emit('replay_error', {'message': 'No replay loaded'})
+        reply('replay_error', {'message': 'No replay loaded'})
         return
 
     target_move = data.get('move_number', 0) - 1  # Convert to 0-indexed
 
     if target_move < -1 or target_move >= replay_state['total_moves']:
-        emit('replay_error', {'message': 'Invalid move number'})
+        reply('replay_error', {'message': 'Invalid move number'})
         return
 
-    # Create fresh game and replay to target
-    fresh_game = BorderlineGPT()
-
-    for i in range(target_move + 1):
-        move = replay_state['move_history'][i]
-        fresh_game.execute_move(move)
-
-    replay_state['game'] = fresh_game
-    replay_state['current_move'] = target_move
-    current_game = fresh_game
+    # Restart from a cached keyframe when that is closer than the current position
+    game = replay_state['game']
+    keyframe_moves, keyframe = ReplayCache.nearest_keyframe(replay_state['entry'], target_move + 1)
+    if target_move + 1 - keyframe_moves < abs(target_move - replay_state['current_move']):
+        game = replay_state['game'] = keyframe.fork()
+        replay_state['current_move'] = keyframe_moves - 1
+        game_session['sent_version'] = None  # A different game: send the full state
+
+    # Undo back or redo/replay forward from the current position
+    while replay_state['current_move'] > target_move:
+        game.undo()
+        replay_state['current_move'] -= 1
+    while replay_state['current_move'] < target_move:
+        replay_state['current_move'] += 1
+        if game.can_redo():
+            game.redo()
+        else:
+            game.replay_move(replay_state['move_history'][replay_state['current_move']])
+    game_session['game'] = game
 
-    emit('replay_goto', {
+    room_emit(game_session, 'replay_goto', {
         'move_number': target_move + 1,
         'total_moves': replay_state['total_moves'],
-        'game_state': api_state_to_gui_state(fresh_game.get_game_state())
-    }, broadcast=True)
+        'delta': room_delta(game_session)
+    })
 
-@socketio.on('replay_play')
+@event_handler('replay_play')
+@players_only
 def handle_replay_play():
     """Start auto-playing replay"""
-    global replay_state
+    game_session = get_session()
+    replay_state = game_session['replay_state']
 
     if not replay_state:
-        emit('replay_error', {'message': 'No replay loaded'})
+        reply('replay_error', {'message': 'No replay loaded'})
         return
 
     replay_state['is_playing'] = True
-    emit('replay_playing', {'is_playing': True}, broadcast=True)
+    room_emit(game_session, 'replay_playing', {'is_playing': True})
 
     # Auto-advance will be handled by client with replay_step_forward
 
-@socketio.on('replay_pause')
+@event_handler('replay_pause')
+@players_only
 def handle_replay_pause():
     """Pause auto-playing replay"""
-    global replay_state
+    game_session = get_session()
+    replay_state = game_session['replay_state']
 
     if not replay_state:
-        emit('replay_error', {'message': 'No replay loaded'})
+        reply('replay_error', {'message': 'No replay loaded'})
         return
 
     replay_state['is_playing'] = False
-    emit('replay_paused', {'is_playing': False}, broadcast=True)
+    room_emit(game_session, 'replay_paused', {'is_playing': False})
 
-@socketio.on('get_replay_state')
+@event_handler('get_replay_state')
 def handle_get_replay_state():
     """Get current replay state"""
-    global replay_state
+    replay_state = get_session()['replay_state']
 
     if not replay_state:
-        emit('replay_state', {
+        reply('replay_state', {
             'loaded': False
         })
         return
 
-    emit('replay_state', {
+    reply('replay_state', {
         'loaded': True,
         'current_move': replay_state['current_move'] + 1,
         'total_moves': replay_state['total_moves'],
         'is_playing': replay_state['is_playing']
     })
 
-@socketio.on('load_replay_data')
+@event_handler('load_replay_data')
+@players_only
 def handle_load_replay_data(data):
     """Load a game from JSON data (for file uploads)"""
-    global replay_state, current_game
+    game_session = get_session()
 
     try:
         game_data = data.get('game_data')
         if not game_data:
-            emit('replay_error', {'message': 'No game data provided'})
+            reply('replay_error', {'message': 'No game data provided'})
             return
 
         # Extract move history from uploaded data
         move_history = game_data.get('move_history', [])
 
         if not move_history:
-            emit('replay_error', {'message': 'No move history found in uploaded file'})
+            reply('replay_error', {'message': 'No move history found in uploaded file'})
             return
 
-        # Create fresh game for step-by-step replay
-        fresh_game = BorderlineGPT()
-
-        replay_state = {
-            'game': fresh_game,
-            'move_history': move_history,
-            'current_move': -1,  # Start before first move
-            'is_playing': False,
-            'total_moves': len(move_history)
-        }
-
-        # Set as current game for rendering
-        current_game = fresh_game
-
-        # Send initial state
-        emit('replay_loaded', {
-            'success': True,
-            'total_moves': len(move_history),
-            'game_state': api_state_to_gui_state(fresh_game.get_game_state()),
-            'message': f'Loaded replay from upload with {len(move_history)} moves'
-        }, broadcast=True)
+        entry = replay_cache.get(ReplayCache.moves_key(move_history), lambda: move_history)
+        start_replay(game_session, entry,
+                     f"Loaded replay from upload with {len(entry['move_history'])} moves",
+                     timeline=data.get('timeline', False))
+        REPLAY_LOADS.inc(source='upload')
 
         print(f"Loaded replay from upload: {len(move_history)} moves")
 
     except Exception as e:
-        emit('replay_error', {
+        reply('replay_error', {
             'success': False,
             'message': f'Failed to load replay data: {str(e)}'
         })
         print(f"Error loading replay data: {e}")
 
+transport.register(EVENT_HANDLERS)
+
+def save_endgame_table():
+    """Save the endgame table on shutdown if anything was solved since the last save"""
+    if endgame_solver is not None:
+        endgame_solver.save_if_changed()
+
 if __name__ == '__main__':
+    import argparse
+    from endgame_solver import add_endgame_arguments, solver_from_args
+
+    parser = argparse.ArgumentParser(description='Borderline GUI server')
+    add_endgame_arguments(parser)
+    endgame_solver = solver_from_args(parser.parse_args())
+
     print("=" * 60)
     print("BORDERLINE - GUI Server")
     print("=" * 60)
     print("Starting server on http://localhost:5000")
     print("Press Ctrl+C to stop")
     print("=" * 60)
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    try:
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    finally:
+        save_endgame_table()
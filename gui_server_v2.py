@@ -41,16 +41,9 @@ def handle_start_game(data):
     print(f"Starting new game: {mode}")
     print(f"  Red: {red_type}, Blue: {blue_type}")
 
-    # Create game instance
-    current_game = BorderlineGPT.__new__(BorderlineGPT)
-    current_game.board = BorderlineGPT.GameBoard() if hasattr(BorderlineGPT, 'GameBoard') else __import__('borderline_gpt').GameBoard()
-    current_game.turn_count = 0
-    current_game.game_over = False
-    current_game.winner = None
-
-    # Import GameBoard if needed
-    from borderline_gpt import GameBoard
-    current_game.board = GameBoard()
+    # Create game instance (fully initialized: board, history, undo log and
+    # state versioning), then swap in the requested players
+    current_game = BorderlineGPT()
 
     # Create players based on type
     if red_type == 'human':
@@ -78,14 +71,6 @@ def handle_start_game(data):
     # Set current player to Red (Red starts)
     current_game.current_player = current_game.red_player
 
-    # Add switch_player method
-    def switch_player():
-        if current_game.current_player == current_game.red_player:
-            current_game.current_player = current_game.blue_player
-        else:
-            current_game.current_player = current_game.red_player
-    current_game.switch_player = switch_player
-
     # Get initial game state
     state = get_game_state()
     emit('game_started', state, broadcast=True)
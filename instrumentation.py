@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Borderline Engine Instrumentation
+Call counts and latency histograms for the engine's hot paths
+
+Opt-in: enable() wraps the instrumented methods on their classes and
+disable() puts the originals back, so when it is off the engine runs its
+own, unwrapped code. While enabled, every call is timed into histograms
+kept per game and per strategy (player class), plus overall. Games are told
+apart by BorderlineGPT.instance_id, which every game and fork gets anew, so
+games sharing a game_id and the AI's forks are never merged:
+
+    from instrumentation import instrumentation
+
+    instrumentation.enable()
+    game.play_turn()
+    print(instrumentation.to_json())
+    instrumentation.disable()
+
+Calls on the scratch boards an AI search copies are attributed to the game
+and strategy that started the search. Times are inclusive: can_place_piece
+includes the check_pip_adjacency calls it makes.
+
+Each thread records into its own histograms without taking a lock; they are
+merged when the data is read (snapshot, to_json, export).
+"""
+
+import bisect
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from borderline_gpt import BorderlineGPT, GameBoard, Player
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BOARD_HOOKS = ('can_place_piece', 'check_pip_adjacency', 'resolve_combat',
+               'remove_disconnected_pieces', 'check_victory')
+
+# BorderlineGPT methods that mark which game the calls below them belong to
+# (get_game_state is timed as well)
+GAME_ENTRY_POINTS = ('choose_current_move', 'play_turn', 'execute_move', 'execute_moves',
+                     'get_valid_moves', 'get_game_state')
+
+
+class Histogram:
+    """Call count, total/min/max time and bucket counts of one hook"""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_s': self.total / self.count if self.count else 0.0,
+            'min_s': self.min or 0.0,
+            'max_s': self.max,
+            # Bucket counts keyed by upper bound, as in the Prometheus text format
+            'buckets': {**{str(bound): n for bound, n in zip(BUCKETS, self.buckets)},
+                        '+Inf': self.buckets[-1]}
+        }
+
+
+class Shard:
+    """One thread's histograms; only that thread writes to it"""
+
+    __slots__ = ('generation', 'thread', 'totals', 'games', 'strategies')
+
+    def __init__(self, generation, thread=None):
+        self.generation = generation  # EngineInstrumentation.generation it was created in
+        self.thread = thread
+        self.totals = {}  # hook -> Histogram
+        self.games = OrderedDict()  # instance_id -> [game_id, last use, {hook: Histogram}]
+        self.strategies = {}  # player class name -> {hook: Histogram}
+
+    def merge(self, other):
+        """Add another shard's histograms to this one"""
+        merge_hooks(self.totals, other.totals)
+        for name, hooks in list(other.strategies.items()):
+            merge_hooks(self.strategies.setdefault(name, {}), hooks)
+        for instance_id, (game_id, last_use, hooks) in list(other.games.items()):
+            entry = self.games.setdefault(instance_id, [game_id, last_use, {}])
+            entry[1] = max(entry[1], last_use)
+            merge_hooks(entry[2], hooks)
+
+    def trim(self, max_games):
+        """Keep the max_games most recently used games, least recent first"""
+        games = sorted(self.games.items(), key=lambda item: item[1][1])[-max_games:]
+        self.games = OrderedDict(games)
+
+
+def histogram(hooks, hook):
+    """The Histogram of a hook, created on first use"""
+    found = hooks.get(hook)
+    if found is None:
+        found = hooks[hook] = Histogram()
+    return found
+
+
+def merge_hooks(target, source):
+    """Add {hook: Histogram} source into target"""
+    for hook, other in list(source.items()):
+        histogram(target, hook).merge(other)
+
+
+class Context(threading.local):
+    """What the running call belongs to, per thread"""
+    shard = None  # This thread's Shard
+    game_hooks = None  # {hook: Histogram} of the current game
+    strategy_hooks = None  # {hook: Histogram} of the current strategy
+    player = None  # Player whose choose_move is running
+
+
+class EngineInstrumentation:
+    """
+    Timing hooks on the engine's hot paths
+
+    Histograms are kept for the last max_games games seen; older games are
+    dropped so the hooks can stay on in a long-running server.
+    """
+
+    def __init__(self, max_games=1000):
+        self.max_games = max_games
+        self.enabled = False
+        self.lock = threading.Lock()  # Guards the shard list, never taken per call
+        self.context = Context()
+        self.sequence = itertools.count()  # Orders game uses across threads
+        self.generation = 0
+        self._originals = []  # (class, name, original function) patched by enable()
+        self.reset()
+
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self.lock:
+            self.generation += 1  # Threads start new shards on their next call
+            self.shards = []
+            self.retired = Shard(self.generation)  # Merged shards of finished threads
+
+    # ==================== ON / OFF ====================
+
+    def enable(self):
+        """Wrap the instrumented methods (no-op if already enabled)"""
+        if self.enabled:
+            return
+        for name in BOARD_HOOKS:
+            self._patch(GameBoard, name, self._timed(name))
+        for name in GAME_ENTRY_POINTS:
+            self._patch(BorderlineGPT, name, self._in_game(name, timed=(name == 'get_game_state')))
+        for player_class in self._player_classes():
+            self._patch(player_class, 'choose_move', self._timed_choose_move())
+        self.enabled = True
+
+    def disable(self):
+        """Restore the original methods; recorded data is kept"""
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        self.enabled = False
+
+    def _patch(self, cls, name, make_wrapper):
+        original = cls.__dict__[name]
+        self._originals.append((cls, name, original))
+        setattr(cls, name, make_wrapper(original))
+
+    @staticmethod
+    def _player_classes():
+        """Player and every subclass that defines its own choose_move"""
+        found, pending = [], [Player]
+        while pending:
+            cls = pending.pop()
+            pending.extend(cls.__subclasses__())
+            if 'choose_move' in cls.__dict__:
+                found.append(cls)
+        return found
+
+    # ==================== WRAPPERS ====================
+
+    def _timed(self, name):
+        def make_wrapper(original):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            wrapper.__name__ = original.__name__
+            wrapper.__doc__ = original.__doc__
+            wrapper.__wrapped__ = original
+            return wrapper
+        return make_wrapper
+
+    def _in_game(self, name, timed):
+        """Run a BorderlineGPT method with its game as the current game"""
+        def make_wrapper(original):
+            inner = self._timed(name)(original) if timed else original
+
+            def wrapper(game, *args, **kwargs):
+                context = self.context
+                outer = context.game_hooks
+                context.game_hooks = self._game_hooks(game)
+                try:
+                    return inner(game, *args, **kwargs)
+                finally:
+                    context.game_hooks = outer
+            wrapper.__name__ = original.__name__
+            wrapper.__doc__ = original.__doc__
+            wrapper.__wrapped__ = original
+            return wrapper
+        return make_wrapper
+
+    def _timed_choose_move(self):
+        """Time choose_move under the player's strategy (once, however deep the super() chain)"""
+        def make_wrapper(original):
+            def wrapper(player, *args, **kwargs):
+                context = self.context
+                outer = context.player
+                if outer is player:
+                    return original(player, *args, **kwargs)  # super().choose_move
+                outer_hooks = context.strategy_hooks
+                context.player = player
+                context.strategy_hooks = self._shard().strategies.setdefault(type(player).__name__, {})
+                start = time.perf_counter()
+                try:
+                    return original(player, *args, **kwargs)
+                finally:
+                    self.record('choose_move', time.perf_counter() - start)
+                    context.player = outer
+                    context.strategy_hooks = outer_hooks
+            wrapper.__name__ = original.__name__
+            wrapper.__doc__ = original.__doc__
+            wrapper.__wrapped__ = original
+            return wrapper
+        return make_wrapper
+
+    # ==================== RECORDING ====================
+
+    def record(self, hook, seconds):
+        """Add one timed call to the overall, current game and current strategy histograms"""
+        context = self.context
+        shard = context.shard
+        if shard is None or shard.generation != self.generation:
+            shard = self._shard()
+        histogram(shard.totals, hook).record(seconds)
+        if context.game_hooks is not None:
+            histogram(context.game_hooks, hook).record(seconds)
+        if context.strategy_hooks is not None:
+            histogram(context.strategy_hooks, hook).record(seconds)
+
+    def _shard(self):
+        """This thread's shard, created on its first call (or after reset)"""
+        context = self.context
+        shard = context.shard
+        if shard is None or shard.generation != self.generation:
+            with self.lock:
+                shard = context.shard = Shard(self.generation, threading.current_thread())
+                self.shards.append(shard)
+        return shard
+
+    def _game_hooks(self, game):
+        """Histograms of a game in this thread's shard, marked as just used"""
+        games = self._shard().games
+        entry = games.get(game.instance_id)
+        if entry is None:
+            entry = games[game.instance_id] = [game.game_id, 0, {}]
+            if len(games) > self.max_games:
+                games.popitem(last=False)
+        else:
+            games.move_to_end(game.instance_id)
+            entry[0] = game.game_id  # Servers may assign it after creating the game
+        entry[1] = next(self.sequence)
+        return entry[2]
+
+    # ==================== EXPORT ====================
+
+    def merged(self):
+        """All threads' histograms merged into one Shard"""
+        with self.lock:
+            # Finished threads record nothing more: fold them into self.retired
+            live = []
+            for shard in self.shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self.retired.merge(shard)
+            self.shards = live
+            self.retired.trim(self.max_games)
+
+            total = Shard(self.generation)
+            for shard in [self.retired] + live:
+                total.merge(shard)
+        total.trim(self.max_games)
+        return total
+
+    def snapshot(self):
+        """Everything recorded, as plain dicts (games keyed by instance_id)"""
+        def export(hooks):
+            return {hook: histogram.to_dict() for hook, histogram in sorted(hooks.items())}
+
+        total = self.merged()
+        return {
+            'enabled': self.enabled,
+            'buckets_s': list(BUCKETS),
+            'totals': export(total.totals),
+            'strategies': {name: export(hooks) for name, hooks in sorted(total.strategies.items())},
+            'games': {instance_id: {'game_id': game_id, 'hooks': export(hooks)}
+                      for instance_id, (game_id, _, hooks) in total.games.items()}
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def export(self, filename):
+        """Write snapshot() to a JSON file"""
+        with open(filename, 'w') as f:
+            f.write(self.to_json())
+
+
+# Shared instance used by the engine's callers (gui_server, benchmarks)
+instrumentation = EngineInstrumentation()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profile AI vs AI games with the engine instrumentation')
+    parser.add_argument('--games', type=int, default=3, help='Number of games to play')
+    parser.add_argument('--red_strategy', default='aggressive', help='default or aggressive')
+    parser.add_argument('--blue_strategy', default='defensive', help='default or defensive')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    instrumentation.enable()
+    for i in range(args.games):
+        game = BorderlineGPT(red_strategy=args.red_strategy, blue_strategy=args.blue_strategy)
+        game.game_id = f'profile_{i + 1}'
+        while not game.game_over and game.turn_count < 200:
+            move = game.choose_current_move()
+            if move[0] is None:
+                game.switch_player()
+                game.turn_count += 1
+                continue
+            piece, row, col, rotation, piece_idx = move
+            game.execute_move({'player': game.current_player.color, 'piece_index': piece_idx,
+                               'position': [row, col], 'rotation': rotation // 90})
+    instrumentation.disable()
+
+    if args.output:
+        instrumentation.export(args.output)
+        print(f"Wrote {args.output}")
+    else:
+        for hook, stats in instrumentation.snapshot()['totals'].items():
+            print(f"{hook:28s} {stats['count']:9d} calls  {stats['mean_s'] * 1e6:10.1f} us mean  "
+                  f"{stats['total_s']:8.3f} s total")
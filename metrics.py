@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Borderline Metrics
+Counters, gauges and histograms rendered in the Prometheus text format
+
+A small stand-in for prometheus_client, enough for gui_server's /metrics:
+
+    registry = MetricsRegistry()
+    moves = registry.histogram('borderline_execute_move_seconds', 'Time to execute a move')
+    moves.observe(0.002)
+    registry.gauge('borderline_sessions', 'Rooms with state', lambda: len(game_sessions))
+    text = registry.render()
+
+Metrics are thread-safe. Gauges are read from their callback at render time.
+"""
+
+import threading
+
+# Default histogram buckets (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Buckets for payload sizes (bytes)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def format_labels(labels):
+    """{'a': 'x'} -> '{a="x"}' with Prometheus escaping ('' for no labels)"""
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """A named metric with one series per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}  # label values tuple -> series state
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        lines = self.header()
+        for key, state in series:
+            lines.extend(self.render_series(dict(zip(self.labelnames, key)), state))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.series.get(self._key(labels), 0)
+
+    def render_series(self, labels, value):
+        return [f'{self.name}_total{format_labels(labels)} {format_value(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.series.get(key)
+            if state is None:
+                state = self.series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def count(self, **labels):
+        with self.lock:
+            state = self.series.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def render_series(self, labels, state):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, state['buckets']):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{format_labels({**labels, "le": format_value(float(bound))})} '
+                         f'{cumulative}')
+        lines.append(f'{self.name}_bucket{format_labels({**labels, "le": "+Inf"})} {state["count"]}')
+        lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(state["sum"])}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {state["count"]}')
+        return lines
+
+
+class CallbackMetric:
+    """
+    A gauge or counter whose values are read at render time
+
+    callback returns a number, or a list of (labels dict, number) pairs.
+    """
+
+    def __init__(self, kind, name, documentation, callback):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self.callback()
+        if not isinstance(values, list):
+            values = [({}, values)]
+        suffix = '_total' if self.kind == 'counter' else ''
+        for labels, value in values:
+            lines.append(f'{self.name}{suffix}{format_labels(labels)} {format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics exposed by one /metrics endpoint, in registration order"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # callables returning extra exposition lines
+
+    def _add(self, metric):
+        if any(m.name == metric.name for m in self.metrics):
+            raise ValueError(f'Duplicate metric {metric.name}')
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self._add(CallbackMetric('gauge', name, documentation, callback))
+
+    def counter_callback(self, name, documentation, callback):
+        """A counter kept elsewhere (e.g. cache hit counts), read at render time"""
+        return self._add(CallbackMetric('counter', name, documentation, callback))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+def parse_metrics(text):
+    """
+    Parse Prometheus text format into {(name, ((label, value), ...)): value}
+
+    Handles what render() produces; used by the tests to scrape /metrics.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        labels = ()
+        if '{' in series:
+            name, label_text = series[:-1].split('{', 1)
+            pairs = []
+            for part in label_text.split('",'):
+                label, label_value = part.split('="', 1)
+                pairs.append((label, label_value.rstrip('"').replace('\\"', '"')
+                              .replace('\\n', '\n').replace('\\\\', '\\')))
+            labels = tuple(sorted(pairs))
+        else:
+            name = series
+        samples[(name, labels)] = float(value)
+    return samples
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Borderline Opening Book
+Win statistics per (position, move) for the first plies of the game
+
+The book is aggregated from archived games (and optionally from self-play),
+saved as a compact JSON lookup file, and consulted by AIPlayer.choose_move
+before it searches:
+
+    from borderline_gpt import AIPlayer
+    from opening_book import OpeningBook
+
+    AIPlayer.opening_book = OpeningBook.load('opening_book.json')
+
+Positions are keyed by what the moving player can see: the board, their
+colour and their own hand. Moves are stored by pip pattern rather than hand
+index, so a book move still applies when the hand is in a different order.
+"""
+
+import json
+import random
+
+from borderline_gpt import BorderlineGPT, find_game_files
+from position_index import encode_board, hash_position
+
+
+def book_key(board, color, hand):
+    """Position key for the player `color` holding `hand` on `board`"""
+    masks = [piece.get_pip_mask() for piece in hand]
+    if color == 'R':
+        return hash_position(encode_board(board), color, red_hand=masks)
+    return hash_position(encode_board(board), color, blue_hand=masks)
+
+
+def encode_book_move(pattern, rotation, row, col):
+    """Pack (pip mask, rotation count, row, col) into one integer"""
+    return (pattern << 8) | (rotation << 6) | (row << 3) | col
+
+
+def decode_book_move(code):
+    """Inverse of encode_book_move: returns (pattern, rotation, row, col)"""
+    return code >> 8, (code >> 6) & 3, (code >> 3) & 7, code & 7
+
+
+class OpeningBook:
+    """Per-position move statistics: key -> {move code: [games, wins]}"""
+
+    def __init__(self, max_ply=8, min_games=2):
+        self.max_ply = max_ply      # Only the first max_ply plies are recorded
+        self.min_games = min_games  # Moves seen fewer times are never played
+        self.positions = {}
+
+    def add_game(self, move_history):
+        """
+        Replay a move history and record the opening moves with the game result
+
+        Returns: winner color or None
+        """
+        game = BorderlineGPT()
+        entries = []
+
+        for move in move_history:
+            player = game.current_player
+            piece_idx = move.get('piece_index', -1)
+            if len(game.move_history) < self.max_ply and 0 <= piece_idx < len(player.pieces):
+                key = book_key(game.board, player.color, player.pieces)
+                pattern = player.pieces[piece_idx].get_pip_mask()
+                row, col = move['position']
+                code = encode_book_move(pattern, move['rotation'] % 4, row, col)
+            else:
+                key = None
+
+            result = game.replay_move(move)
+            if not result['valid']:
+                print(f"Warning: Move {move} failed while building opening book: {result['reason']}")
+                continue
+            if key is not None:
+                entries.append((key, code, player.color))
+
+        winner = game.winner.color if game.winner else None
+        for key, code, color in entries:
+            stats = self.positions.setdefault(key, {}).setdefault(code, [0, 0])
+            stats[0] += 1
+            if winner == color:
+                stats[1] += 1
+        return winner
+
+    def add_files(self, sources):
+        """Add every exported game in a directory, file or list of files"""
+        for filename in find_game_files(sources):
+            with open(filename, 'r') as f:
+                game_data = json.load(f)
+            if game_data.get('move_history'):
+                self.add_game(game_data['move_history'])
+
+    def add_self_play(self, num_games, red_strategy='aggressive', blue_strategy='defensive',
+                      explore=0.25, max_turns=100):
+        """
+        Play AI-vs-AI games and add them to the book
+
+        Args:
+            explore: probability of playing a random legal move during the
+                     first max_ply plies, so the book covers more than one line
+            max_turns: turn limit per game (games hitting it count as draws)
+        """
+        for _ in range(num_games):
+            game = BorderlineGPT(red_strategy=red_strategy, blue_strategy=blue_strategy)
+            while not game.game_over and game.turn_count < max_turns:
+                if len(game.move_history) < self.max_ply and random.random() < explore:
+                    valid_moves = game.get_valid_moves()
+                    move = random.choice(valid_moves) if valid_moves else None
+                else:
+                    piece, row, col, rotation, piece_idx = game.current_player.choose_move(game.board)
+                    move = None
+                    if piece is not None:
+                        move = {
+                            'player': game.current_player.color,
+                            'piece_index': piece_idx,
+                            'position': [row, col],
+                            'rotation': rotation // 90
+                        }
+
+                if move is None:
+                    game.switch_player()
+                    game.turn_count += 1
+                    continue
+                game.execute_move(move)
+
+            self.add_game(game.get_move_history())
+
+    def probe(self, board, color, hand):
+        """
+        Look up the best book move for a position
+
+        Returns: (piece_idx, rotation_degrees, row, col) or None if the
+                 position is not in the book or no move has enough games
+        """
+        stats = self.positions.get(book_key(board, color, hand))
+        if not stats:
+            return None
+
+        candidates = []
+        for code, (games, wins) in stats.items():
+            if games >= self.min_games:
+                # Laplace-smoothed win rate, ties broken by sample size
+                candidates.append(((wins + 1) / (games + 2), games, int(code)))
+        candidates.sort(reverse=True)
+
+        current_pieces = board.get_player_pieces(color)
+        for _, _, code in candidates:
+            pattern, rotation, row, col = decode_book_move(code)
+            for piece_idx, piece in enumerate(hand):
+                if piece.get_pip_mask() != pattern:
+                    continue
+                rotated = piece.rotate(rotation * 90)
+                if board.can_place_piece(rotated, row, col, current_pieces):
+                    return piece_idx, rotation * 90, row, col
+                break
+        return None
+
+    def save(self, filename):
+        """Save the book as compact JSON: {key: [[move, games, wins], ...]}"""
+        positions = {
+            key: [[code, games, wins] for code, (games, wins) in stats.items()]
+            for key, stats in self.positions.items()
+        }
+        with open(filename, 'w') as f:
+            json.dump({'max_ply': self.max_ply, 'min_games': self.min_games,
+                       'positions': positions}, f, separators=(',', ':'))
+
+    @staticmethod
+    def load(filename):
+        """Load a book saved with save()"""
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        book = OpeningBook(max_ply=data['max_ply'], min_games=data['min_games'])
+        for key, moves in data['positions'].items():
+            book.positions[key] = {code: [games, wins] for code, games, wins in moves}
+        return book
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build a Borderline opening book')
+    parser.add_argument('sources', nargs='*', help='Exported game files or directories')
+    parser.add_argument('--output', default='opening_book.json', help='Book file to write')
+    parser.add_argument('--self_play', type=int, default=0, help='Number of AI-vs-AI games to add')
+    parser.add_argument('--max_ply', type=int, default=8, help='Number of opening plies to record')
+    parser.add_argument('--min_games', type=int, default=2, help='Minimum games before a move is played')
+    args = parser.parse_args()
+
+    book = OpeningBook(max_ply=args.max_ply, min_games=args.min_games)
+    if args.sources:
+        book.add_files(args.sources)
+    if args.self_play:
+        book.add_self_play(args.self_play)
+    book.save(args.output)
+    print(f"Saved {len(book.positions)} book positions to {args.output}")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Borderline Position Index
+Find every archived game in which a given position arose, and who won from it
+
+Positions are identified by a compact hash of the board (colour and pip
+pattern of each cell), the player to move and, by default, both hands.
+The same key is produced from a live BorderlineGPT instance or from a
+get_game_state() dict, so positions can be looked up from either side of
+the API.
+"""
+
+import hashlib
+import json
+
+from borderline_gpt import BorderlineGPT, find_game_files
+
+
+def pattern_mask(player_color, pips):
+    """9-bit pip mask of a JSON pip pattern (matches GamePiece.get_pip_mask)"""
+    mask = 0
+    for i in range(3):
+        for j in range(3):
+            if pips[i][j] == player_color:
+                mask |= 1 << (i * 3 + j)
+    return mask
+
+
+def _cell_code(player_color, mask):
+    """Pack one occupied cell as colour bit + pip mask (0 is reserved for empty)"""
+    return (1 << 10) | ((player_color == 'B') << 9) | mask
+
+
+def hash_position(cells, to_move, red_hand=None, blue_hand=None):
+    """
+    Hash an encoded position
+
+    Args:
+        cells: 48 cell codes in row-major order (0 for empty cells)
+        to_move: 'R' or 'B'
+        red_hand, blue_hand: pip masks of the pieces in each hand, or None to
+                             leave hands out of the key
+
+    Returns: 16-character hex key
+    """
+    parts = [','.join(map(str, cells)), to_move]
+    if red_hand is not None:
+        parts.append(','.join(map(str, sorted(red_hand))))
+    if blue_hand is not None:
+        parts.append(','.join(map(str, sorted(blue_hand))))
+    return hashlib.blake2b('|'.join(parts).encode(), digest_size=8).hexdigest()
+
+
+def encode_board(board):
+    """Encode a GameBoard as 48 cell codes in row-major order"""
+    cells = []
+    for row in board.grid:
+        for piece in row:
+            cells.append(0 if piece is None else _cell_code(piece.player_color, piece.get_pip_mask()))
+    return cells
+
+
+def position_key(game_or_state, include_hands=True):
+    """
+    Compute the position key of a BorderlineGPT instance or get_game_state() dict
+
+    Hands are compared as multisets, so the order of pieces in hand does not
+    change the key.
+    """
+    if isinstance(game_or_state, BorderlineGPT):
+        game = game_or_state
+        cells = encode_board(game.board)
+        to_move = game.current_player.color
+        red_hand = [p.get_pip_mask() for p in game.red_player.pieces]
+        blue_hand = [p.get_pip_mask() for p in game.blue_player.pieces]
+    else:
+        state = game_or_state
+        cells = []
+        for row in state['board']:
+            for piece in row:
+                if piece is None:
+                    cells.append(0)
+                else:
+                    color = piece['player_color']
+                    cells.append(_cell_code(color, pattern_mask(color, piece['pips'])))
+        to_move = state['current_player']
+        red_hand = [pattern_mask(p['player_color'], p['pips'])
+                    for p in state['players']['R']['pieces_remaining']]
+        blue_hand = [pattern_mask(p['player_color'], p['pips'])
+                     for p in state['players']['B']['pieces_remaining']]
+
+    if not include_hands:
+        red_hand = blue_hand = None
+    return hash_position(cells, to_move, red_hand, blue_hand)
+
+
+class PositionIndex:
+    """Index from position key to the (game, turn) entries where it arose"""
+
+    def __init__(self, include_hands=True):
+        self.include_hands = include_hands
+        self.games = []       # [{'game_id', 'winner', 'file'}, ...]
+        self.positions = {}   # key -> [[game_index, ply, turn], ...]
+
+    def add_game(self, game_data, filename=None):
+        """
+        Replay one exported game once, indexing the position before every move
+        and the final position
+
+        Older exports have no recorded combat dice. After the first combat
+        without them the replay may no longer be the real game, so indexing
+        stops at the position before that move. The game's winner is the
+        exported one.
+
+        Returns: index of the game in self.games
+        """
+        game_index = len(self.games)
+        game = BorderlineGPT()
+        ply = 0
+        complete = True
+
+        for move in game_data.get('move_history', []):
+            key = position_key(game, self.include_hands)
+            turn = game.turn_count
+            result = game.replay_move(move)
+            if not result['valid']:
+                print(f"Warning: Move {move} failed during indexing: {result['reason']}")
+                continue
+            self.positions.setdefault(key, []).append([game_index, ply, turn])
+            ply += 1
+            if 'combat_rolls' not in move and any(e['type'] == 'combat' for e in result['events']):
+                complete = False  # Dice rolled now, not the recorded game's
+                break
+
+        if complete:
+            key = position_key(game, self.include_hands)
+            self.positions.setdefault(key, []).append([game_index, ply, game.turn_count])
+
+        if 'winner' in game_data:
+            winner = game_data['winner']
+        else:
+            winner = game.winner.color if game.winner and complete else None
+        self.games.append({
+            'game_id': game_data.get('game_id', 'unknown'),
+            'winner': winner,
+            'file': filename
+        })
+        return game_index
+
+    def add_files(self, sources):
+        """Index every exported game in a directory, file or list of files"""
+        for filename in find_game_files(sources):
+            with open(filename, 'r') as f:
+                game_data = json.load(f)
+            if game_data.get('move_history'):
+                self.add_game(game_data, filename)
+
+    def lookup(self, game_or_state):
+        """
+        Find where a position arose
+
+        Args:
+            game_or_state: BorderlineGPT instance or get_game_state() dict
+
+        Returns: list of dicts with game_id, file, ply, turn and winner
+        """
+        key = position_key(game_or_state, self.include_hands)
+        matches = []
+        for game_index, ply, turn in self.positions.get(key, []):
+            info = self.games[game_index]
+            matches.append({
+                'game_id': info['game_id'],
+                'file': info['file'],
+                'ply': ply,
+                'turn': turn,
+                'winner': info['winner']
+            })
+        return matches
+
+    def outcomes(self, game_or_state):
+        """Return win counts from a position: {'R': n, 'B': n, 'draw': n}"""
+        counts = {'R': 0, 'B': 0, 'draw': 0}
+        for match in self.lookup(game_or_state):
+            counts[match['winner'] or 'draw'] += 1
+        return counts
+
+    def save(self, filename):
+        """Save the index as JSON"""
+        with open(filename, 'w') as f:
+            json.dump({
+                'include_hands': self.include_hands,
+                'games': self.games,
+                'positions': self.positions
+            }, f)
+
+    @staticmethod
+    def load(filename):
+        """Load an index saved with save()"""
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        index = PositionIndex(include_hands=data['include_hands'])
+        index.games = data['games']
+        index.positions = data['positions']
+        return index
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Index positions across archived Borderline games')
+    parser.add_argument('sources', nargs='+', help='Exported game files or directories')
+    parser.add_argument('--output', default='position_index.json', help='Index file to write')
+    parser.add_argument('--board_only', action='store_true', help='Leave hands out of position keys')
+    args = parser.parse_args()
+
+    index = PositionIndex(include_hands=not args.board_only)
+    index.add_files(args.sources)
+    index.save(args.output)
+    print(f"Indexed {len(index.positions)} positions from {len(index.games)} games into {args.output}")
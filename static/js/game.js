@@ -111,6 +111,58 @@ function updateGameState(data) {
     }
 }
 
+/**
+ * Apply a versioned state delta from the server to the local gameState
+ *
+ * Returns the updated state, or null when the delta does not start from our
+ * version (we missed an update or joined late); a full state is then
+ * requested with get_state and arrives as a game_state event.
+ */
+function applyStateDelta(delta) {
+    if (delta.full) {
+        gameState = delta.game_state;
+        return gameState;
+    }
+
+    if (!gameState || gameState.version !== delta.since_version) {
+        console.log(`Stale state (have ${gameState ? gameState.version : 'none'}, delta from ${delta.since_version}) - resyncing`);
+        socket.emit('get_state');
+        return null;
+    }
+
+    return applyDeltaToState(gameState, delta);
+}
+
+/**
+ * Apply a non-full delta to a state object in place (no version check)
+ * Also used by the replay controller on its pre-rendered timeline
+ */
+function applyDeltaToState(state, delta) {
+    // Cells carry their new contents
+    for (const cell of delta.cells) {
+        state.board.grid[cell.row][cell.col] = cell.piece;
+    }
+
+    // Hand changes must be applied in order
+    for (const op of delta.hands) {
+        const hand = op.player === 'R' ? state.red_pieces : state.blue_pieces;
+        if (op.op === 'remove') {
+            hand.splice(op.index, 1);
+        } else {
+            hand.splice(op.index, 0, op.piece);
+        }
+    }
+    state.red_pieces_remaining = state.red_pieces.length;
+    state.blue_pieces_remaining = state.blue_pieces.length;
+
+    state.current_player = delta.current_player;
+    state.turn_count = delta.turn_count;
+    state.game_over = delta.game_over;
+    state.winner = delta.winner;
+    state.version = delta.version;
+    return state;
+}
+
 function handlePiecePlaced(data) {
     console.log('Handling piece placement:', data);
 
@@ -120,15 +172,17 @@ function handlePiecePlaced(data) {
     }
 
     // Update game state FIRST (before animation) so piece pools reflect new current player
-    if (data.game_state) {
-        gameState = data.game_state;
-        updateTurnIndicator(data.game_state.current_player);
-        updatePieceCounts(data.game_state.red_pieces_remaining, data.game_state.blue_pieces_remaining);
-        updateTurnNumber(data.game_state.turn_count);
+    if (data.delta && !applyStateDelta(data.delta)) {
+        return;  // Resyncing: the full state redraws everything
+    }
+    if (gameState) {
+        updateTurnIndicator(gameState.current_player);
+        updatePieceCounts(gameState.red_pieces_remaining, gameState.blue_pieces_remaining);
+        updateTurnNumber(gameState.turn_count);
 
         // Render piece pools with new current player
         if (window.renderPiecePools) {
-            window.renderPiecePools(data.game_state);
+            window.renderPiecePools(gameState);
         }
     }
 
@@ -179,8 +233,8 @@ function handlePiecePlaced(data) {
         });
     } else {
         // Fallback if no renderer
-        if (data.game_state) {
-            updateGameState(data.game_state);
+        if (gameState) {
+            updateGameState(gameState);
         }
     }
 
@@ -401,6 +455,8 @@ function resetGameState() {
 // Export functions for HTML inline handlers
 window.handleGameStarted = handleGameStarted;
 window.updateGameState = updateGameState;
+window.applyStateDelta = applyStateDelta;
+window.applyDeltaToState = applyDeltaToState;
 window.handlePiecePlaced = handlePiecePlaced;
 window.handlePiecePendingRotation = handlePiecePendingRotation;
 window.handlePieceRotated = handlePieceRotated;
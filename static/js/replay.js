@@ -11,6 +11,7 @@ class ReplayController {
         this.playbackSpeed = 1; // 1x speed by default
         this.playbackInterval = null;
         this.replayLoaded = false;
+        this.timeline = null; // Pre-rendered states when the server sent a timeline
 
         this.initializeEventListeners();
         this.initializeKeyboardShortcuts();
@@ -164,8 +165,11 @@ class ReplayController {
                     return;
                 }
 
-                // Send to server to load replay
-                socket.emit('load_replay_data', { game_data: gameData });
+                // Send to server to load replay; the timeline lets us play it locally
+                socket.emit('load_replay_data', {
+                    game_data: gameData,
+                    timeline: typeof DecompressionStream !== 'undefined'
+                });
 
                 console.log('Uploaded replay file:', file.name);
             } catch (error) {
@@ -188,11 +192,23 @@ class ReplayController {
 
     previousMove() {
         if (!this.replayLoaded) return;
+        if (this.timeline) {
+            if (this.currentMove > 0) this.showMove(this.currentMove - 1);
+            return;
+        }
         socket.emit('replay_step_back');
     }
 
     nextMove() {
         if (!this.replayLoaded) return;
+        if (this.timeline) {
+            if (this.currentMove < this.totalMoves) {
+                this.showMove(this.currentMove + 1);
+            } else {
+                this.pause();
+            }
+            return;
+        }
         socket.emit('replay_step_forward');
     }
 
@@ -203,9 +219,42 @@ class ReplayController {
 
     gotoMove(moveNumber) {
         if (!this.replayLoaded) return;
+        if (this.timeline) {
+            this.showMove(Math.max(0, Math.min(moveNumber, this.totalMoves)));
+            return;
+        }
         socket.emit('replay_goto', { move_number: moveNumber });
     }
 
+    // Client-side playback from a pre-rendered timeline
+    async loadTimeline(encoded) {
+        // base64 -> gzip bytes -> JSON
+        const bytes = Uint8Array.from(atob(encoded), c => c.charCodeAt(0));
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        const timeline = await new Response(stream).json();
+
+        // Apply every delta once up front so seeking is a lookup
+        const states = [timeline.initial_state];
+        for (const step of timeline.steps) {
+            const state = structuredClone(states[states.length - 1]);
+            states.push(step.delta.full ? step.delta.game_state : applyDeltaToState(state, step.delta));
+        }
+        return { steps: timeline.steps, states: states };
+    }
+
+    showMove(moveNumber) {
+        this.currentMove = moveNumber;
+
+        // Update UI
+        document.getElementById('current-move').textContent = this.currentMove;
+        document.getElementById('replay-slider').value = this.currentMove;
+
+        // Draw a copy so later live deltas cannot touch the timeline
+        if (typeof updateGameState === 'function') {
+            updateGameState(structuredClone(this.timeline.states[moveNumber]));
+        }
+    }
+
     togglePlayPause() {
         if (!this.replayLoaded) return;
 
@@ -220,7 +269,7 @@ class ReplayController {
         if (this.isPlaying) return;
 
         this.isPlaying = true;
-        socket.emit('replay_play');
+        if (!this.timeline) socket.emit('replay_play');
 
         // Update UI
         document.getElementById('play-pause-btn').textContent = '⏸️';
@@ -243,7 +292,7 @@ class ReplayController {
         if (!this.isPlaying) return;
 
         this.isPlaying = false;
-        socket.emit('replay_pause');
+        if (!this.timeline) socket.emit('replay_pause');
 
         // Update UI
         document.getElementById('play-pause-btn').textContent = '▶️';
@@ -267,9 +316,19 @@ class ReplayController {
     }
 
     // Socket event handlers
-    onReplayLoaded(data) {
+    async onReplayLoaded(data) {
         console.log('Replay loaded:', data);
 
+        this.timeline = null;
+        if (data.timeline) {
+            try {
+                this.timeline = await this.loadTimeline(data.timeline);
+                console.log(`Timeline: ${data.timeline.length} bytes, playing back locally`);
+            } catch (error) {
+                console.warn('Could not decode replay timeline, using server playback:', error);
+            }
+        }
+
         this.replayLoaded = true;
         this.currentMove = 0;
         this.totalMoves = data.total_moves;
@@ -322,9 +381,10 @@ class ReplayController {
         document.getElementById('current-move').textContent = this.currentMove;
         document.getElementById('replay-slider').value = this.currentMove;
 
-        // Update game state visualization
-        if (data.game_state && typeof updateGameState === 'function') {
-            updateGameState(data.game_state);
+        // Apply the state delta and redraw (a stale client resyncs via get_state)
+        const state = data.delta && applyStateDelta(data.delta);
+        if (state && typeof updateGameState === 'function') {
+            updateGameState(state);
         }
     }
 
@@ -337,9 +397,10 @@ class ReplayController {
         document.getElementById('current-move').textContent = this.currentMove;
         document.getElementById('replay-slider').value = this.currentMove;
 
-        // Update game state visualization
-        if (data.game_state && typeof updateGameState === 'function') {
-            updateGameState(data.game_state);
+        // Apply the state delta and redraw (a stale client resyncs via get_state)
+        const state = data.delta && applyStateDelta(data.delta);
+        if (state && typeof updateGameState === 'function') {
+            updateGameState(state);
         }
     }
 
@@ -352,9 +413,10 @@ class ReplayController {
         document.getElementById('current-move').textContent = this.currentMove;
         document.getElementById('replay-slider').value = this.currentMove;
 
-        // Update game state visualization
-        if (data.game_state && typeof updateGameState === 'function') {
-            updateGameState(data.game_state);
+        // Apply the state delta and redraw (a stale client resyncs via get_state)
+        const state = data.delta && applyStateDelta(data.delta);
+        if (state && typeof updateGameState === 'function') {
+            updateGameState(state);
         }
     }
 
@@ -404,6 +466,7 @@ class ReplayController {
         this.playbackSpeed = 1;
         this.playbackInterval = null;
         this.replayLoaded = false;
+        this.timeline = null;
 
         // Reset UI
         document.getElementById('current-move').textContent = 0;
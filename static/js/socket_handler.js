@@ -6,7 +6,13 @@
 let socket;
 
 function initializeSocketConnection() {
-    socket = io();
+    // Each tab gets its own game; open the page with ?room=<name> to share one,
+    // and add &role=spectator to watch it read-only
+    const params = new URLSearchParams(window.location.search);
+    const query = {};
+    if (params.get('room')) query.room = params.get('room');
+    if (params.get('role')) query.role = params.get('role');
+    socket = io({ query: query });
 
     socket.on('connect', () => {
         console.log('Connected to server');
@@ -14,6 +20,7 @@ function initializeSocketConnection() {
 
     socket.on('connection_established', (data) => {
         console.log('Connection established:', data);
+        console.log('Game room:', data.room);
     });
 
     socket.on('game_started', (data) => {
@@ -56,6 +63,10 @@ function initializeSocketConnection() {
         console.log('AI has no valid moves:', data);
         hideAIThinking();
         addStatusMessage(`${data.player} has no valid moves - turn skipped`);
+        const state = applyStateDelta(data.delta);
+        if (state) {
+            updateGameState(state);
+        }
     });
 
     socket.on('placement_error', (data) => {
@@ -74,6 +85,14 @@ function initializeSocketConnection() {
         addStatusMessage(`Error: ${data.message}`);
     });
 
+    // Spectators get every room event wrapped in one update ({event, data}).
+    // Acknowledging it asks for the next; if we fell behind, the server
+    // coalesces the missed events into one game_state.
+    socket.on('spectator_update', (update) => {
+        socket.listeners(update.event).forEach((handler) => handler(update.data));
+        socket.emit('spectator_ack');
+    });
+
     socket.on('disconnect', () => {
         console.log('Disconnected from server');
     });
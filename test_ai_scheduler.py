@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test AI turns running on the GUI server's worker pool, and their cancellation
+"""
+
+import random
+import threading
+import time
+
+import gui_server
+from borderline_gpt import BorderlineGPT, CancellationToken, SearchCancelled
+from gui_server import app, socketio, ai_scheduler, ponder_candidates
+from position_index import position_key
+
+
+def wait_for(client, name, timeout=10.0, count=1):
+    """Collect received events until `count` events called `name` arrived"""
+    received = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        received.extend(client.get_received())
+        if sum(msg['name'] == name for msg in received) >= count:
+            return received
+        time.sleep(0.01)
+    raise AssertionError(f"Timed out waiting for {count} x {name}")
+
+
+def test_ai_vs_ai_runs_in_background():
+    """start_game returns at once and AI moves arrive as ai_moved emits"""
+    print("=" * 60)
+    print("TEST: AI vs AI on the worker pool")
+    print("=" * 60)
+
+    ai_scheduler.move_delay = 0.05
+    client = socketio.test_client(app, query_string='room=ai-vs-ai')
+    client.get_received()
+
+    start = time.time()
+    client.emit('start_game', {'mode': 'ai_vs_ai', 'red_type': 'ai', 'blue_type': 'ai'})
+    handler_time = time.time() - start
+    assert handler_time < 0.5, f"start_game blocked for {handler_time:.2f}s"
+
+    received = wait_for(client, 'ai_moved', count=4)
+    players = [msg['args'][0]['delta']['current_player'] for msg in received if msg['name'] == 'ai_moved']
+    assert players[:4] == ['B', 'R', 'B', 'R'], "Turns alternate through the scheduler"
+
+    # The server answers other events while the AIs keep playing
+    client.emit('get_state')
+    assert wait_for(client, 'game_state', timeout=1.0)
+
+    client.emit('stop_game')
+    time.sleep(0.3)  # A move already being applied may still land
+    client.get_received()
+    time.sleep(0.3)
+    late = [msg['name'] for msg in client.get_received()]
+    assert 'ai_moved' not in late, "The AI chain ends with stop_game"
+    client.disconnect()
+    ai_scheduler.move_delay = 0.5
+    print(f"✓ start_game returned in {handler_time * 1000:.0f} ms; AI moves streamed in")
+
+
+def test_human_then_ai_reply():
+    """confirm_placement returns before the AI replies"""
+    print("=" * 60)
+    print("TEST: AI reply after a human move")
+    print("=" * 60)
+
+    ai_scheduler.move_delay = 0.2
+    client = socketio.test_client(app, query_string='room=human-vs-ai')
+    client.emit('start_game', {'mode': 'human_vs_ai', 'red_type': 'human', 'blue_type': 'ai'})
+    client.get_received()
+
+    client.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+    client.emit('confirm_placement', {})
+    names = [msg['name'] for msg in client.get_received()]
+    assert 'piece_placed' in names and 'ai_moved' not in names, "The AI reply arrives later"
+
+    received = wait_for(client, 'ai_moved')
+    reply = [msg for msg in received if msg['name'] == 'ai_moved'][0]['args'][0]
+    assert reply['delta']['current_player'] == 'R', "Back to the human"
+    assert gui_server.game_sessions['human-vs-ai']['game'].turn_count == 2
+    client.disconnect()
+    ai_scheduler.move_delay = 0.5
+    print("✓ AI reply delivered asynchronously")
+
+
+def test_search_cancellation_token():
+    """A cancelled token aborts choose_move from another thread within milliseconds"""
+    print("=" * 60)
+    print("TEST: Cancelling an AI search")
+    print("=" * 60)
+
+    random.seed(42)
+    game = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+    for _ in range(4):
+        game.execute_move(random.choice(game.get_valid_moves()))
+
+    token = CancellationToken()
+    token.cancel()
+    try:
+        game.choose_current_move(token)
+        assert False, "A cancelled token should stop the search"
+    except SearchCancelled:
+        pass
+
+    token = CancellationToken()
+    cancelled_at = []
+    timer = threading.Timer(0.02, lambda: cancelled_at.append(time.time()) or token.cancel())
+    timer.start()
+    try:
+        game.choose_current_move(token)
+        assert False, "The search should not finish once cancelled"
+    except SearchCancelled:
+        latency = time.time() - cancelled_at[0]
+    assert latency < 0.05, f"Cancellation took {latency * 1000:.0f} ms"
+
+    # Without a token the search still completes normally
+    assert game.choose_current_move()[0] is not None
+    print(f"✓ Search aborted {latency * 1000:.1f} ms after cancel()")
+
+
+def test_stop_game_cancels_ai_turn():
+    """stop_game aborts a thinking AI and frees its worker"""
+    print("=" * 60)
+    print("TEST: stop_game cancels the AI turn")
+    print("=" * 60)
+
+    client = socketio.test_client(app, query_string='room=cancel-ai')
+    game_session = gui_server.game_sessions['cancel-ai']
+
+    # Cancelled during the pre-move pause
+    ai_scheduler.move_delay = 5.0
+    client.emit('start_game', {'mode': 'human_vs_ai', 'red_type': 'human', 'blue_type': 'ai'})
+    client.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+    client.emit('confirm_placement', {})
+    future = game_session['ai_future']
+    assert future is not None and not future.done()
+    client.emit('stop_game')
+    time.sleep(0.05)
+    assert future.done(), "The pause before the AI move is cancellable"
+
+    # Cancelled mid-search
+    random.seed(7)
+    client.emit('start_game', {'mode': 'ai_vs_ai', 'red_type': 'ai', 'blue_type': 'ai'})
+    future = game_session['ai_future']
+    time.sleep(0.02)
+    client.emit('stop_game')
+    time.sleep(0.05)
+    assert future.done(), "The search stops within milliseconds"
+    assert game_session['ai_future'] is None
+
+    client.get_received()
+    client.disconnect()
+    ai_scheduler.move_delay = 0.5
+    print("✓ AI turns cancelled on stop_game")
+
+
+def test_ponder_during_human_turn():
+    """The AI reply to a pondered human move is taken from the ponder results"""
+    print("=" * 60)
+    print("TEST: Pondering on the human's turn")
+    print("=" * 60)
+
+    ai_scheduler.move_delay = 0
+    client = socketio.test_client(app, query_string='room=ponder')
+    game_session = gui_server.game_sessions['ponder']
+    client.emit('start_game', {'mode': 'human_vs_ai', 'red_type': 'human', 'blue_type': 'ai'})
+    assert game_session['ponder'] is not None, "Pondering starts with the human's turn"
+    game = game_session['game']
+    assert len(game.get_valid_moves()) > ai_scheduler.ponder_moves
+    assert len(game_session['ponder']['futures']) == ai_scheduler.ponder_moves, \
+        "Only the top moves are queued, not every valid move"
+    top = ponder_candidates(game, limit=ai_scheduler.ponder_moves)
+    assert all(move in game.get_valid_moves() for move in top)
+
+    # The human picks up piece 1 at (0, 2): only that placement is pondered
+    client.emit('place_piece', {'row': 0, 'col': 2, 'piece_index': 1})
+    focused = ponder_candidates(game, (1, 0, 2, 0), ai_scheduler.ponder_moves)
+    assert focused[0]['rotation'] == 0
+    assert all(m['piece_index'] == 1 and m['position'] == [0, 2] for m in focused)
+    assert len(game_session['ponder']['futures']) == len(focused)
+    move = {'player': 'R', 'piece_index': 1, 'position': [0, 2], 'rotation': 0}
+    predicted = game_session['game'].fork()
+    assert predicted.execute_move(move)['valid']
+    key = position_key(predicted)
+
+    deadline = time.time() + 10
+    while key not in game_session['ponder']['results'] and time.time() < deadline:
+        time.sleep(0.01)
+    pondered = game_session['ponder']['results'][key]
+
+    hits = ai_scheduler.ponder_hits
+    client.get_received()
+    client.emit('confirm_placement', {})
+    received = wait_for(client, 'ai_moved', timeout=1.0)
+    reply = [msg for msg in received if msg['name'] == 'ai_moved'][0]['args'][0]
+    assert ai_scheduler.ponder_hits == hits + 1, "The reply came from the ponder results"
+    assert (reply['row'], reply['col']) == (pondered[1], pondered[2])
+
+    # Pondering resumes for the human's next turn and ends with the game
+    time.sleep(0.05)
+    ponder = game_session['ponder']
+    assert ponder['version'] == game_session['game'].state_version
+    client.emit('stop_game')
+    assert game_session['ponder'] is None and ponder['cancel'].cancelled
+    client.disconnect()
+    ai_scheduler.move_delay = 0.5
+    print("✓ Pondered reply used for the predicted human move")
+
+
+if __name__ == "__main__":
+    test_ai_vs_ai_runs_in_background()
+    test_human_then_ai_reply()
+    test_search_cancellation_token()
+    test_stop_game_cancels_ai_turn()
+    test_ponder_during_human_turn()
+    print("\n✅ AI scheduler tests passed")
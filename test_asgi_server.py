@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test the asyncio (ASGI) GUI server: same page, same event protocol
+PollingClient speaks Engine.IO long-polling straight to the ASGI app, so no
+HTTP server or Socket.IO client library is needed.
+"""
+
+import asyncio
+import json
+import time
+
+import gui_server
+from asgi_server import AsyncGUIServer
+
+
+async def asgi_request(app, method, path, query='', body=b''):
+    """Make one HTTP request to an ASGI app; returns (status, body)"""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': [(b'content-type', b'text/plain;charset=UTF-8'),
+                         (b'content-length', str(len(body)).encode())],
+             'http_version': '1.1', 'scheme': 'http'}
+    requests = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'status': None, 'body': b''}
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        await asyncio.Event().wait()  # The client never disconnects early
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    await app(scope, receive, send)
+    return response['status'], response['body'].decode()
+
+
+class PollingClient:
+    """Minimal Socket.IO client over Engine.IO v4 long-polling"""
+
+    def __init__(self, app, query=''):
+        self.app = app
+        self.query = query
+        self.sid = None
+        self.events = []
+
+    async def _request(self, method, body=''):
+        query = f'EIO=4&transport=polling&{self.query}'
+        if self.sid:
+            query += f'&sid={self.sid}'
+        status, text = await asgi_request(self.app, method, '/socket.io/', query, body.encode())
+        assert status == 200, f"{method} failed: {status} {text}"
+        return text
+
+    async def connect(self):
+        opened = await self._request('GET')
+        self.sid = json.loads(opened[1:])['sid']
+        await self._request('POST', '40')
+        return await self.wait_for('connection_established')
+
+    async def emit(self, event, *args):
+        await self._request('POST', '42' + json.dumps([event, *args]))
+
+    async def poll(self):
+        """One long-poll: collect the events it delivers"""
+        for packet in (await self._request('GET')).split('\x1e'):
+            if packet == '2':
+                await self._request('POST', '3')  # Pong
+            elif packet.startswith('42'):
+                name, *args = json.loads(packet[2:])
+                self.events.append((name, args[0] if args else None))
+
+    async def wait_for(self, name, timeout=10.0):
+        """Poll until an event called name arrives; returns the events received so far"""
+        deadline = time.time() + timeout
+        while not any(event == name for event, _ in self.events):
+            await asyncio.wait_for(self.poll(), max(deadline - time.time(), 0.01))
+        received, self.events = self.events, []
+        return received
+
+    async def disconnect(self):
+        await self._request('POST', '41')
+        await self._request('POST', '1')
+
+
+def first_valid_move(game):
+    move = game.get_valid_moves()[0]
+    return ({'row': move['position'][0], 'col': move['position'][1], 'piece_index': move['piece_index']},
+            move['rotation'])
+
+
+async def play_move(client, game):
+    placement, rotations = first_valid_move(game)
+    await client.emit('place_piece', placement)
+    for _ in range(rotations):
+        await client.emit('rotate_piece', {})
+    await client.emit('confirm_placement', {})
+    return await client.wait_for('piece_placed')
+
+
+async def check_protocol():
+    server = AsyncGUIServer()
+
+    # The page and its static files
+    status, html = await asgi_request(server.app, 'GET', '/')
+    assert status == 200 and '/static/js/game.js' in html
+    status, script = await asgi_request(server.app, 'GET', '/static/js/game.js')
+    assert status == 200 and 'applyStateDelta' in script
+    status, metrics = await asgi_request(server.app, 'GET', '/metrics')
+    assert status == 200 and '# TYPE borderline_sessions gauge' in metrics
+    print("✓ Serves templates/index.html, /static and /metrics")
+
+    # A game played through the same events as with gui_server.py
+    player = PollingClient(server.app, 'room=asgi-1')
+    await player.connect()
+    await player.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+    started = dict(await player.wait_for('game_started'))['game_started']
+    game = gui_server.game_sessions['asgi-1']['game']
+    assert started['version'] == game.state_version
+
+    spectator = PollingClient(server.app, 'room=asgi-1&role=spectator')
+    names = [name for name, _ in await spectator.connect()]
+    if 'spectator_update' not in names:
+        await spectator.wait_for('spectator_update')
+    await spectator.emit('spectator_ack')
+
+    names = [name for name, _ in await play_move(player, game)]
+    assert names.index('piece_pending_rotation') < names.index('piece_placed'), "Events arrive in order"
+    update = dict(await spectator.wait_for('spectator_update'))['spectator_update']
+    assert update['event'] == 'piece_pending_rotation'
+    assert game.turn_count == 1
+    print("✓ Same event protocol for players and spectators")
+
+    # Many rooms at once; the loop stays free while engines and AIs work
+    clients = [PollingClient(server.app, f'room=asgi-many-{i}') for i in range(20)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    await asyncio.gather(*(client.emit('start_game', {'mode': 'human_vs_ai', 'red_type': 'human',
+                                                      'blue_type': 'ai'}) for client in clients))
+    await asyncio.gather(*(client.wait_for('game_started') for client in clients))
+    start = time.time()
+    await asyncio.gather(*(play_move(client, gui_server.game_sessions[f'asgi-many-{i}']['game'])
+                           for i, client in enumerate(clients)))
+    await player.emit('get_state')
+    await player.wait_for('game_state', timeout=2.0)
+    await asyncio.gather(*(client.wait_for('ai_moved') for client in clients))
+    print(f"✓ 20 human vs AI games answered in {time.time() - start:.2f}s")
+
+    for client in clients + [spectator, player]:
+        await client.disconnect()
+    deadline = time.time() + 5
+    while any(room.startswith('asgi-') for room in gui_server.game_sessions) and time.time() < deadline:
+        await asyncio.sleep(0.01)
+    assert not any(room.startswith('asgi-') for room in gui_server.game_sessions), "Rooms are released"
+
+
+def test_asgi_server_protocol():
+    """The ASGI server plays games through the same page and events"""
+    print("=" * 60)
+    print("TEST: asyncio (ASGI) GUI server")
+    print("=" * 60)
+
+    gui_server.ai_scheduler.move_delay = 0
+    try:
+        asyncio.run(check_protocol())
+    finally:
+        gui_server.transport = gui_server.FlaskTransport()
+        gui_server.ai_scheduler.move_delay = 0.5
+
+
+if __name__ == "__main__":
+    test_asgi_server_protocol()
+    print("\n✅ ASGI server tests passed")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test the exact endgame solver and the combat odds it relies on
+"""
+
+import os
+import random
+import tempfile
+
+from borderline_gpt import BorderlineGPT, GamePiece, attacker_win_probability, combat_win_probability
+from endgame_solver import EndgameSolver
+from engine_server import EngineRPC
+
+
+def play_to_endgame(seed, hand_size):
+    """Play random moves until the combined hand size reaches hand_size"""
+    random.seed(seed)
+    game = BorderlineGPT()
+    while not game.game_over and len(game.red_player.pieces) + len(game.blue_player.pieces) > hand_size:
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            game.switch_player()
+            game.turn_count += 1
+            continue
+        game.execute_move(random.choice(valid_moves))
+    return game
+
+
+def test_combat_probability():
+    """Equal power: attacker wins ties, so 21 of 36 rolls"""
+    assert attacker_win_probability(2, 2) == 21 / 36
+    assert attacker_win_probability(5, 0) == 1.0
+    assert attacker_win_probability(0, 6) == 0.0
+    assert attacker_win_probability(7, 5) == attacker_win_probability(4, 2), "Only the difference matters"
+
+    block, line = GamePiece.create_fixed_piece_set('R')[-1], GamePiece.create_fixed_piece_set('B')[0]
+    # Power 4 against two power-1 defenders
+    assert combat_win_probability(block, [line, line]) == attacker_win_probability(4, 2)
+    print("✓ Combat probabilities are exact")
+
+
+def test_solver_move_is_legal_and_cached():
+    """Solved moves are legal, and re-solving hits the persistent table"""
+    print("=" * 60)
+    print("TEST: Endgame solver")
+    print("=" * 60)
+
+    game = play_to_endgame(29, 2)
+    assert not game.game_over, "Seeded game should still be running"
+
+    solver = EndgameSolver(max_hand_size=2)
+    assert solver.applies(game)
+    result = solver.solve(game)
+    probabilities = result['win_probability']
+    assert 0.0 <= probabilities['R'] + probabilities['B'] <= 1.0
+    print(f"✓ Solved in {solver.nodes_searched} nodes: {probabilities}")
+
+    if result['move'] is not None:
+        assert result['move'] in game.get_valid_moves(), "Solver move must be legal"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        table_file = os.path.join(tmpdir, 'endgame.json')
+        solver.save(table_file)
+        reloaded = EndgameSolver(max_hand_size=2, table_file=table_file)
+        assert reloaded.solve(game) == result
+        assert reloaded.nodes_searched == 0, "Position should come from the saved table"
+    print("✓ Saved table answers the position without searching")
+
+
+def test_play_turn_does_not_use_solver():
+    """Terminal turns return pieces to hands, which the solver does not model"""
+    print("=" * 60)
+    print("TEST: play_turn without the endgame solver")
+    print("=" * 60)
+
+    game = play_to_endgame(29, 2)
+    solver = game.endgame_solver = EndgameSolver(max_hand_size=2)
+    assert solver.applies(game)
+
+    turn = game.turn_count
+    game.play_turn()
+    assert game.game_over or game.turn_count == turn + 1
+    assert solver.nodes_searched == 0 and not solver.table, "play_turn must not consult the solver"
+
+    if not game.game_over and solver.applies(game):
+        game.choose_current_move()
+        assert solver.nodes_searched > 0, "API turns still use the solver"
+    print("✓ play_turn used the player's own move choice")
+
+
+def test_engine_server_uses_solver():
+    """Engine games get the server's solver; ai_move solves the endgame and autosaves the table"""
+    print("=" * 60)
+    print("TEST: Endgame solver through the engine server")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        table_file = os.path.join(tmpdir, 'endgame.json')
+        solver = EndgameSolver(max_hand_size=2, table_file=table_file, save_every=1)
+        rpc = EngineRPC(endgame_solver=solver)
+
+        random.seed(29)
+        game_id = rpc.dispatch('new_game', {'include_state': False})['game_id']
+        game, _ = rpc.registry.get(game_id)
+        while not game.game_over and not solver.applies(game):
+            valid_moves = rpc.dispatch('get_valid_moves', {'game_id': game_id})
+            if not valid_moves:
+                rpc.dispatch('ai_move', {'game_id': game_id, 'include_state': False})  # Pass
+                continue
+            rpc.dispatch('execute_move', {'game_id': game_id, 'move': random.choice(valid_moves),
+                                          'include_state': False})
+        assert not game.game_over, "Seeded game should reach the endgame"
+        assert solver.nodes_searched == 0
+
+        result = rpc.dispatch('ai_move', {'game_id': game_id, 'include_state': False})
+        assert result['valid']
+        assert solver.nodes_searched > 0, "ai_move should be answered by the solver"
+        assert os.path.exists(table_file), "Table should be saved after save_every positions"
+        assert solver.unsaved == 0
+        assert len(EndgameSolver(table_file=table_file).table) == len(solver.table)
+    print(f"✓ ai_move searched {solver.nodes_searched} nodes and saved {len(solver.table)} positions")
+
+
+if __name__ == "__main__":
+    test_combat_probability()
+    test_solver_move_is_legal_and_cached()
+    test_play_turn_does_not_use_solver()
+    test_engine_server_uses_solver()
+    print("\n✅ Endgame solver tests passed")
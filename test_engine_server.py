@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test the headless JSON-RPC engine server over a real TCP socket
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+
+import engine_server
+from borderline_gpt import BorderlineGPT
+from engine_server import (create_server, GameRegistry, RPCError, GAME_NOT_FOUND, INVALID_PARAMS,
+                           INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR, TOO_MANY_GAMES)
+
+
+class EngineClient:
+    """Minimal line-delimited JSON-RPC client"""
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.file = self.sock.makefile('rwb')
+        self.next_id = 0
+
+    def call(self, method, **params):
+        self.next_id += 1
+        request = {'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': params}
+        self.file.write(json.dumps(request).encode() + b'\n')
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        assert response['id'] == self.next_id
+        return response
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def start_server():
+    server = create_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_play_games_over_rpc():
+    """A bot plays Red against the engine's Blue AI, two games at once"""
+    print("=" * 60)
+    print("TEST: Games over the JSON-RPC engine server")
+    print("=" * 60)
+
+    random.seed(39)
+    server = start_server()
+    try:
+        client = EngineClient(server.server_address)
+        game_ids = [client.call('new_game', blue_strategy='defensive')['result']['game_id']
+                    for _ in range(2)]
+        assert len(set(game_ids)) == 2
+        assert sorted(client.call('list_games')['result']['game_ids']) == sorted(game_ids)
+
+        for game_id in game_ids:
+            for _ in range(6):
+                moves = client.call('get_valid_moves', game_id=game_id, tokens=True)['result']
+                result = client.call('execute_move', game_id=game_id, move=random.choice(moves),
+                                     include_state=False)['result']
+                assert result['valid'] and 'game_state' not in result
+                if result['game_over']:
+                    break
+                reply = client.call('ai_move', game_id=game_id)['result']
+                assert reply['valid'], reply
+                if reply.get('game_over'):
+                    break
+
+        state = client.call('get_game_state', game_id=game_ids[0])['result']
+        history = client.call('get_move_history', game_id=game_ids[0])['result']
+        assert len(history) > 0
+        packed = client.call('get_valid_moves', game_id=game_ids[0], encoding='packed')['result']
+        assert all(isinstance(code, int) for code in packed)
+
+        fork_id = client.call('fork', game_id=game_ids[0])['result']['game_id']
+        client.call('execute_move', game_id=fork_id,
+                    move=client.call('get_valid_moves', game_id=fork_id)['result'][0])
+        assert client.call('get_game_state', game_id=game_ids[0])['result'] == state, \
+            "Moves on a fork leave the original untouched"
+
+        exported = client.call('export', game_id=game_ids[0])['result']
+        assert exported['game_id'] == game_ids[0] and len(exported['move_history']) == len(history)
+
+        delta = client.call('get_state_delta', game_id=game_ids[0], since_version=state['version'])['result']
+        assert not delta['full'] and not delta['cells']
+
+        assert client.call('close_game', game_id=fork_id)['result']['closed']
+        client.close()
+        print(f"✓ Played {len(history)} moves, forked, exported and closed over RPC")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_rpc_errors():
+    """Malformed requests get JSON-RPC errors and the connection stays usable"""
+    print("=" * 60)
+    print("TEST: JSON-RPC error handling")
+    print("=" * 60)
+
+    server = start_server()
+    try:
+        client = EngineClient(server.server_address)
+        assert client.call('no_such_method')['error']['code'] == METHOD_NOT_FOUND
+        assert client.call('get_game_state', game_id='missing')['error']['code'] == GAME_NOT_FOUND
+
+        client.file.write(b'{not json\n')
+        client.file.flush()
+        assert json.loads(client.file.readline())['error']['code'] == PARSE_ERROR
+
+        game_id = client.call('new_game', include_state=False)['result']['game_id']
+        bad = client.call('execute_move', game_id=game_id,
+                          move={'player': 'R', 'piece_index': 0, 'position': [5, 5], 'rotation': 0})
+        assert not bad['result']['valid'], "Illegal moves are results, not errors"
+
+        # Notifications get no response, not even an error; the next reply is the call's
+        for method, params in (('no_such_method', {}), ('get_game_state', {'game_id': 'missing'})):
+            client.file.write(json.dumps({'jsonrpc': '2.0', 'method': method, 'params': params}).encode() + b'\n')
+        client.file.flush()
+        assert 'result' in client.call('list_games'), "Failed notifications must not be answered"
+        client.close()
+        print("✓ Errors reported without dropping the connection")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_clients_cannot_choose_dice():
+    """combat_rolls sent by a client are dropped; the engine rolls its own"""
+    print("=" * 60)
+    print("TEST: No client-chosen combat dice")
+    print("=" * 60)
+
+    random.seed(2)
+    server = start_server()
+    try:
+        client = EngineClient(server.server_address)
+        game_id = client.call('new_game', include_state=False)['result']['game_id']
+        combats = []
+        for _ in range(40):
+            moves = client.call('get_valid_moves', game_id=game_id)['result']
+            if not moves:
+                break
+            move = dict(random.choice(moves), combat_rolls=[100, 1])
+            result = client.call('execute_moves', game_id=game_id, moves=[move], return_state='none')
+            result = result['result']['results'][0]
+            combats += [e['combat_data'] for e in result['events'] if e['type'] == 'combat']
+            if result['game_over']:
+                break
+        assert combats, "Seeded game should have a combat"
+        assert all(1 <= c['attacker_roll'] <= 6 and 1 <= c['defender_roll'] <= 6 for c in combats)
+
+        history = client.call('get_move_history', game_id=game_id)['result']
+        recorded = [move['combat_rolls'] for move in history if 'combat_rolls' in move]
+        assert recorded == [[c['attacker_roll'], c['defender_roll']] for c in combats]
+
+        replay = client.call('execute_moves', game_id=game_id, moves=[], replay=True)
+        assert replay['error']['code'] == INVALID_PARAMS, "The replay path is not exposed"
+        client.close()
+        print(f"✓ {len(combats)} combats rolled by the engine")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_oversize_lines_rejected():
+    """Lines longer than MAX_LINE get an error and the connection is closed"""
+    print("=" * 60)
+    print("TEST: Request line limit")
+    print("=" * 60)
+
+    max_line = engine_server.MAX_LINE
+    engine_server.MAX_LINE = 1024
+    server = start_server()
+    try:
+        client = EngineClient(server.server_address)
+        assert 'result' in client.call('list_games', padding='x' * 900)
+        client.file.write(b'{"jsonrpc": "2.0", "id": 1, "method": "list_games", "params": {"padding": "'
+                          + b'x' * 4096 + b'"}}\n')
+        client.file.flush()
+        response = json.loads(client.file.readline())
+        assert response['id'] is None and response['error']['code'] == INVALID_REQUEST
+        assert client.file.readline() == b'', "The connection is closed after an oversize line"
+        client.close()
+        print("✓ Oversize request line rejected")
+    finally:
+        engine_server.MAX_LINE = max_line
+        server.shutdown()
+        server.server_close()
+
+
+def test_idle_games_evicted():
+    """Games nobody uses for idle_timeout seconds make room for new ones"""
+    print("=" * 60)
+    print("TEST: Idle game eviction")
+    print("=" * 60)
+
+    registry = GameRegistry(max_games=2, idle_timeout=0.2)
+    first = registry.add(BorderlineGPT())
+    second = registry.add(BorderlineGPT())
+    try:
+        registry.add(BorderlineGPT())
+        assert False, "The registry should be full"
+    except RPCError as e:
+        assert e.code == TOO_MANY_GAMES
+
+    time.sleep(0.25)
+    registry.get(second)  # Still in use
+    third = registry.add(BorderlineGPT())
+    assert registry.ids() == [second, third], "Only the idle game is evicted"
+    try:
+        registry.get(first)
+        assert False, "An evicted game is gone"
+    except RPCError as e:
+        assert e.code == GAME_NOT_FOUND
+
+    kept = GameRegistry(max_games=1, idle_timeout=None)
+    kept.add(BorderlineGPT())
+    try:
+        kept.add(BorderlineGPT())
+        assert False, "Without a timeout games stay until closed"
+    except RPCError as e:
+        assert e.code == TOO_MANY_GAMES
+    print("✓ Idle games evicted in least-recently-used order")
+
+
+if __name__ == "__main__":
+    test_play_games_over_rpc()
+    test_rpc_errors()
+    test_clients_cannot_choose_dice()
+    test_oversize_lines_rejected()
+    test_idle_games_evicted()
+    print("\n✅ Engine server tests passed")
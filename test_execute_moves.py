@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test batch move execution with execute_moves() and move tokens
+"""
+
+import random
+
+from borderline_gpt import BorderlineGPT
+
+
+def record_game(seed, num_moves=20):
+    """Play random API moves and return the game"""
+    random.seed(seed)
+    game = BorderlineGPT()
+    for _ in range(num_moves):
+        valid_moves = game.get_valid_moves()
+        if game.game_over or not valid_moves:
+            break
+        game.execute_move(random.choice(valid_moves))
+    return game
+
+
+def test_batch_matches_single_moves():
+    """A batch replay reaches the same state as move-by-move execution"""
+    print("=" * 60)
+    print("TEST: execute_moves matches execute_move")
+    print("=" * 60)
+
+    original = record_game(37)
+    history = original.get_move_history()
+
+    game = BorderlineGPT()
+    batch = game.execute_moves(history, replay=True)
+    assert batch['valid'] and batch['reason'] is None
+    assert batch['applied'] == len(history)
+    assert all('game_state' not in r for r in batch['results']), "Only the final state is built"
+    assert batch['game_state']['board'] == original.get_game_state()['board']
+    assert batch['game_over'] == original.game_over
+
+    each = BorderlineGPT().execute_moves(history[:3], return_state='each')
+    assert all('game_state' in r for r in each['results'])
+    assert 'game_state' not in each
+
+    none = BorderlineGPT().execute_moves(history[:3], return_state='none')
+    assert 'game_state' not in none and none['applied'] == 3
+
+    # Each move is its own undo step
+    game.undo()
+    assert len(game.get_move_history()) == len(history) - 1
+    print(f"✓ Replayed {len(history)} moves in one batch")
+
+
+def test_batch_stops_at_first_invalid_move():
+    """Moves after an invalid one are not applied"""
+    print("=" * 60)
+    print("TEST: execute_moves stops at the first invalid move")
+    print("=" * 60)
+
+    history = record_game(137, num_moves=6).get_move_history()
+    bad_move = dict(history[2], position=[4, 4])  # Not connected to anything
+
+    game = BorderlineGPT()
+    batch = game.execute_moves(history[:2] + [bad_move] + history[3:])
+    assert not batch['valid'] and batch['reason']
+    assert batch['applied'] == 2 and len(batch['results']) == 3
+    assert len(game.get_move_history()) == 2, "Nothing after the invalid move is applied"
+
+    try:
+        game.execute_moves(history, return_state='sometimes')
+        assert False, "Unknown return_state should raise"
+    except ValueError:
+        pass
+    print("✓ Batch stopped at the invalid move")
+
+
+def test_move_tokens_skip_revalidation():
+    """Current tokens skip can_place_piece; stale or forged ones do not"""
+    print("=" * 60)
+    print("TEST: Move tokens")
+    print("=" * 60)
+
+    random.seed(38)
+    game = BorderlineGPT()
+    checks = []
+    can_place_piece = game.board.can_place_piece
+    game.board.can_place_piece = lambda *args: checks.append(args) or can_place_piece(*args)
+
+    move = random.choice(game.get_valid_moves(tokens=True))
+    checks.clear()  # get_valid_moves itself checks placements
+    assert game.execute_move(move)['valid']
+    assert not checks, "A current token should skip placement validation"
+    assert 'token' not in game.get_move_history()[-1], "Tokens are not recorded in history"
+
+    # Stale token: the state has moved on, so the move is validated again
+    stale = random.choice(game.get_valid_moves(tokens=True))
+    game.execute_move(random.choice(game.get_valid_moves()))
+    game.get_valid_moves()
+    checks.clear()
+    game.execute_move(dict(stale, player=game.current_player.color))
+    assert checks, "A stale token falls back to full validation"
+
+    # Forged token: a current token attached to a different (illegal) move
+    legal = {(m['piece_index'], m['rotation'], tuple(m['position'])) for m in game.get_valid_moves()}
+    token_move = game.get_valid_moves(tokens=True)[0]
+    for row in range(8):
+        if (0, 0, (row, 5)) not in legal and game.board.grid[row][5] is None:
+            break
+    forged = dict(token_move, piece_index=0, rotation=0, position=[row, 5])
+    assert not game._has_current_token(forged)
+    assert not game.execute_move(forged)['valid'], "Forged tokens must not bypass validation"
+
+    # Malformed fields fall back to full validation instead of raising
+    token_move = game.get_valid_moves(tokens=True)[0]
+    float_rotation = dict(token_move, rotation=float(token_move['rotation']))
+    assert not game._has_current_token(float_rotation)
+    assert not game._has_current_token(dict(token_move, token='\u00e9' + token_move['token']))
+    checks.clear()
+    assert game.execute_move(float_rotation)['valid']
+    assert checks, "A move with a non-int rotation is validated in full"
+
+    # Tokens are bound to one game
+    fork = game.fork()
+    move = fork.get_valid_moves(tokens=True)[0]
+    assert not game._has_current_token(move), "A fork's tokens do not validate on the original"
+    print("✓ Tokens skip validation only while current")
+
+
+def test_recorded_dice_only_on_replay():
+    """execute_move rolls its own dice; replay_move uses checked recorded ones"""
+    print("=" * 60)
+    print("TEST: Recorded combat dice")
+    print("=" * 60)
+
+    history = record_game(2, num_moves=40).get_move_history()
+    combat_at = next(i for i, move in enumerate(history) if 'combat_rolls' in move)
+    recorded = history[combat_at]['combat_rolls']
+
+    def combat_rolls(result):
+        combat = next(e['combat_data'] for e in result['events'] if e['type'] == 'combat')
+        return [combat['attacker_roll'], combat['defender_roll']]
+
+    game = BorderlineGPT()
+    game.execute_moves(history[:combat_at], replay=True)
+    fork = game.fork()
+
+    # Chosen dice in a move are ignored, and not recorded
+    random.seed(7)
+    rolled = [random.randint(1, 6), random.randint(1, 6)]
+    random.seed(7)
+    result = game.execute_move(dict(history[combat_at], combat_rolls=[100, 1]))
+    assert result['valid'] and combat_rolls(result) == rolled
+    assert game.get_move_history()[-1]['combat_rolls'] == rolled
+
+    # Replays resolve combat with the recorded dice, which must be real dice
+    for bad in ([100, 1], [0, 3], [2.0, 3], [True, 3], [4], 'six'):
+        result = fork.replay_move(dict(history[combat_at], combat_rolls=bad))
+        assert not result['valid'] and 'combat_rolls' in result['reason'], bad
+    result = fork.replay_move(history[combat_at])
+    assert result['valid'] and combat_rolls(result) == recorded
+    print(f"✓ Move {combat_at + 1} replayed with its recorded dice {recorded}")
+
+
+if __name__ == "__main__":
+    test_batch_matches_single_moves()
+    test_batch_stops_at_first_invalid_move()
+    test_move_tokens_skip_revalidation()
+    test_recorded_dice_only_on_replay()
+    print("\n✅ Batch move tests passed")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test cheap game forks for what-if analysis
+"""
+
+import copy
+import random
+import timeit
+
+from borderline_gpt import BorderlineGPT
+
+
+def test_fork_is_independent():
+    """Moves on a fork must not touch the original game, and vice versa"""
+    print("=" * 60)
+    print("TEST: Forks are independent")
+    print("=" * 60)
+
+    random.seed(35)
+    game = BorderlineGPT()
+    for _ in range(8):
+        game.execute_move(random.choice(game.get_valid_moves()))
+
+    before = game.get_game_state()
+    history_length = len(game.get_move_history())
+
+    fork = game.fork()
+    assert fork.get_game_state() == before, "A fresh fork has the same state"
+    assert fork.get_valid_moves() == game.get_valid_moves()
+    assert fork.red_player.pieces[0] is game.red_player.pieces[0], "Pieces are shared"
+
+    while not fork.game_over and fork.get_valid_moves():
+        fork.execute_move(random.choice(fork.get_valid_moves()))
+
+    assert game.get_game_state() == before, "Playing out a fork leaves the original untouched"
+    assert len(game.get_move_history()) == history_length
+    assert fork.current_player in (fork.red_player, fork.blue_player)
+
+    # And the other way round
+    fork = game.fork()
+    fork_state = fork.get_game_state()
+    game.execute_move(random.choice(game.get_valid_moves()))
+    assert fork.get_game_state() == fork_state, "Moves on the original do not reach the fork"
+    print("✓ Original and fork evolve independently")
+
+
+def test_fork_with_classic_captures():
+    """Captured pieces are converted as copies, so shared pieces stay intact"""
+    print("=" * 60)
+    print("TEST: Forks survive classic-rule captures")
+    print("=" * 60)
+
+    random.seed(135)
+    game = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+    for _ in range(4):
+        game.play_turn()
+
+    before = game.get_game_state()
+    fork = game.fork()
+    for _ in range(12):
+        if fork.game_over:
+            break
+        fork.play_turn()
+    assert game.get_game_state() == before, "Captures on a fork must not recolour shared pieces"
+    print("✓ Original unchanged after AI turns on the fork")
+
+
+def test_fork_is_cheap():
+    """A fork should cost far less than a deep copy"""
+    print("=" * 60)
+    print("TEST: Fork cost")
+    print("=" * 60)
+
+    game = BorderlineGPT()
+    fork_time = timeit.timeit(game.fork, number=200) / 200
+    deepcopy_time = timeit.timeit(lambda: copy.deepcopy(game), number=20) / 20
+    print(f"fork: {fork_time * 1e6:.1f} µs, deepcopy: {deepcopy_time * 1e6:.1f} µs")
+    assert fork_time * 10 < deepcopy_time, "fork() should be an order of magnitude cheaper"
+    print("✓ Fork is cheap")
+
+
+if __name__ == "__main__":
+    test_fork_is_independent()
+    test_fork_with_classic_captures()
+    test_fork_is_cheap()
+    print("\n✅ Fork tests passed")
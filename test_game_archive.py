@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test the memory-mapped game archive reader
+Plays a few random games, exports them, archives them and checks the arrays
+"""
+
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from borderline_gpt import BorderlineGPT
+from game_archive import (GameArchive, build_archive, encode_game, COMBAT_NONE,
+                          COMBAT_ATTACKER_WON, COMBAT_DEFENDER_WON, COMBAT_UNKNOWN)
+
+
+def play_random_game(num_turns=30):
+    """Play a random game through the API and return it"""
+    game = BorderlineGPT()
+    for _ in range(num_turns):
+        valid_moves = game.get_valid_moves()
+        if not valid_moves or game.game_over:
+            break
+        game.execute_move(random.choice(valid_moves))
+    return game
+
+
+def test_build_and_read_archive():
+    """Archived moves should match the exported move histories"""
+    print("=" * 60)
+    print("TEST: Build and read game archive")
+    print("=" * 60)
+
+    random.seed(26)
+    games = [play_random_game() for _ in range(3)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i, game in enumerate(games):
+            game.export_game(f"game_{i}.json", auto_directory=tmpdir)
+
+        archive_path = os.path.join(tmpdir, 'archive.npy')
+        count = build_archive(tmpdir, archive_path)
+        assert count == 3, f"Expected 3 games, got {count}"
+
+        archive = GameArchive(archive_path)
+        assert isinstance(archive.moves, np.memmap), "Moves should be memory-mapped"
+
+        total_moves = sum(len(g.get_move_history()) for g in games)
+        assert archive.move_count == total_moves, "Every recorded move should be archived"
+        print(f"✓ Archived {archive.move_count} moves from {len(archive)} games")
+
+        for i, game in enumerate(games):
+            moves = archive.game_moves(i)
+            history = game.get_move_history()
+            assert len(moves) == len(history), "Per-game move slice length mismatch"
+            for record, move in zip(moves, history):
+                assert record['player'].decode() == move['player']
+                assert [int(record['row']), int(record['col'])] == move['position']
+                assert int(record['rotation']) == move['rotation']
+                if 'combat_rolls' in move:
+                    assert record['combat'] in (COMBAT_ATTACKER_WON, COMBAT_DEFENDER_WON)
+                else:
+                    assert record['combat'] == COMBAT_NONE
+        print("✓ Records match move histories (including combat outcomes)")
+
+        heatmap = archive.placement_heatmap()
+        assert heatmap.shape == (8, 6)
+        assert heatmap.sum() == total_moves
+        red_first = archive.opening_moves(0)
+        assert (red_first['player'] == b'R').all(), "Red always moves first"
+        assert (red_first['row'] == 0).all(), "First move must be on Red's home row"
+        print("✓ Aggregate queries work on the memory-mapped arrays")
+
+        # Release the memory maps before the directory is removed
+        del archive, red_first
+
+
+def test_exports_without_dice():
+    """Outcomes that were never recorded are marked unknown, not re-rolled"""
+    print("=" * 60)
+    print("TEST: Archiving exports without recorded dice")
+    print("=" * 60)
+
+    random.seed(2)
+    game = play_random_game(num_turns=40)
+    game_data = game.get_export_data()
+    history = [dict(move) for move in game_data['move_history']]
+    first_combat = next(i for i, move in enumerate(history) if 'combat_rolls' in move)
+    for move in history:
+        move.pop('combat_rolls', None)
+    old_export = dict(game_data, move_history=history, winner='B')
+
+    moves, winner = encode_game(old_export, 0)
+    assert winner == 'B', "The winner comes from the export"
+    assert len(moves) == len(history)
+    assert (moves['combat'][:first_combat] == COMBAT_NONE).all()
+    assert (moves['combat'][first_combat:] == COMBAT_UNKNOWN).all(), "Nothing after it is trusted"
+
+    # Pip patterns stay exact: they match the original game's records
+    recorded, _ = encode_game(game_data, 0)
+    assert (moves['pattern'] == recorded['pattern']).all()
+    assert COMBAT_UNKNOWN not in recorded['combat']
+    print(f"✓ {len(moves) - first_combat} moves from move {first_combat + 1} on marked unknown")
+
+
+if __name__ == "__main__":
+    test_build_and_read_archive()
+    test_exports_without_dice()
+    print("\n✅ Game archive tests passed")
@@ -6,7 +6,7 @@ Tests the Flask server and game logic without browser
 
 import sys
 import json
-from gui_server import app, socketio, current_game
+from gui_server import app, socketio
 from flask_socketio import SocketIOTestClient
 
 def test_flask_app():
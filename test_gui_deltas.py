@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test the versioned state deltas sent by the GUI server
+apply_gui_delta mirrors applyStateDelta in static/js/game.js
+"""
+
+import base64
+import copy
+import gzip
+import json
+
+import gui_server
+from gui_server import app, socketio
+
+
+def apply_gui_delta(state, delta):
+    """Python port of applyStateDelta(); returns None when a resync is needed"""
+    if delta['full']:
+        return copy.deepcopy(delta['game_state'])
+    if state is None or state['version'] != delta['since_version']:
+        return None
+
+    for cell in delta['cells']:
+        state['board']['grid'][cell['row']][cell['col']] = cell['piece']
+    for op in delta['hands']:
+        hand = state['red_pieces'] if op['player'] == 'R' else state['blue_pieces']
+        if op['op'] == 'remove':
+            hand.pop(op['index'])
+        else:
+            hand.insert(op['index'], op['piece'])
+    state['red_pieces_remaining'] = len(state['red_pieces'])
+    state['blue_pieces_remaining'] = len(state['blue_pieces'])
+    for key in ('current_player', 'turn_count', 'game_over', 'winner', 'version'):
+        state[key] = delta[key]
+    return state
+
+
+def normalize(state):
+    """Round-trip through JSON, as the client sees it"""
+    return json.loads(json.dumps(state))
+
+
+def test_move_deltas_rebuild_the_state():
+    """Applying each piece_placed delta reproduces the server's full state"""
+    print("=" * 60)
+    print("TEST: Move deltas")
+    print("=" * 60)
+
+    client = socketio.test_client(app, query_string='room=deltas')
+    client.get_received()
+    client.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+    state = normalize(client.get_received()[0]['args'][0])
+    game = gui_server.game_sessions['deltas']['game']
+
+    delta_bytes = full_bytes = 0
+    for _ in range(10):
+        if game.game_over:
+            break
+        move = game.get_valid_moves()[0]
+        client.emit('place_piece', {'row': move['position'][0], 'col': move['position'][1],
+                                    'piece_index': move['piece_index']})
+        for _ in range(move['rotation']):
+            client.emit('rotate_piece', {})
+        client.emit('confirm_placement', {})
+
+        placed = [msg for msg in client.get_received() if msg['name'] == 'piece_placed']
+        assert placed, "The move should be accepted"
+        delta = placed[0]['args'][0]['delta']
+        assert 'game_state' not in placed[0]['args'][0], "Moves carry a delta, not the full state"
+        assert not delta['full']
+
+        state = apply_gui_delta(state, normalize(delta))
+        full = gui_server.get_game_state(game)
+        assert state == normalize(full), "Delta applied to the local model matches the server"
+        delta_bytes += len(json.dumps(delta))
+        full_bytes += len(json.dumps(full))
+
+    print(f"✓ Deltas: {delta_bytes} bytes vs {full_bytes} bytes of full states")
+    assert delta_bytes * 3 < full_bytes
+
+    # A client that missed updates gets a delta it cannot apply, and resyncs
+    late = socketio.test_client(app, query_string='room=deltas')
+    late.get_received()
+    move = game.get_valid_moves()[0]
+    client.emit('place_piece', {'row': move['position'][0], 'col': move['position'][1],
+                                'piece_index': move['piece_index']})
+    for _ in range(move['rotation']):
+        client.emit('rotate_piece', {})
+    client.emit('confirm_placement', {})
+    delta = [msg for msg in late.get_received() if msg['name'] == 'piece_placed'][0]['args'][0]['delta']
+    assert apply_gui_delta(None, delta) is None, "Stale clients must resync"
+    late.emit('get_state')
+    resynced = late.get_received()[0]['args'][0]
+    assert resynced['version'] == game.state_version
+
+    client.disconnect()
+    late.disconnect()
+    print("✓ Stale clients resync with get_state")
+
+
+def test_replay_deltas():
+    """Replay steps, step-backs and gotos all send applicable deltas"""
+    print("=" * 60)
+    print("TEST: Replay deltas")
+    print("=" * 60)
+
+    client = socketio.test_client(app, query_string='room=replay-deltas')
+    client.get_received()
+    client.emit('load_replay', {'filename': 'replay_demo.json'})
+    state = normalize(client.get_received()[0]['args'][0]['game_state'])
+    game_session = gui_server.game_sessions['replay-deltas']
+
+    for event, args in [('replay_step_forward', ()), ('replay_step_forward', ()),
+                        ('replay_goto', ({'move_number': 6},)), ('replay_step_back', ()),
+                        ('replay_goto', ({'move_number': 1},))]:
+        client.emit(event, *args)
+        payload = client.get_received()[0]['args'][0]
+        state = apply_gui_delta(state, normalize(payload['delta']))
+        # Seeking may switch the room to a fork of a cached keyframe
+        game = game_session['game']
+        assert state == normalize(gui_server.get_game_state(game)), f"Mismatch after {event}"
+
+    client.disconnect()
+    print("✓ Replay navigation keeps the local model in sync")
+
+
+def test_replay_timeline():
+    """load_replay with timeline=True ships the whole replay for client-side playback"""
+    print("=" * 60)
+    print("TEST: Pre-rendered replay timeline")
+    print("=" * 60)
+
+    client = socketio.test_client(app, query_string='room=replay-timeline')
+    client.get_received()
+    client.emit('load_replay', {'filename': 'replay_demo.json', 'timeline': True})
+    loaded = client.get_received()[0]['args'][0]
+    raw = gzip.decompress(base64.b64decode(loaded['timeline']))
+    timeline = json.loads(raw)
+    assert len(timeline['steps']) == loaded['total_moves']
+    assert timeline['initial_state'] == normalize(loaded['game_state'])
+
+    # Replaying the deltas on the client matches the server stepping through
+    state = copy.deepcopy(timeline['initial_state'])
+    game = gui_server.game_sessions['replay-timeline']['game']
+    for step in timeline['steps']:
+        state = apply_gui_delta(state, step['delta'])
+        client.emit('replay_step_forward')
+        server_step = normalize(client.get_received()[0]['args'][0])
+        assert step['move_number'] == server_step['move_number']
+        assert step['removed_pieces'] == server_step['removed_pieces']
+        assert state == normalize(gui_server.get_game_state(game)), f"Mismatch at move {step['move_number']}"
+
+    print(f"✓ {len(timeline['steps'])} moves in {len(loaded['timeline'])} bytes "
+          f"({len(raw)} bytes uncompressed)")
+    assert len(loaded['timeline']) < len(raw)
+
+    # Without the option, replay_loaded is unchanged
+    client.emit('load_replay', {'filename': 'replay_demo.json'})
+    assert 'timeline' not in client.get_received()[0]['args'][0]
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    test_move_deltas_rebuild_the_state()
+    test_replay_deltas()
+    test_replay_timeline()
+    print("\n✅ GUI delta tests passed")
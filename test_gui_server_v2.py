@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test that gui_server_v2.py (engine-driven turns via play_turn) still plays
+"""
+
+import gui_server_v2
+
+
+def test_v2_games_play_through_engine():
+    """Human and AI turns both go through BorderlineGPT.play_turn"""
+    print("=" * 60)
+    print("TEST: gui_server_v2 games")
+    print("=" * 60)
+
+    sleep = gui_server_v2.socketio.sleep
+    gui_server_v2.socketio.sleep = lambda seconds: None
+    try:
+        client = gui_server_v2.socketio.test_client(gui_server_v2.app)
+        client.get_received()
+
+        client.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+        client.get_received()
+        client.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+        client.emit('confirm_placement', {})
+        names = [message['name'] for message in client.get_received()]
+        assert names == ['piece_pending_rotation', 'turn_complete'], names
+        game = gui_server_v2.current_game
+        assert game.turn_count == 1 and game.current_player is game.blue_player
+        assert len(game.move_history) == 0 and game.state_version > 0
+        print("✓ Human placement played through play_turn")
+
+        client.emit('start_game', {'mode': 'ai_vs_ai', 'red_type': 'ai', 'blue_type': 'ai'})
+        turns = [message for message in client.get_received() if message['name'] == 'turn_complete']
+        assert turns and gui_server_v2.current_game.game_over == turns[-1]['args'][0]['game_over']
+        print(f"✓ AI vs AI game ran {len(turns)} turns")
+        client.disconnect()
+    finally:
+        gui_server_v2.socketio.sleep = sleep
+
+
+if __name__ == "__main__":
+    test_v2_games_play_through_engine()
+    print("\n✅ gui_server_v2 tests passed")
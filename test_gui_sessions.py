@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test per-room game sessions in the GUI server
+"""
+
+import gui_server
+from gui_server import app, socketio
+
+
+def event_names(client):
+    return [msg['name'] for msg in client.get_received()]
+
+
+def start_human_game(client):
+    client.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+
+
+def test_rooms_host_independent_games():
+    """Two rooms play separate games; emits stay inside each room"""
+    print("=" * 60)
+    print("TEST: Independent games per room")
+    print("=" * 60)
+
+    alice = socketio.test_client(app, query_string='room=table-1')
+    watcher = socketio.test_client(app, query_string='room=table-1')
+    bob = socketio.test_client(app, query_string='room=table-2')
+    for client in (alice, watcher, bob):
+        client.get_received()
+
+    start_human_game(alice)
+    start_human_game(bob)
+    assert gui_server.game_sessions['table-1']['game'] is not gui_server.game_sessions['table-2']['game']
+    assert 'game_started' in event_names(watcher), "Room members see their room's game"
+    assert event_names(bob).count('game_started') == 1, "Other rooms' games are not delivered"
+    alice.get_received()
+
+    # A move in table-1 leaves table-2 untouched
+    alice.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+    alice.emit('confirm_placement', {})
+    assert 'piece_placed' in event_names(watcher)
+    assert event_names(bob) == []
+    assert gui_server.game_sessions['table-1']['game'].turn_count == 1
+    assert gui_server.game_sessions['table-2']['game'].turn_count == 0
+    print("✓ Moves and emits stay within their room")
+
+    # Stopping one game does not stop the other
+    bob.emit('stop_game')
+    assert gui_server.game_sessions['table-2']['game'] is None
+    assert gui_server.game_sessions['table-1']['game'] is not None
+
+    for client in (alice, watcher, bob):
+        client.disconnect()
+    assert 'table-1' not in gui_server.game_sessions, "Empty rooms are dropped"
+    assert 'table-2' not in gui_server.game_sessions
+    print("✓ Room state is released when the last client leaves")
+
+
+def test_default_room_is_private():
+    """Clients without ?room= each get their own game"""
+    print("=" * 60)
+    print("TEST: Private default rooms")
+    print("=" * 60)
+
+    first = socketio.test_client(app)
+    second = socketio.test_client(app)
+    first.get_received()
+    second.get_received()
+
+    start_human_game(first)
+    assert 'game_started' in event_names(first)
+    assert event_names(second) == []
+
+    second.emit('get_state')
+    assert 'error' in event_names(second), "The second client has no game yet"
+
+    first.disconnect()
+    second.disconnect()
+    print("✓ Each connection gets a private game by default")
+
+
+if __name__ == "__main__":
+    test_rooms_host_independent_games()
+    test_default_room_is_private()
+    print("\n✅ GUI session tests passed")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test the opt-in engine instrumentation (instrumentation.py)
+"""
+
+import json
+import random
+import threading
+
+from borderline_gpt import BorderlineGPT, GameBoard, AIPlayer
+from instrumentation import EngineInstrumentation, BOARD_HOOKS
+
+
+def play_ai_turns(game, turns):
+    for _ in range(turns):
+        piece, row, col, rotation, piece_idx = game.choose_current_move()
+        result = game.execute_move({'player': game.current_player.color, 'piece_index': piece_idx,
+                                    'position': [row, col], 'rotation': rotation // 90})
+        assert result['valid']
+
+
+def test_disabled_hooks_leave_engine_untouched():
+    """Off means the original methods: nothing to pay when not profiling"""
+    print("=" * 60)
+    print("TEST: Instrumentation off")
+    print("=" * 60)
+
+    originals = {name: GameBoard.__dict__[name] for name in BOARD_HOOKS}
+    choose_move = AIPlayer.__dict__['choose_move']
+    instrumentation = EngineInstrumentation()
+
+    instrumentation.enable()
+    assert all(GameBoard.__dict__[name] is not originals[name] for name in BOARD_HOOKS)
+    instrumentation.disable()
+    assert all(GameBoard.__dict__[name] is originals[name] for name in BOARD_HOOKS)
+    assert AIPlayer.__dict__['choose_move'] is choose_move
+
+    random.seed(3)
+    play_ai_turns(BorderlineGPT(), 1)
+    assert instrumentation.snapshot()['totals'] == {}, "Nothing is recorded while disabled"
+    print("✓ Disabled instrumentation restores the original methods")
+
+
+def test_histograms_per_game_and_strategy():
+    """Enabled hooks count and time calls per game and per strategy"""
+    print("=" * 60)
+    print("TEST: Instrumentation on")
+    print("=" * 60)
+
+    instrumentation = EngineInstrumentation()
+    random.seed(11)
+    first = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+    first.game_id = 'first'
+    second = BorderlineGPT()
+    second.game_id = 'second'
+
+    instrumentation.enable()
+    try:
+        play_ai_turns(first, 4)
+        play_ai_turns(second, 2)
+        second.get_game_state()
+        # A direct board call outside any game still counts overall
+        GameBoard().check_victory('R')
+    finally:
+        instrumentation.disable()
+
+    # Hooks are global: AI workers left over from other tests may record too
+    report = json.loads(instrumentation.to_json())
+    totals, strategies = report['totals'], report['strategies']
+    games = {entry['game_id']: entry['hooks'] for entry in report['games'].values()}
+    assert {'first', 'second'} <= set(games)
+    assert report['games'][first.instance_id]['game_id'] == 'first'
+    assert {'AggressiveConnectorAI', 'DefensiveTerritoryAI', 'AIPlayer'} <= set(strategies)
+
+    # One choose_move per AI turn
+    assert games['first']['choose_move']['count'] == 4
+    assert games['second']['choose_move']['count'] == 2
+    assert strategies['AggressiveConnectorAI']['choose_move']['count'] >= 2
+
+    # Search work is attributed to the strategy and game that did it
+    for hook in ('can_place_piece', 'check_pip_adjacency', 'check_victory'):
+        assert strategies['DefensiveTerritoryAI'][hook]['count'] > 0, hook
+        per_game = games['first'][hook]['count'] + games['second'][hook]['count']
+        assert per_game > 0 and totals[hook]['count'] >= per_game + (hook == 'check_victory')
+    assert games['second']['get_game_state']['count'] >= 1
+    assert games['first']['resolve_combat']['count'] == 4, "Every executed move resolves combat"
+
+    stats = totals['check_pip_adjacency']
+    assert sum(stats['buckets'].values()) == stats['count']
+    assert 0 < stats['min_s'] <= stats['mean_s'] <= stats['max_s']
+    print(f"✓ {totals['can_place_piece']['count']} can_place_piece calls, "
+          f"{totals['choose_move']['mean_s'] * 1000:.0f} ms mean choose_move")
+
+
+def test_old_games_are_dropped():
+    """Only the most recent max_games games are kept"""
+    print("=" * 60)
+    print("TEST: Bounded per-game data")
+    print("=" * 60)
+
+    instrumentation = EngineInstrumentation(max_games=2)
+    games = [BorderlineGPT() for _ in range(3)]
+    instrumentation.enable()
+    try:
+        for i, game in enumerate(games):
+            game.game_id = f'game-{i}'
+            game.get_game_state()
+        games[1].get_game_state()
+    finally:
+        instrumentation.disable()
+
+    assert list(instrumentation.snapshot()['games']) == [games[2].instance_id, games[1].instance_id]
+    assert instrumentation.snapshot()['totals']['get_game_state']['count'] == 4
+    print("✓ Least recently active game dropped")
+
+
+def test_games_and_threads_kept_apart():
+    """Games sharing a game_id and their forks get separate histograms; threads merge on export"""
+    print("=" * 60)
+    print("TEST: Per-instance games and per-thread recording")
+    print("=" * 60)
+
+    instrumentation = EngineInstrumentation()
+    game = BorderlineGPT()
+    twin = BorderlineGPT()
+    twin.game_id = game.game_id  # Started in the same second
+    fork = game.fork()
+    assert len({game.instance_id, twin.instance_id, fork.instance_id}) == 3
+
+    def get_states(target, times):
+        for _ in range(times):
+            target.get_game_state()
+
+    instrumentation.enable()
+    try:
+        get_states(game, 1)
+        threads = [threading.Thread(target=get_states, args=(target, times))
+                   for target, times in ((twin, 2), (fork, 3), (game, 4))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        instrumentation.disable()
+
+    report = instrumentation.snapshot()
+    counts = {instance_id: entry['hooks']['get_game_state']['count']
+              for instance_id, entry in report['games'].items()}
+    assert counts == {game.instance_id: 5, twin.instance_id: 2, fork.instance_id: 3}
+    assert report['totals']['get_game_state']['count'] == 10
+    assert instrumentation.snapshot() == report, "Finished threads' data is kept"
+    print("✓ Each game instance counted on its own across threads")
+
+
+if __name__ == "__main__":
+    test_disabled_hooks_leave_engine_untouched()
+    test_histograms_per_game_and_strategy()
+    test_old_games_are_dropped()
+    test_games_and_threads_kept_apart()
+    print("\n✅ Instrumentation tests passed")
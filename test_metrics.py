@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test the GUI server's /metrics endpoint (Prometheus text format)
+"""
+
+import time
+
+import gui_server
+from gui_server import app, socketio, ai_scheduler
+from instrumentation import instrumentation
+from metrics import MetricsRegistry, parse_metrics
+
+
+def scrape():
+    """GET /metrics and parse it"""
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return parse_metrics(response.get_data(as_text=True))
+
+
+def sample(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def test_metrics_after_play_and_replays():
+    """Games, AI and human moves, emits and replay loads show up in a scrape"""
+    print("=" * 60)
+    print("TEST: /metrics scrape")
+    print("=" * 60)
+
+    before = scrape()
+    ai_scheduler.move_delay = 0
+    gui_server.measure_emit_sizes = True
+    player = socketio.test_client(app, query_string='room=metrics-game')
+    spectator = socketio.test_client(app, query_string='room=metrics-game&role=spectator')
+    player.emit('start_game', {'mode': 'human_vs_ai', 'red_type': 'human', 'blue_type': 'ai'})
+    player.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+    player.emit('confirm_placement', {})
+
+    deadline = time.time() + 10
+    game = gui_server.game_sessions['metrics-game']['game']
+    while game.turn_count < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)  # Let the reply's emit land
+
+    viewer = socketio.test_client(app, query_string='room=metrics-replay')
+    viewer.emit('load_replay', {'filename': 'replay_demo.json'})
+    viewer.emit('load_replay', {'filename': 'replay_demo.json'})
+    viewer.emit('replay_step_forward')
+
+    samples = scrape()
+    assert sample(samples, 'borderline_sessions') >= 2
+    assert sample(samples, 'borderline_active_games') >= 1
+    assert sample(samples, 'borderline_replays') >= 1
+    assert sample(samples, 'borderline_connected_clients', role='player') >= 2
+    assert sample(samples, 'borderline_connected_clients', role='spectator') >= 1
+
+    def grew(name, **labels):
+        return sample(samples, name, **labels) - sample(before, name, **labels)
+
+    strategy = type(game.blue_player).__name__
+    assert grew('borderline_ai_move_seconds_count', strategy=strategy) >= 1
+    assert sample(samples, 'borderline_ai_move_seconds_bucket', strategy=strategy, le='+Inf') == \
+        sample(samples, 'borderline_ai_move_seconds_count', strategy=strategy)
+    assert grew('borderline_execute_move_seconds_count', source='human') == 1
+    assert grew('borderline_execute_move_seconds_count', source='ai') >= 1
+    assert grew('borderline_execute_move_seconds_count', source='replay') == 1
+    assert grew('borderline_emit_payload_bytes_count', event='piece_placed') == 1
+    assert grew('borderline_emit_payload_bytes_sum', event='game_started') > 1000, "Full states are big"
+    assert grew('borderline_emit_payload_bytes_count', event='spectator_update') >= 1
+    assert grew('borderline_replay_loads_total', source='file') == 2
+    assert grew('borderline_replay_cache_hits_total') >= 1
+
+    # Payload sizes are only measured on request
+    gui_server.measure_emit_sizes = False
+    viewer.emit('replay_step_forward')
+    assert sample(scrape(), 'borderline_emit_payload_bytes_count', event='replay_step') == \
+        sample(samples, 'borderline_emit_payload_bytes_count', event='replay_step')
+
+    for client in (player, spectator, viewer):
+        client.disconnect()
+    ai_scheduler.move_delay = 0.5
+    print(f"✓ Scraped {len(samples)} samples")
+
+
+def test_engine_histograms_when_instrumented():
+    """With instrumentation on, engine hook histograms are exported too"""
+    print("=" * 60)
+    print("TEST: Engine histograms in /metrics")
+    print("=" * 60)
+
+    assert not any(name.startswith('borderline_engine_call') for name, _ in scrape())
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        client = socketio.test_client(app, query_string='room=metrics-engine')
+        client.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+        client.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+        client.emit('confirm_placement', {})
+        samples = scrape()
+        client.disconnect()
+    finally:
+        instrumentation.disable()
+
+    assert sample(samples, 'borderline_engine_call_seconds_count', hook='can_place_piece') >= 1
+    assert sample(samples, 'borderline_engine_call_seconds_bucket', hook='can_place_piece', le='+Inf') == \
+        sample(samples, 'borderline_engine_call_seconds_count', hook='can_place_piece')
+    print("✓ Engine hook histograms exported while instrumented")
+
+
+def test_text_format():
+    """Label values are escaped and histogram buckets are cumulative"""
+    print("=" * 60)
+    print("TEST: Prometheus text format")
+    print("=" * 60)
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram('demo_seconds', 'Demo', ['player'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, player='a "quoted"\nname')
+    registry.counter('demo_events', 'Demo').inc(3)
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{player="a \\"quoted\\"\\nname",le="0.1"} 1' in text
+    samples = parse_metrics(text)
+    assert sample(samples, 'demo_seconds_bucket', player='a "quoted"\nname', le='1') == 2
+    assert sample(samples, 'demo_seconds_bucket', player='a "quoted"\nname', le='+Inf') == 3
+    assert sample(samples, 'demo_events_total') == 3
+    print("✓ Escaped labels and cumulative buckets")
+
+
+if __name__ == "__main__":
+    test_metrics_after_play_and_replays()
+    test_engine_histograms_when_instrumented()
+    test_text_format()
+    print("\n✅ Metrics tests passed")
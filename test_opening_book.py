@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test the opening book: building from games, saving, and AI consultation
+"""
+
+import os
+import random
+import tempfile
+
+from borderline_gpt import BorderlineGPT, AIPlayer
+from opening_book import OpeningBook, book_key, encode_book_move
+
+
+def test_book_answers_known_opening():
+    """An AI with a book should play the book's best move instantly"""
+    print("=" * 60)
+    print("TEST: Opening book lookup")
+    print("=" * 60)
+
+    game = BorderlineGPT()
+    key = book_key(game.board, 'R', game.red_player.pieces)
+    block = 0b111111111
+    line = game.red_player.pieces[0].get_pip_mask()
+
+    # The block at (0, 5) won 3 of 4 games, the line at (0, 0) lost both
+    book = OpeningBook(max_ply=2, min_games=2)
+    book.positions[key] = {
+        encode_book_move(block, 0, 0, 5): [4, 3],
+        encode_book_move(line, 0, 0, 0): [2, 0],
+        encode_book_move(line, 0, 0, 1): [1, 1],  # Too few games to trust
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'book.json')
+        book.save(filename)
+        book = OpeningBook.load(filename)
+
+    probe = book.probe(game.board, 'R', game.red_player.pieces)
+    assert probe is not None, "Initial position should be in the book"
+    piece_idx, rotation, row, col = probe
+    assert (row, col) == (0, 5), f"Book should choose the winning opening, got {(row, col)}"
+    assert game.red_player.pieces[piece_idx].get_pip_mask() == block
+
+    AIPlayer.opening_book = book
+    try:
+        piece, row, col, rotation, piece_idx = game.red_player.choose_move(game.board)
+    finally:
+        AIPlayer.opening_book = None
+    assert (row, col) == (0, 5), "AI should follow the book"
+    print("✓ AI plays the book move")
+
+
+def test_book_from_exported_games():
+    """Books built from exported games contain the opening positions"""
+    print("=" * 60)
+    print("TEST: Opening book from exported games")
+    print("=" * 60)
+
+    random.seed(28)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(3):
+            game = BorderlineGPT()
+            for _ in range(6):
+                game.execute_move(random.choice(game.get_valid_moves()))
+            game.export_game(f"game_{i}.json", auto_directory=tmpdir)
+
+        book = OpeningBook(max_ply=4, min_games=1)
+        book.add_files(tmpdir)
+
+    game = BorderlineGPT()
+    assert book.probe(game.board, 'R', game.red_player.pieces) is not None
+    total = sum(entry[0] for stats in book.positions.values() for entry in stats.values())
+    assert total == 3 * 4, "Each game contributes max_ply book entries"
+    print(f"✓ Book holds {len(book.positions)} positions")
+
+
+if __name__ == "__main__":
+    test_book_answers_known_opening()
+    test_book_from_exported_games()
+    print("\n✅ Opening book tests passed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test position search across archived games
+"""
+
+import random
+import tempfile
+
+from borderline_gpt import BorderlineGPT
+from position_index import PositionIndex, position_key
+
+
+def test_key_matches_game_and_state():
+    """A game and its get_game_state() dict must produce the same key"""
+    print("=" * 60)
+    print("TEST: Position key from game and from state dict")
+    print("=" * 60)
+
+    random.seed(27)
+    game = BorderlineGPT()
+    for _ in range(8):
+        game.execute_move(random.choice(game.get_valid_moves()))
+        assert position_key(game) == position_key(game.get_game_state())
+
+    # Hand order must not matter
+    before = position_key(game)
+    game.current_player.pieces.reverse()
+    assert position_key(game) == before, "Hands are compared as multisets"
+    print("✓ Keys agree and ignore hand order")
+
+
+def test_lookup_archived_positions():
+    """Positions from an exported game should be found with their winner"""
+    print("=" * 60)
+    print("TEST: Position lookup across archived games")
+    print("=" * 60)
+
+    random.seed(2027)
+    game = BorderlineGPT()
+    snapshots = []
+    for _ in range(12):
+        snapshots.append(game.get_game_state())
+        game.execute_move(random.choice(game.get_valid_moves()))
+        if game.game_over:
+            break
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = game.export_game('indexed.json', auto_directory=tmpdir)
+
+        index = PositionIndex()
+        index.add_files(tmpdir)
+        assert len(index.games) == 1
+
+        for ply, state in enumerate(snapshots):
+            matches = index.lookup(state)
+            assert any(m['ply'] == ply and m['file'] == filename for m in matches), \
+                f"Position before ply {ply} should be indexed"
+
+        # The initial position is shared by every game
+        counts = index.outcomes(BorderlineGPT())
+        assert sum(counts.values()) == 1
+
+        index.save(f"{tmpdir}/index.json")
+        reloaded = PositionIndex.load(f"{tmpdir}/index.json")
+        assert reloaded.lookup(game) == index.lookup(game), "Saved index should round-trip"
+    print(f"✓ Found all {len(snapshots)} positions of the archived game")
+
+
+def test_exports_without_dice():
+    """Positions after an unrecorded combat are not indexed; the winner is the exported one"""
+    print("=" * 60)
+    print("TEST: Indexing exports without recorded dice")
+    print("=" * 60)
+
+    random.seed(2)
+    game = BorderlineGPT()
+    snapshots = []
+    for _ in range(40):
+        valid_moves = game.get_valid_moves()
+        if game.game_over or not valid_moves:
+            break
+        snapshots.append(game.get_game_state())
+        game.execute_move(random.choice(valid_moves))
+
+    game_data = game.get_export_data()
+    history = [dict(move) for move in game_data['move_history']]
+    first_combat = next(i for i, move in enumerate(history) if 'combat_rolls' in move)
+    for move in history:
+        move.pop('combat_rolls', None)
+
+    index = PositionIndex()
+    index.add_game(dict(game_data, move_history=history, winner='R'))
+    assert index.games[0]['winner'] == 'R'
+    plies = sorted(ply for entries in index.positions.values() for _, ply, _ in entries)
+    assert plies == list(range(first_combat + 1)), "Indexed up to the unrecorded combat"
+    assert index.outcomes(snapshots[first_combat]) == {'R': 1, 'B': 0, 'draw': 0}
+    print(f"✓ Indexed {first_combat + 1} positions, up to the first combat without dice")
+
+
+if __name__ == "__main__":
+    test_key_matches_game_and_state()
+    test_lookup_archived_positions()
+    test_exports_without_dice()
+    print("\n✅ Position index tests passed")
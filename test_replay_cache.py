@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Test the GUI server's replay cache (content-hash keys, keyframes, LRU eviction)
+"""
+
+import gc
+import json
+import random
+import tracemalloc
+
+import gui_server
+from borderline_gpt import BorderlineGPT
+from gui_server import app, socketio, replay_cache, ReplayCache
+
+
+def load_demo_moves():
+    with open('replay_demo.json') as f:
+        return json.load(f)['move_history']
+
+
+def position(game):
+    """GUI state without its version (which depends on the undo/redo path taken)"""
+    state = gui_server.get_game_state(game)
+    del state['version']
+    return state
+
+
+def state_after(moves):
+    """Position after replaying moves on a fresh game"""
+    game = BorderlineGPT()
+    for move in moves:
+        assert game.replay_move(move)['valid']
+    return position(game)
+
+
+def old_export_moves(seed=2, num_moves=40):
+    """Moves of a random game with combats, without recorded dice (as in older exports)"""
+    random.seed(seed)
+    game = BorderlineGPT()
+    for _ in range(num_moves):
+        valid_moves = game.get_valid_moves()
+        if game.game_over or not valid_moves:
+            break
+        game.execute_move(random.choice(valid_moves))
+    moves = [dict(move) for move in game.get_move_history()]
+    dice = [move.pop('combat_rolls', None) for move in moves]
+    assert any(dice), "Seeded game should have a combat"
+    return moves
+
+
+def test_replays_prepared_once():
+    """Loading the same replay from several rooms reuses one cache entry"""
+    print("=" * 60)
+    print("TEST: Replay cache hits")
+    print("=" * 60)
+
+    replay_cache.clear()
+    stats = replay_cache.stats()
+    clients = [socketio.test_client(app, query_string=f'room=cached-{i}') for i in range(3)]
+    for client in clients:
+        client.get_received()
+        client.emit('load_replay', {'filename': 'replay_demo.json'})
+        assert client.get_received()[0]['name'] == 'replay_loaded'
+
+    after = replay_cache.stats()
+    assert after['misses'] == stats['misses'] + 1 and after['hits'] == stats['hits'] + 2
+    entries = [gui_server.game_sessions[f'cached-{i}']['replay_state']['entry'] for i in range(3)]
+    assert entries[0] is entries[1] is entries[2]
+
+    # An upload of the same moves is keyed by its contents, not a file name
+    moves = load_demo_moves()
+    clients[0].emit('load_replay_data', {'game_data': {'move_history': moves}})
+    clients[0].emit('load_replay_data', {'game_data': {'move_history': moves}})
+    assert replay_cache.stats()['hits'] == after['hits'] + 1
+
+    for client in clients:
+        client.disconnect()
+    print(f"✓ One preparation for {len(clients)} rooms: {replay_cache.stats()}")
+
+
+def test_goto_uses_keyframes():
+    """Seeking forks the nearest keyframe and leaves the cached keyframes untouched"""
+    print("=" * 60)
+    print("TEST: Keyframe seeking")
+    print("=" * 60)
+
+    moves = load_demo_moves()
+    client = socketio.test_client(app, query_string='room=keyframes')
+    client.get_received()
+    client.emit('load_replay', {'filename': 'replay_demo.json'})
+    client.get_received()
+    replay_state = gui_server.game_sessions['keyframes']['replay_state']
+    keyframes = replay_state['entry']['keyframes']
+    assert sorted(keyframes) == list(range(0, len(moves) + 1, replay_cache.keyframe_interval))
+    keyframe_state = position(keyframes[10])
+
+    for target in (17, 3, len(moves), 11):
+        client.emit('replay_goto', {'move_number': target})
+        payload = client.get_received()[0]['args'][0]
+        assert payload['move_number'] == target
+        assert position(replay_state['game']) == state_after(moves[:target])
+    assert replay_state['game'] is not keyframes[10], "Rooms play on forks"
+
+    # Stepping on from a keyframe-based position works in both directions
+    client.emit('replay_step_back')
+    client.emit('replay_step_forward')
+    client.emit('replay_step_forward')
+    client.get_received()
+    assert position(replay_state['game']) == state_after(moves[:12])
+    assert position(keyframes[10]) == keyframe_state
+
+    client.disconnect()
+    print("✓ Seeks land on the right position via keyframes")
+
+
+def test_entry_size_covers_keyframes():
+    """An entry's size is its measured footprint, keyframe games included"""
+    print("=" * 60)
+    print("TEST: Replay cache entry size")
+    print("=" * 60)
+
+    moves = old_export_moves()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        entry = ReplayCache().prepare(moves)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert entry['size'] >= 0.9 * held, f"size {entry['size']} under the {held} bytes held"
+    assert entry['size'] < 2 * held
+    print(f"✓ Entry size {entry['size']} bytes for {held} bytes allocated")
+
+
+def test_lru_eviction_under_memory_cap():
+    """The least recently used replay is evicted once the cap is exceeded"""
+    print("=" * 60)
+    print("TEST: LRU eviction")
+    print("=" * 60)
+
+    moves = load_demo_moves()
+    size = replay_cache.prepare(moves)['size']
+    cache = ReplayCache(max_bytes=int(size * 2.5))
+
+    for n in (20, 19, 18):
+        cache.get(f'replay-{n}', lambda n=n: moves[:n])
+        if n == 19:
+            cache.get('replay-20', lambda: moves)  # Touch: replay-19 is now the oldest
+    assert list(cache.entries) == ['replay-20', 'replay-18']
+    assert cache.total_bytes <= cache.max_bytes
+
+    # Entries larger than the whole cache are returned but not kept
+    tiny = ReplayCache(max_bytes=100)
+    assert len(tiny.get('replay', lambda: moves)['move_history']) == len(moves)
+    assert tiny.stats()['entries'] == 0
+    print(f"✓ Evicted least recently used replay (entry size {size} bytes)")
+
+
+def test_old_exports_replay_consistently():
+    """Replays without recorded dice get the dice of their first run everywhere"""
+    print("=" * 60)
+    print("TEST: Replays without recorded dice")
+    print("=" * 60)
+
+    moves = old_export_moves()
+    bad = dict(moves[1], position=[7, 7], piece_index=0)  # Off the board
+    client = socketio.test_client(app, query_string='room=old-export')
+    client.get_received()
+    client.emit('load_replay_data', {'game_data': {'move_history': moves[:3] + [bad] + moves[3:]}})
+    loaded = client.get_received()[0]
+    assert loaded['name'] == 'replay_loaded', loaded
+    assert 'could not be replayed' in loaded['args'][0]['message']
+
+    replay_state = gui_server.game_sessions['old-export']['replay_state']
+    entry = replay_state['entry']
+    # Rerolled combats may also make later moves illegal: those are skipped too
+    assert entry['skipped'] >= 1 and len(entry['move_history']) + entry['skipped'] == len(moves) + 1
+    combats = [step['combat'] for step in entry['timeline']['steps'] if step['combat']]
+    recorded = [move['combat_rolls'] for move in entry['move_history'] if 'combat_rolls' in move]
+    assert recorded and recorded == [[c['attacker_roll'], c['defender_roll']] for c in combats]
+
+    # Stepping, seeking and the keyframes all follow the cached timeline
+    final = state_after(entry['move_history'])
+    for _ in entry['move_history']:
+        client.emit('replay_step_forward')
+    assert position(replay_state['game']) == final
+    client.emit('replay_goto', {'move_number': 1})
+    client.emit('replay_goto', {'move_number': len(entry['move_history'])})
+    assert position(replay_state['game']) == final
+    assert position(entry['keyframes'][10]) == state_after(entry['move_history'][:10])
+
+    client.disconnect()
+    print(f"✓ {len(recorded)} combats replayed with the same dice on every path")
+
+
+if __name__ == "__main__":
+    test_replays_prepared_once()
+    test_goto_uses_keyframes()
+    test_entry_size_covers_keyframes()
+    test_lru_eviction_under_memory_cap()
+    test_old_exports_replay_consistently()
+    print("\n✅ Replay cache tests passed")
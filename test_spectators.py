@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test read-only spectators with once-encoded, coalescing updates
+"""
+
+import gui_server
+from gui_server import app, socketio
+
+
+def updates(client):
+    """spectator_update messages received by a client"""
+    return [msg['args'][0] for msg in client.get_received() if msg['name'] == 'spectator_update']
+
+
+def play_first_valid_move(client, game):
+    move = game.get_valid_moves()[0]
+    client.emit('place_piece', {'row': move['position'][0], 'col': move['position'][1],
+                                'piece_index': move['piece_index']})
+    for _ in range(move['rotation']):
+        client.emit('rotate_piece', {})
+    client.emit('confirm_placement', {})
+
+
+def test_spectators_are_read_only():
+    """Spectators receive the room's events but cannot change the game"""
+    print("=" * 60)
+    print("TEST: Read-only spectators")
+    print("=" * 60)
+
+    player = socketio.test_client(app, query_string='room=arena')
+    player.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+    game = gui_server.game_sessions['arena']['game']
+
+    spectator = socketio.test_client(app, query_string='room=arena&role=spectator')
+    received = spectator.get_received()
+    assert received[0]['args'][0]['role'] == 'spectator'
+    first = received[1]['args'][0]
+    assert first['event'] == 'game_state' and first['data']['version'] == game.state_version
+    spectator.emit('spectator_ack')
+
+    for event, args in [('start_game', ({'red_type': 'human', 'blue_type': 'human'},)),
+                        ('place_piece', ({'row': 0, 'col': 0, 'piece_index': 0},)),
+                        ('stop_game', ())]:
+        spectator.emit(event, *args)
+        assert spectator.get_received()[0]['name'] == 'error', f"{event} must be rejected"
+    assert gui_server.game_sessions['arena']['game'] is game
+    assert gui_server.game_sessions['arena']['pending_placement'] is None
+
+    play_first_valid_move(player, game)
+    events = [update['event'] for update in updates(spectator)]
+    assert events == ['piece_pending_rotation'], "One update in flight until acknowledged"
+
+    spectator.disconnect()
+    player.disconnect()
+    assert 'arena' not in gui_server.game_sessions
+    print("✓ Spectators watch but cannot move")
+
+
+def test_updates_serialized_once_and_coalesced():
+    """Many spectators get one room emit; slow ones skip to the latest state"""
+    print("=" * 60)
+    print("TEST: Spectator fan-out and coalescing")
+    print("=" * 60)
+
+    player = socketio.test_client(app, query_string='room=final')
+    player.emit('start_game', {'mode': 'human_vs_human', 'red_type': 'human', 'blue_type': 'human'})
+    game = gui_server.game_sessions['final']['game']
+
+    spectators = [socketio.test_client(app, query_string='room=final&role=spectator') for _ in range(20)]
+    for spectator in spectators:
+        spectator.get_received()
+        spectator.emit('spectator_ack')
+
+    sent = []
+    original = gui_server.transport.send
+    gui_server.transport.send = lambda event, data, to: sent.append((event, to)) or original(event, data, to)
+    try:
+        player.emit('place_piece', {'row': 0, 'col': 0, 'piece_index': 0})
+        assert [to for event, to in sent if event == 'spectator_update'] == ['final:spectators'], \
+            "One emit (encoded once) for all spectators"
+        messages = [spectator.get_received()[0]['args'][0] for spectator in spectators]
+        assert all(message == messages[0] for message in messages)
+        assert messages[0]['event'] == 'piece_pending_rotation' and isinstance(messages[0]['data'], dict)
+
+        # Everyone keeps up except the last spectator, which never acknowledges
+        fast, slow = spectators[:-1], spectators[-1]
+        for _ in range(4):
+            for spectator in fast:
+                spectator.emit('spectator_ack')
+                spectator.get_received()
+            play_first_valid_move(player, game)
+    finally:
+        gui_server.transport.send = original
+
+    assert game.turn_count == 4
+    slow.emit('spectator_ack')
+    caught_up = updates(slow)
+    assert len(caught_up) == 1 and caught_up[0]['event'] == 'game_state', "Missed events are coalesced"
+    assert caught_up[0]['data']['version'] == game.state_version
+
+    # Back in step: the next update is a plain event again
+    slow.emit('spectator_ack')
+    play_first_valid_move(player, game)
+    assert updates(slow)[0]['event'] == 'piece_pending_rotation'
+
+    for client in spectators + [player]:
+        client.disconnect()
+    print("✓ 20 spectators fed by one emit; the slow one skipped to the latest state")
+
+
+if __name__ == "__main__":
+    test_spectators_are_read_only()
+    test_updates_serialized_once_and_coalesced()
+    print("\n✅ Spectator tests passed")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the versioned state API
+A client that only applies get_state_delta() results must stay in sync with
+get_game_state()
+"""
+
+import random
+
+from borderline_gpt import BorderlineGPT, GamePiece, apply_state_delta, serialize_piece
+
+
+def assert_in_sync(game, client_state):
+    """Compare a delta-maintained client state with a fresh full state"""
+    expected = game.get_game_state()
+    for key in ('version', 'turn', 'current_player', 'game_over', 'winner', 'board', 'players'):
+        assert client_state[key] == expected[key], f"Client state differs in '{key}'"
+
+
+def test_deltas_follow_api_moves():
+    """Deltas should reproduce the state after every execute_move"""
+    print("=" * 60)
+    print("TEST: State deltas follow execute_move")
+    print("=" * 60)
+
+    random.seed(31)
+    game = BorderlineGPT()
+    client_state = game.get_game_state()
+
+    moves = 0
+    while not game.game_over and moves < 40:
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            break
+        game.execute_move(random.choice(valid_moves))
+        moves += 1
+
+        delta = game.get_state_delta(client_state['version'])
+        assert not delta['full'], "Recent versions should get incremental deltas"
+        assert len(delta['cells']) < 48, "Deltas should only carry changed cells"
+        client_state = apply_state_delta(client_state, delta)
+        assert_in_sync(game, client_state)
+
+    print(f"✓ Client stayed in sync for {moves} moves (version {game.state_version})")
+
+
+def test_deltas_follow_classic_turns_and_hand_changes():
+    """play_turn captures and piece management go through the same log"""
+    print("=" * 60)
+    print("TEST: State deltas follow play_turn and hand management")
+    print("=" * 60)
+
+    random.seed(131)
+    game = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+    client_state = game.get_game_state()
+
+    for _ in range(6):
+        if game.game_over:
+            break
+        game.play_turn()
+        # Apply several turns at once every other turn
+        if game.turn_count % 2 == 0:
+            client_state = apply_state_delta(client_state, game.get_state_delta(client_state['version']))
+            assert_in_sync(game, client_state)
+
+    game.add_piece_to_hand('B', {'player_color': 'B', 'pips': [[' ', 'B', ' '], [' ', 'B', ' '], [' ', ' ', ' ']]})
+    game.remove_piece_from_hand('R', 0)
+    client_state = apply_state_delta(client_state, game.get_state_delta(client_state['version']))
+    assert_in_sync(game, client_state)
+    print("✓ Client stayed in sync through AI turns and hand edits")
+
+
+def test_snapshot_cache_and_full_fallback():
+    """Unchanged states reuse the cached snapshot; stale clients get a full state"""
+    print("=" * 60)
+    print("TEST: Snapshot cache and full-state fallback")
+    print("=" * 60)
+
+    game = BorderlineGPT()
+    game.get_game_state()
+    cached = game._state_cache
+    state = game.get_game_state()
+    assert game._state_cache is cached, "Snapshot should be reused until the next mutation"
+
+    # Mutating a returned state must not corrupt the cache
+    state['board'][0][0] = 'garbage'
+    state['players']['R']['pieces_remaining'].clear()
+    assert game.get_game_state()['board'][0][0] is None
+    assert game.get_game_state()['players']['R']['pieces_remaining']
+
+    game.execute_move(game.get_valid_moves()[0])
+    game.get_game_state()
+    assert game._state_cache is not cached, "Snapshot should be rebuilt after a mutation"
+
+    assert game.get_state_delta()['full'], "No version means a full state"
+    assert game.get_state_delta(game.state_version + 5)['full'], "Unknown versions get a full state"
+
+    game._change_log = game._change_log[-1:]
+    assert game.get_state_delta(0)['full'], "Versions older than the log get a full state"
+    delta = game.get_state_delta(game.state_version)
+    assert not delta['full'] and not delta['cells'] and not delta['hands'], "No changes since current version"
+    print("✓ Cache reused until a mutation, and full fallback works")
+
+
+def test_shared_piece_fragments():
+    """Identical pieces share one cached JSON fragment"""
+    print("=" * 60)
+    print("TEST: Shared piece serialization")
+    print("=" * 60)
+
+    game = BorderlineGPT()
+    hand = game.get_game_state()['players']['R']['pieces_remaining']
+    assert hand[0] is hand[1] is hand[2], "The three vertical lines should share one fragment"
+    assert len({id(p) for p in hand}) == 6, "Six distinct shapes in the starting hand"
+
+    # Rotated copies share the fragment; blank pips are normalized to '_'
+    piece = GamePiece('B', [['_', 'B', '_'], ['_', 'B', '_'], ['_', 'B', '_']])
+    fragment = serialize_piece(piece)
+    assert fragment is serialize_piece(piece.rotate(180))
+    assert fragment is serialize_piece(GamePiece('B', [[' ', 'B', ' '], [' ', 'B', ' '], [' ', 'B', ' ']]))
+    assert fragment['power'] == piece.get_power_level() == 1
+
+    # Pieces rebuilt from a fragment are independent of it
+    rebuilt = game.json_to_piece(fragment)
+    rebuilt.convert_to_color('R')
+    assert fragment['player_color'] == 'B' and fragment['pips'][1][1] == 'B'
+    print("✓ Fragments shared per (colour, pattern) and never mutated")
+
+
+if __name__ == "__main__":
+    test_deltas_follow_api_moves()
+    test_deltas_follow_classic_turns_and_hand_changes()
+    test_snapshot_cache_and_full_fallback()
+    test_shared_piece_fragments()
+    print("\n✅ State delta tests passed")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test undo/redo driven by the reversible event log
+"""
+
+import random
+
+from borderline_gpt import BorderlineGPT
+
+
+def comparable_state(game):
+    """Game state without the version counter (which only ever increases)"""
+    state = game.get_game_state()
+    del state['version']
+    return state
+
+
+def test_undo_redo_api_moves():
+    """Undoing every move walks back through the exact earlier states"""
+    print("=" * 60)
+    print("TEST: Undo/redo of API moves")
+    print("=" * 60)
+
+    random.seed(36)
+    game = BorderlineGPT()
+    states = [comparable_state(game)]
+    while not game.game_over and len(states) < 40:
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            break
+        game.execute_move(random.choice(valid_moves))
+        states.append(comparable_state(game))
+    history = game.get_move_history()
+    print(f"Played {len(history)} moves")
+
+    for expected in reversed(states[:-1]):
+        assert game.undo()['success']
+        assert comparable_state(game) == expected, "Undo should restore the previous state"
+    assert not game.can_undo() and not game.undo()['success']
+    assert game.get_move_history() == []
+
+    # Cached valid moves follow undo as well
+    replayed = BorderlineGPT()
+    for move in history[:5]:
+        replayed.execute_move(move)
+    for _ in range(5):
+        game.redo()
+    assert game.get_valid_moves() == replayed.get_valid_moves()
+    for _ in range(5):
+        game.undo()
+    print("✓ Undid every move back to the initial position")
+
+    for expected in states[1:]:
+        assert game.redo()['success']
+        assert comparable_state(game) == expected, "Redo should replay the move exactly"
+    assert game.get_move_history() == history
+    assert not game.can_redo()
+    print("✓ Redid every move, including combat outcomes")
+
+    # A new move after undo discards the redo steps
+    game.undo()
+    game.undo()
+    if not game.game_over:
+        game.execute_move(game.get_valid_moves()[0])
+        assert not game.can_redo(), "A new move clears the redo stack"
+    print("✓ New moves clear the redo stack")
+
+
+def test_undo_classic_captures_and_hand_changes():
+    """Captures, returned pieces and piece management are reversible too"""
+    print("=" * 60)
+    print("TEST: Undo of classic turns and piece management")
+    print("=" * 60)
+
+    random.seed(136)
+    game = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+    states = [comparable_state(game)]
+    for _ in range(10):
+        if game.game_over:
+            break
+        game.play_turn()
+        states.append(comparable_state(game))
+
+    game.swap_pieces_between_players(0, 0)
+    assert game.undo()['success']
+    assert comparable_state(game) == states[-1], "A swap is undone in one step"
+
+    for expected in reversed(states[:-1]):
+        game.undo()
+        assert comparable_state(game) == expected
+    print(f"✓ Undid {len(states) - 1} AI turns and a piece swap")
+
+
+def test_replay_step_back_uses_undo():
+    """Stepping back in a GUI replay keeps the same game object"""
+    print("=" * 60)
+    print("TEST: Replay step back via undo")
+    print("=" * 60)
+
+    import gui_server
+
+    client = gui_server.socketio.test_client(gui_server.app, query_string='room=undo-replay')
+    client.emit('load_replay', {'filename': 'replay_demo.json'})
+    replay_state = gui_server.game_sessions['undo-replay']['replay_state']
+    game = replay_state['game']
+
+    for _ in range(3):
+        client.emit('replay_step_forward')
+    after_three = comparable_state(game)
+    client.emit('replay_step_forward')
+    client.emit('replay_step_back')
+    assert replay_state['game'] is game, "Step back should undo, not rebuild"
+    assert comparable_state(game) == after_three
+
+    client.emit('replay_goto', {'move_number': 1})
+    client.emit('replay_goto', {'move_number': 3})
+    assert comparable_state(game) == after_three, "Goto should redo to the same position"
+    client.get_received()
+    client.disconnect()
+    print("✓ Replay scrubbing uses undo/redo")
+
+
+if __name__ == "__main__":
+    test_undo_redo_api_moves()
+    test_undo_classic_captures_and_hand_changes()
+    test_replay_step_back_uses_undo()
+    print("\n✅ Undo/redo tests passed")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the cached, incrementally updated valid-move enumeration
+Every result must match a brute-force scan with can_place_piece
+"""
+
+import itertools
+import random
+
+import numpy as np
+
+from borderline_gpt import BorderlineGPT, decode_move
+
+
+def brute_force_moves(game):
+    """Full pieces x rotations x cells scan, as get_valid_moves used to do"""
+    color = game.current_player.color
+    player_pieces = game.board.get_player_pieces(color)
+    moves = []
+    for piece_idx, piece in enumerate(game.current_player.pieces):
+        for rotation in range(4):
+            rotated_piece = piece.rotate(rotation * 90)
+            for row in range(game.board.height):
+                for col in range(game.board.width):
+                    if game.board.can_place_piece(rotated_piece, row, col, player_pieces):
+                        moves.append({
+                            'player': color,
+                            'piece_index': piece_idx,
+                            'position': [row, col],
+                            'rotation': rotation
+                        })
+    return moves
+
+
+def test_incremental_moves_match_full_scan():
+    """Cached moves stay correct through API moves, classic turns and hand edits"""
+    print("=" * 60)
+    print("TEST: Incremental valid moves match a full scan")
+    print("=" * 60)
+
+    checked = 0
+    for seed in range(3):
+        random.seed(3300 + seed)
+        game = BorderlineGPT(red_strategy='aggressive', blue_strategy='defensive')
+        for turn in range(20):
+            if game.game_over:
+                break
+            valid_moves = game.get_valid_moves()
+            assert valid_moves == brute_force_moves(game), f"Mismatch in game {seed}, turn {turn}"
+            checked += 1
+
+            if seed % 2:
+                game.play_turn()  # Classic rules: captures return pieces to hands
+            elif valid_moves:
+                game.execute_move(random.choice(valid_moves))
+            else:
+                game.switch_player()
+
+            if turn == 10:
+                game.gift_random_piece(game.current_player.color)
+                game.remove_piece_from_hand(game.current_player.color, 0)
+
+    print(f"✓ {checked} positions matched the brute-force scan")
+
+
+def test_moves_cached_per_version():
+    """Repeated calls in one state reuse the cache; moves are fresh dicts"""
+    print("=" * 60)
+    print("TEST: Valid moves cached per state version")
+    print("=" * 60)
+
+    game = BorderlineGPT()
+    first = game.get_valid_moves()
+    cached = game._valid_moves_cache
+    second = game.get_valid_moves()
+    assert game._valid_moves_cache is cached, "Same version should hit the cache"
+    assert first == second and first[0] is not second[0], "Callers get their own move dicts"
+
+    assert game.get_valid_moves('B') == [], "Only the current player has moves"
+
+    game.execute_move(first[0])
+    assert game.get_valid_moves() == brute_force_moves(game)
+    assert game._valid_moves_cache is not cached, "A move invalidates the cache"
+    print("✓ Cache hit within a version and invalidated by moves")
+
+
+def test_streaming_and_compact_encodings():
+    """Generator, packed and NumPy encodings agree with get_valid_moves"""
+    print("=" * 60)
+    print("TEST: Streaming and compact move encodings")
+    print("=" * 60)
+
+    random.seed(34)
+    game = BorderlineGPT()
+    for _ in range(6):
+        game.execute_move(random.choice(game.get_valid_moves()))
+
+    # Lazy scan before anything is cached, with early termination
+    first_five = list(itertools.islice(game.iter_valid_moves(), 5))
+    assert game._valid_moves_cache is None or game._valid_moves_cache[1] != game.state_version
+
+    expected = game.get_valid_moves()
+    assert first_five == expected[:5]
+    assert list(game.iter_valid_moves()) == expected
+
+    color = game.current_player.color
+    packed = list(game.iter_valid_moves(encoding='packed'))
+    assert [decode_move(code, color) for code in packed] == expected
+
+    array = game.get_valid_moves_array()
+    assert array.shape == (len(expected), 4) and array.dtype == np.int16
+    assert [tuple(row) for row in array.tolist()] == list(game.iter_valid_moves(encoding='tuple'))
+
+    other = 'B' if color == 'R' else 'R'
+    assert list(game.iter_valid_moves(other)) == []
+    assert game.get_valid_moves_array(other).shape == (0, 4)
+
+    # A decoded move can be executed directly
+    result = game.execute_move(decode_move(packed[-1], color))
+    assert result['valid'], result.get('reason')
+    print(f"✓ {len(expected)} moves identical across dict, packed, tuple and array encodings")
+
+
+if __name__ == "__main__":
+    test_incremental_moves_match_full_scan()
+    test_moves_cached_per_version()
+    test_streaming_and_compact_encodings()
+    print("\n✅ Valid move tests passed")